@@ -1,5 +1,6 @@
 from fastapi import APIRouter
 
+from .analytics import router as analytics_router
 from .login import router as login_router
 from .logout import router as logout_router
 from .posts import router as posts_router
@@ -19,6 +20,7 @@ router.include_router(posts_router)
 router.include_router(vapi_server_messages_router)
 router.include_router(vapi_end_of_calls_router)
 router.include_router(vapi_conversation_updates_router)
+router.include_router(analytics_router)
 router.include_router(tasks_router)
 router.include_router(tiers_router)
 router.include_router(rate_limits_router)
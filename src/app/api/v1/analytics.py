@@ -0,0 +1,65 @@
+from datetime import UTC, date, datetime, timedelta
+from typing import Annotated
+
+from fastapi import APIRouter, Depends, Request
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...core.db.database import async_get_db
+from ...core.exceptions.http_exceptions import BadRequestException, NotFoundException
+from ...core.utils.cache import cache
+from ...core.utils.user_cache import resolve_user_id
+from ...crud.crud_vapi_call_daily_stats import crud_vapi_call_daily_stats
+from ...schemas.vapi_call_daily_stat import VapiCallDailyStatRead
+
+router = APIRouter(tags=["analytics"])
+
+MAX_DAYS = 366
+
+
+@router.get(
+    "/{username}/analytics/calls/daily",
+    response_model=list[VapiCallDailyStatRead],
+)
+@cache(
+    key_prefix=(
+        "{username}_analytics_calls_daily:start_day:{start_day}:end_day:{end_day}"
+        ":assistant_id:{assistant_id}:by_assistant:{by_assistant}"
+    ),
+    resource_id_name="username",
+    expiration=60,
+    tags=["user:{username}:vapi_call_analytics"],
+)
+async def read_daily_call_analytics(
+    request: Request,
+    username: str,
+    db: Annotated[AsyncSession, Depends(async_get_db)],
+    start_day: date | None = None,
+    end_day: date | None = None,
+    assistant_id: str | None = None,
+    by_assistant: bool = False,
+) -> list[dict]:
+    """Calls per day, average call duration and calls per ended reason.
+
+    Days are in UTC and default to the last 30 days. Only days with calls are
+    returned. With `by_assistant`, each day has one entry per assistant, calls made
+    without an assistant have a null `assistant_id`.
+    """
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
+        raise NotFoundException("User not found")
+
+    end_day = end_day or datetime.now(UTC).date()
+    start_day = start_day or end_day - timedelta(days=29)
+    if not 0 <= (end_day - start_day).days < MAX_DAYS:
+        raise BadRequestException(
+            f"start_day must be before end_day, at most {MAX_DAYS} days apart"
+        )
+
+    return await crud_vapi_call_daily_stats.get_daily(
+        db=db,
+        created_by_user_id=db_user_id,
+        start_day=start_day,
+        end_day=end_day,
+        assistant_id=assistant_id,
+        by_assistant=by_assistant,
+    )
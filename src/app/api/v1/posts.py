@@ -7,10 +7,15 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...api.dependencies import get_current_superuser, get_current_user
 from ...core.db.database import async_get_db
-from ...core.exceptions.http_exceptions import ForbiddenException, NotFoundException
+from ...core.exceptions.http_exceptions import (
+    BadRequestException,
+    ForbiddenException,
+    NotFoundException,
+)
+from ...core.schemas import CursorPaginatedListResponse
 from ...core.utils.cache import cache
+from ...core.utils.user_cache import resolve_user_id
 from ...crud.crud_posts import crud_posts
-from ...crud.crud_users import crud_users
 from ...schemas.post import PostCreate, PostCreateInternal, PostRead, PostUpdate
 from ...schemas.user import UserRead
 
@@ -28,28 +33,33 @@ async def write_post(
 
     print("In posts.py > post is", post)
 
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if db_user is None:
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
-    if current_user["id"] != db_user["id"]:
+    if current_user["id"] != db_user_id:
         raise ForbiddenException()
 
     post_internal_dict = post.model_dump()
-    post_internal_dict["created_by_user_id"] = db_user["id"]
+    post_internal_dict["created_by_user_id"] = db_user_id
 
     post_internal = PostCreateInternal(**post_internal_dict)
     created_post: PostRead = await crud_posts.create(db=db, object=post_internal)
     return created_post
 
 
-@router.get("/{username}/posts", response_model=PaginatedListResponse[PostRead])
+@router.get(
+    "/{username}/posts",
+    response_model=PaginatedListResponse[PostRead]
+    | CursorPaginatedListResponse[PostRead],
+)
 @cache(
-    key_prefix="{username}_posts:page_{page}:items_per_page:{items_per_page}",
+    key_prefix=(
+        "{username}_posts:page_{page}:items_per_page:{items_per_page}:cursor:{cursor}"
+    ),
     resource_id_name="username",
     expiration=60,
+    tags=["user:{username}:posts"],
 )
 async def read_posts(
     request: Request,
@@ -57,20 +67,36 @@ async def read_posts(
     db: Annotated[AsyncSession, Depends(async_get_db)],
     page: int = 1,
     items_per_page: int = 10,
+    cursor: str | None = None,
 ) -> dict:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if not db_user:
+    """List the posts of a user, oldest first when paginating with `cursor`.
+
+    An empty `cursor` starts a cursor pagination, each page then returns the
+    `next_cursor` of the following one instead of counting the posts.
+    """
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
-    posts_data = await crud_posts.get_multi(
+    if cursor is not None:
+        try:
+            return await crud_posts.get_multi_by_cursor(
+                db=db,
+                cursor=cursor,
+                limit=items_per_page,
+                schema_to_select=PostRead,
+                created_by_user_id=db_user_id,
+                is_deleted=False,
+            )
+        except ValueError:
+            raise BadRequestException("Invalid cursor")
+
+    posts_data = await crud_posts.get_multi_by_user(
         db=db,
+        created_by_user_id=db_user_id,
         offset=compute_offset(page, items_per_page),
         limit=items_per_page,
         schema_to_select=PostRead,
-        created_by_user_id=db_user["id"],
-        is_deleted=False,
     )
 
     return paginated_response(
@@ -86,17 +112,15 @@ async def read_post(
     id: int,
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if db_user is None:
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
     db_post: PostRead | None = await crud_posts.get(
         db=db,
         schema_to_select=PostRead,
         id=id,
-        created_by_user_id=db_user["id"],
+        created_by_user_id=db_user_id,
         is_deleted=False,
     )
     if db_post is None:
@@ -109,7 +133,7 @@ async def read_post(
 @cache(
     "{username}_post_cache",
     resource_id_name="id",
-    pattern_to_invalidate_extra=["{username}_posts:*"],
+    tags=["user:{username}:posts"],
 )
 async def patch_post(
     request: Request,
@@ -119,13 +143,11 @@ async def patch_post(
     current_user: Annotated[UserRead, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict[str, str]:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if db_user is None:
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
-    if current_user["id"] != db_user["id"]:
+    if current_user["id"] != db_user_id:
         raise ForbiddenException()
 
     db_post = await crud_posts.get(
@@ -142,7 +164,7 @@ async def patch_post(
 @cache(
     "{username}_post_cache",
     resource_id_name="id",
-    to_invalidate_extra={"{username}_posts": "{username}"},
+    tags=["user:{username}:posts"],
 )
 async def erase_post(
     request: Request,
@@ -151,13 +173,11 @@ async def erase_post(
     current_user: Annotated[UserRead, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict[str, str]:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if db_user is None:
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
-    if current_user["id"] != db_user["id"]:
+    if current_user["id"] != db_user_id:
         raise ForbiddenException()
 
     db_post = await crud_posts.get(
@@ -177,7 +197,7 @@ async def erase_post(
 @cache(
     "{username}_post_cache",
     resource_id_name="id",
-    to_invalidate_extra={"{username}_posts": "{username}"},
+    tags=["user:{username}:posts"],
 )
 async def erase_db_post(
     request: Request,
@@ -185,10 +205,8 @@ async def erase_db_post(
     id: int,
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict[str, str]:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if db_user is None:
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
     db_post = await crud_posts.get(
@@ -6,7 +6,13 @@ from sqlalchemy.ext.asyncio import AsyncSession
 
 from ...api.dependencies import get_current_superuser
 from ...core.db.database import async_get_db
-from ...core.exceptions.http_exceptions import DuplicateValueException, NotFoundException, RateLimitException
+from ...core.exceptions.http_exceptions import (
+    BadRequestException,
+    DuplicateValueException,
+    NotFoundException,
+    RateLimitException,
+)
+from ...core.schemas import CursorPaginatedListResponse
 from ...crud.crud_rate_limit import crud_rate_limits
 from ...crud.crud_tier import crud_tiers
 from ...schemas.rate_limit import RateLimitCreate, RateLimitCreateInternal, RateLimitRead, RateLimitUpdate
@@ -34,18 +40,31 @@ async def write_rate_limit(
     return created_rate_limit
 
 
-@router.get("/tier/{tier_name}/rate_limits", response_model=PaginatedListResponse[RateLimitRead])
+@router.get(
+    "/tier/{tier_name}/rate_limits",
+    response_model=PaginatedListResponse[RateLimitRead] | CursorPaginatedListResponse[RateLimitRead],
+)
 async def read_rate_limits(
     request: Request,
     tier_name: str,
     db: Annotated[AsyncSession, Depends(async_get_db)],
     page: int = 1,
     items_per_page: int = 10,
+    cursor: str | None = None,
 ) -> dict:
+    """List the rate limits of a tier. An empty `cursor` starts a cursor pagination, in id order."""
     db_tier = await crud_tiers.get(db=db, name=tier_name)
     if not db_tier:
         raise NotFoundException("Tier not found")
 
+    if cursor is not None:
+        try:
+            return await crud_rate_limits.get_multi_by_cursor(
+                db=db, cursor=cursor, limit=items_per_page, schema_to_select=RateLimitRead, tier_id=db_tier["id"]
+            )
+        except ValueError:
+            raise BadRequestException("Invalid cursor")
+
     rate_limits_data = await crud_rate_limits.get_multi(
         db=db,
         offset=compute_offset(page, items_per_page),
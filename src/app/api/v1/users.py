@@ -7,8 +7,15 @@ from fastcrud.paginated import PaginatedListResponse, compute_offset, paginated_
 
 from ...api.dependencies import get_current_superuser, get_current_user
 from ...core.db.database import async_get_db
-from ...core.exceptions.http_exceptions import DuplicateValueException, ForbiddenException, NotFoundException
+from ...core.exceptions.http_exceptions import (
+    BadRequestException,
+    DuplicateValueException,
+    ForbiddenException,
+    NotFoundException,
+)
+from ...core.schemas import CursorPaginatedListResponse
 from ...core.security import blacklist_token, get_password_hash, oauth2_scheme
+from ...core.utils.user_cache import invalidate_user_id
 from ...crud.crud_rate_limit import crud_rate_limits
 from ...crud.crud_tier import crud_tiers
 from ...crud.crud_users import crud_users
@@ -40,10 +47,23 @@ async def write_user(
     return created_user
 
 
-@router.get("/users", response_model=PaginatedListResponse[UserRead])
+@router.get("/users", response_model=PaginatedListResponse[UserRead] | CursorPaginatedListResponse[UserRead])
 async def read_users(
-    request: Request, db: Annotated[AsyncSession, Depends(async_get_db)], page: int = 1, items_per_page: int = 10
+    request: Request,
+    db: Annotated[AsyncSession, Depends(async_get_db)],
+    page: int = 1,
+    items_per_page: int = 10,
+    cursor: str | None = None,
 ) -> dict:
+    """List the users. An empty `cursor` starts a cursor pagination, in id order."""
+    if cursor is not None:
+        try:
+            return await crud_users.get_multi_by_cursor(
+                db=db, cursor=cursor, limit=items_per_page, schema_to_select=UserRead, is_deleted=False
+            )
+        except ValueError:
+            raise BadRequestException("Invalid cursor")
+
     users_data = await crud_users.get_multi(
         db=db,
         offset=compute_offset(page, items_per_page),
@@ -97,6 +117,7 @@ async def patch_user(
             raise DuplicateValueException("Email is already registered")
 
     await crud_users.update(db=db, object=values, username=username)
+    await invalidate_user_id(username)
     return {"message": "User updated"}
 
 
@@ -116,6 +137,7 @@ async def erase_user(
         raise ForbiddenException()
 
     await crud_users.delete(db=db, username=username)
+    await invalidate_user_id(username)
     await blacklist_token(token=token, db=db)
     return {"message": "User deleted"}
 
@@ -132,6 +154,7 @@ async def erase_db_user(
         raise NotFoundException("User not found")
 
     await crud_users.db_delete(db=db, username=username)
+    await invalidate_user_id(username)
     await blacklist_token(token=token, db=db)
     return {"message": "User deleted from the database"}
 
@@ -2,15 +2,24 @@
 from typing import Annotated, Union
 
 from fastapi import APIRouter, Depends, Request
+from fastapi.responses import StreamingResponse
 from fastcrud.paginated import PaginatedListResponse, compute_offset, paginated_response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..dependencies import get_current_superuser, get_current_user
 from ...core.db.database import async_get_db
-from ...core.exceptions.http_exceptions import ForbiddenException, NotFoundException
+from ...core.exceptions.http_exceptions import (
+    BadRequestException,
+    ForbiddenException,
+    NotFoundException,
+)
+from ...core.schemas import CursorPaginatedListResponse
 from ...core.utils.cache import cache
+from ...core.utils.user_cache import resolve_user_id
+from ...core.utils.vapi_events import open_event_stream
+from ...crud.crud_vapi_conversation_turns import crud_vapi_conversation_turns
 from ...crud.crud_vapi_conversation_updates import crud_vapi_conversation_updates
-from ...crud.crud_users import crud_users
+from ...schemas.vapi_conversation_turn import VapiConversationTurnRead
 from ...schemas.vapi_conversation_update import (
     VapiConversationUpdateRead,
 )
@@ -21,12 +30,19 @@ router = APIRouter(tags=["vapi_conversation_updates"])
 
 @router.get(
     "/{username}/vapi_conversation_updates",
-    response_model=PaginatedListResponse[VapiConversationUpdateRead],
+    response_model=PaginatedListResponse[VapiConversationUpdateRead]
+    | CursorPaginatedListResponse[VapiConversationUpdateRead],
 )
 @cache(
-    key_prefix="{username}_vapi_conversation_updates:page_{page}:items_per_page:{items_per_page}",
+    key_prefix=(
+        "{username}_vapi_conversation_updates:page_{page}:items_per_page:{items_per_page}"
+        ":cursor:{cursor}"
+    ),
     resource_id_name="username",
     expiration=60,
+    stale_ttl=10,
+    tags=["user:{username}:vapi_conversation_updates"],
+    raw_response=True,
 )
 async def read_conversation_updates(
     request: Request,
@@ -34,20 +50,39 @@ async def read_conversation_updates(
     db: Annotated[AsyncSession, Depends(async_get_db)],
     page: int = 1,
     items_per_page: int = 10,
+    cursor: str | None = None,
 ) -> dict:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if not db_user:
+    """List the conversation updates of a user, oldest first when paginating with
+    `cursor`.
+
+    An empty `cursor` starts a cursor pagination, each page then returns the
+    `next_cursor` of the following one instead of counting the updates.
+    """
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
-    conversation_updates_data = await crud_vapi_conversation_updates.get_multi(
-        db=db,
-        offset=compute_offset(page, items_per_page),
-        limit=items_per_page,
-        schema_to_select=VapiConversationUpdateRead,
-        created_by_user_id=db_user["id"],
-        is_deleted=False,
+    if cursor is not None:
+        try:
+            return await crud_vapi_conversation_updates.get_multi_by_cursor(
+                db=db,
+                cursor=cursor,
+                limit=items_per_page,
+                schema_to_select=VapiConversationUpdateRead,
+                created_by_user_id=db_user_id,
+                is_deleted=False,
+            )
+        except ValueError:
+            raise BadRequestException("Invalid cursor")
+
+    conversation_updates_data = (
+        await crud_vapi_conversation_updates.get_multi_by_user(
+            db=db,
+            created_by_user_id=db_user_id,
+            offset=compute_offset(page, items_per_page),
+            limit=items_per_page,
+            schema_to_select=VapiConversationUpdateRead,
+        )
     )
 
     return paginated_response(
@@ -55,21 +90,56 @@ async def read_conversation_updates(
     )
 
 
+@router.get(
+    "/{username}/vapi_conversation_updates/events",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {"text/event-stream": {}},
+            "description": "Stream of `conversation-update` and `end-of-call-report` events",
+        }
+    },
+)
+async def stream_conversation_updates(
+    request: Request,
+    username: str,
+    db: Annotated[AsyncSession, Depends(async_get_db)],
+    call_id: str | None = None,
+) -> StreamingResponse:
+    """Stream the live conversation updates of a user as Server-Sent Events.
+
+    Each `conversation-update` event carries the new turns of a call and the sequence
+    of the first one. With `call_id`, only the events of that call are streamed and
+    the stream ends with its `end-of-call-report` event.
+    """
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
+        raise NotFoundException("User not found")
+
+    return StreamingResponse(
+        open_event_stream(user_id=db_user_id, call_id=call_id),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @router.get(
     "/{username}/vapi_conversation_update/{id}",
     response_model=VapiConversationUpdateRead,
 )
-@cache(key_prefix="{username}_vapi_conversation_update_cache", resource_id_name="id")
+@cache(
+    key_prefix="{username}_vapi_conversation_update_cache",
+    resource_id_name="id",
+    raw_response=True,
+)
 async def read_conversation_update(
     request: Request,
     username: str,
     id: str,
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if db_user is None:
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
     db_conversation_update: VapiConversationUpdateRead | None = (
@@ -77,7 +147,7 @@ async def read_conversation_update(
             db=db,
             schema_to_select=VapiConversationUpdateRead,
             id=id,
-            created_by_user_id=db_user["id"],
+            created_by_user_id=db_user_id,
             is_deleted=False,
         )
     )
@@ -87,6 +157,35 @@ async def read_conversation_update(
     return db_conversation_update
 
 
+@router.get(
+    "/{username}/vapi_conversation_update/{id}/turns",
+    response_model=list[VapiConversationTurnRead],
+)
+async def read_conversation_turns(
+    request: Request,
+    username: str,
+    id: str,
+    db: Annotated[AsyncSession, Depends(async_get_db)],
+    from_sequence: int = 0,
+) -> list[dict]:
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
+        raise NotFoundException("User not found")
+
+    conversation_update_exists = await crud_vapi_conversation_updates.exists(
+        db=db, id=id, created_by_user_id=db_user_id, is_deleted=False
+    )
+    if not conversation_update_exists:
+        raise NotFoundException("VapiConversationUpdate not found")
+
+    return await crud_vapi_conversation_turns.get_conversation(
+        db=db,
+        call_id=id,
+        created_by_user_id=db_user_id,
+        from_sequence=from_sequence,
+    )
+
+
 # @router.patch("/{username}/post/{id}")
 # @cache(
 #     "{username}_post_cache",
@@ -124,7 +223,7 @@ async def read_conversation_update(
 @cache(
     "{username}_vapi_conversation_update_cache",
     resource_id_name="id",
-    to_invalidate_extra={"{username}_vapi_conversation_updates": "{username}"},
+    tags=["user:{username}:vapi_conversation_updates"],
 )
 async def erase_conversation_update(
     request: Request,
@@ -133,13 +232,11 @@ async def erase_conversation_update(
     current_user: Annotated[UserRead, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict[str, str]:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if db_user is None:
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
-    if current_user["id"] != db_user["id"]:
+    if current_user["id"] != db_user_id:
         raise ForbiddenException()
 
     db_conversation_update = await crud_vapi_conversation_updates.get(
@@ -149,6 +246,7 @@ async def erase_conversation_update(
         raise NotFoundException("VapiConversationUpdate not found")
 
     await crud_vapi_conversation_updates.delete(db=db, id=id)
+    await crud_vapi_conversation_turns.delete_conversation(db=db, call_id=id)
 
     return {"message": "VapiConversationUpdate deleted"}
 
@@ -160,7 +258,7 @@ async def erase_conversation_update(
 @cache(
     "{username}_vapi_conversation_update_cache",
     resource_id_name="id",
-    to_invalidate_extra={"{username}_vapi_conversation_updates": "{username}"},
+    tags=["user:{username}:vapi_conversation_updates"],
 )
 async def erase_db_conversation_update(
     request: Request,
@@ -168,10 +266,8 @@ async def erase_db_conversation_update(
     id: str,
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict[str, str]:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if db_user is None:
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
     db_conversation_update = await crud_vapi_conversation_updates.get(
@@ -181,4 +277,5 @@ async def erase_db_conversation_update(
         raise NotFoundException("VapiConversationUpdate not found")
 
     await crud_vapi_conversation_updates.db_delete(db=db, id=id)
+    await crud_vapi_conversation_turns.delete_conversation(db=db, call_id=id)
     return {"message": "VapiConversationUpdate deleted from the database"}
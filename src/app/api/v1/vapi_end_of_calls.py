@@ -1,32 +1,106 @@
 # ./src/app/api/v1/vapi_server_messages.py
-from typing import Annotated, Union
+from typing import Annotated, Literal, Union
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Query, Request
+from fastapi.responses import StreamingResponse
 from fastcrud.paginated import PaginatedListResponse, compute_offset, paginated_response
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..dependencies import get_current_superuser, get_current_user
 from ...core.db.database import async_get_db
-from ...core.exceptions.http_exceptions import ForbiddenException, NotFoundException
+from ...core.exceptions.http_exceptions import (
+    BadRequestException,
+    ForbiddenException,
+    NotFoundException,
+)
+from ...core.schemas import CursorPaginatedListResponse
 from ...core.utils.cache import cache
+from ...core.utils.pagination import decode_cursor, encode_cursor
+from ...core.utils.user_cache import resolve_user_id
+from ...core.utils.vapi_archive import (
+    db_delete_archived_end_of_call,
+    delete_archived_end_of_call,
+    read_archived_end_of_call,
+)
+from ...core.utils.vapi_bulk_ingestion import (
+    ingest_end_of_calls_ndjson,
+    iter_ndjson_lines,
+)
+from ...core.utils.vapi_export import (
+    MEDIA_TYPES,
+    ExportFormat,
+    open_end_of_calls_export,
+)
 from ...crud.crud_vapi_end_of_calls import crud_vapi_end_of_calls
-from ...crud.crud_users import crud_users
 from ...schemas.vapi_end_of_call import (
+    VapiEndOfCallBulkResult,
     VapiEndOfCallRead,
+    VapiEndOfCallSearchHit,
+    VapiEndOfCallSearchPage,
+    VapiEndOfCallSummary,
 )
 from ...schemas.user import UserRead
 
 router = APIRouter(tags=["vapi_end_of_calls"])
 
 
+@router.post(
+    "/{username}/vapi_end_of_calls/bulk",
+    response_model=VapiEndOfCallBulkResult,
+    status_code=201,
+    openapi_extra={
+        "requestBody": {"content": {"application/x-ndjson": {}}, "required": True}
+    },
+)
+@cache(
+    "{username}_vapi_end_of_calls",
+    resource_id_name="username",
+    tags=["user:{username}:vapi_end_of_calls", "user:{username}:vapi_call_analytics"],
+)
+async def write_end_of_calls_bulk(
+    request: Request,
+    username: str,
+    current_user: Annotated[UserRead, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(async_get_db)],
+) -> dict:
+    """Backfill end-of-call reports from an NDJSON body.
+
+    Each line is a `VapiServerMessage` holding an `end-of-call-report`. The body is
+    streamed, validated and inserted in chunks, and the records that could not be
+    written are reported with their line number instead of failing the request.
+    """
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
+        raise NotFoundException("User not found")
+
+    if current_user["id"] != db_user_id:
+        raise ForbiddenException()
+
+    return await ingest_end_of_calls_ndjson(
+        db=db,
+        lines=iter_ndjson_lines(request.stream()),
+        created_by_user_id=db_user_id,
+    )
+
+
 @router.get(
     "/{username}/vapi_end_of_calls",
-    response_model=PaginatedListResponse[VapiEndOfCallRead],
+    response_model=PaginatedListResponse[VapiEndOfCallRead]
+    | PaginatedListResponse[VapiEndOfCallSummary]
+    | CursorPaginatedListResponse[VapiEndOfCallRead]
+    | CursorPaginatedListResponse[VapiEndOfCallSummary],
 )
 @cache(
-    key_prefix="{username}_vapi_end_of_calls:page_{page}:items_per_page:{items_per_page}",
+    key_prefix=(
+        "{username}_vapi_end_of_calls:page_{page}:items_per_page:{items_per_page}"
+        ":assistant_id:{assistant_id}:phone_number:{phone_number}:cursor:{cursor}"
+        ":view:{view}"
+    ),
     resource_id_name="username",
     expiration=60,
+    stale_ttl=10,
+    tags=["user:{username}:vapi_end_of_calls"],
+    raw_response=True,
 )
 async def read_end_of_calls(
     request: Request,
@@ -34,48 +108,184 @@ async def read_end_of_calls(
     db: Annotated[AsyncSession, Depends(async_get_db)],
     page: int = 1,
     items_per_page: int = 10,
+    assistant_id: str | None = None,
+    phone_number: str | None = None,
+    cursor: str | None = None,
+    view: Literal["full", "summary"] = "full",
 ) -> dict:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if not db_user:
+    """List the end-of-call reports of a user, oldest first when paginating with
+    `cursor`.
+
+    An empty `cursor` starts a cursor pagination, each page then returns the
+    `next_cursor` of the following one instead of counting the reports. The
+    `summary` view only selects the columns of `VapiEndOfCallSummary`.
+    """
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
-    end_of_calls_data = await crud_vapi_end_of_calls.get_multi(
-        db=db,
-        offset=compute_offset(page, items_per_page),
-        limit=items_per_page,
-        schema_to_select=VapiEndOfCallRead,
-        created_by_user_id=db_user["id"],
-        is_deleted=False,
+    schema_to_select = (
+        VapiEndOfCallSummary if view == "summary" else VapiEndOfCallRead
     )
 
+    if cursor is not None:
+        try:
+            return await crud_vapi_end_of_calls.get_multi_by_cursor(
+                db=db,
+                cursor=cursor,
+                limit=items_per_page,
+                schema_to_select=schema_to_select,
+                assistant_id=assistant_id,
+                phone_number=phone_number,
+                created_by_user_id=db_user_id,
+                is_deleted=False,
+            )
+        except ValueError:
+            raise BadRequestException("Invalid cursor")
+
+    # the per-user counter only applies to the unfiltered list
+    if assistant_id is None and phone_number is None:
+        end_of_calls_data = await crud_vapi_end_of_calls.get_multi_by_user(
+            db=db,
+            created_by_user_id=db_user_id,
+            offset=compute_offset(page, items_per_page),
+            limit=items_per_page,
+            schema_to_select=schema_to_select,
+        )
+    else:
+        end_of_calls_data = await crud_vapi_end_of_calls.get_multi_by_call_fields(
+            db=db,
+            offset=compute_offset(page, items_per_page),
+            limit=items_per_page,
+            schema_to_select=schema_to_select,
+            assistant_id=assistant_id,
+            phone_number=phone_number,
+            created_by_user_id=db_user_id,
+            is_deleted=False,
+        )
+
     return paginated_response(
         crud_data=end_of_calls_data, page=page, items_per_page=items_per_page
     )
 
 
+@router.get(
+    "/{username}/vapi_end_of_calls/search",
+    response_model=VapiEndOfCallSearchPage,
+)
+async def search_end_of_calls(
+    request: Request,
+    username: str,
+    db: Annotated[AsyncSession, Depends(async_get_db)],
+    q: Annotated[str, Query(min_length=1)],
+    limit: Annotated[int, Query(ge=1, le=100)] = 10,
+    cursor: str | None = None,
+) -> dict:
+    """Search the transcripts and summaries of the end-of-call reports, best matches
+    first.
+
+    `q` supports quoted phrases, `or` and `-excluded` terms. Pass the `next_cursor` of
+    a page as `cursor` to get the next one. Archived reports are not searched.
+    """
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
+        raise NotFoundException("User not found")
+
+    after = None
+    if cursor is not None:
+        try:
+            last_rank, last_id = decode_cursor(cursor, length=2)
+            after = (float(last_rank), int(last_id))
+        except (ValueError, TypeError):
+            raise BadRequestException("Invalid cursor")
+
+    hits = await crud_vapi_end_of_calls.search(
+        db=db,
+        query=q,
+        created_by_user_id=db_user_id,
+        limit=limit + 1,
+        after=after,
+        schema_to_select=VapiEndOfCallSearchHit,
+    )
+
+    next_cursor = None
+    if len(hits) > limit:
+        hits = hits[:limit]
+        next_cursor = encode_cursor([hits[-1]["rank"], hits[-1]["id"]])
+
+    return {"data": hits, "next_cursor": next_cursor}
+
+
+@router.get(
+    "/{username}/vapi_end_of_calls/export",
+    response_class=StreamingResponse,
+    responses={
+        200: {
+            "content": {"application/x-ndjson": {}, "text/csv": {}},
+            "description": "All the end-of-call reports of the user",
+        }
+    },
+)
+async def export_end_of_calls(
+    request: Request,
+    username: str,
+    current_user: Annotated[UserRead, Depends(get_current_user)],
+    db: Annotated[AsyncSession, Depends(async_get_db)],
+    format: ExportFormat = "ndjson",
+) -> StreamingResponse:
+    """Export all the end-of-call reports of a user, archived ones included.
+
+    The reports are streamed from a server-side cursor as NDJSON or CSV, nothing is
+    cached and the memory used does not grow with the number of reports.
+    """
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
+        raise NotFoundException("User not found")
+
+    if current_user["id"] != db_user_id:
+        raise ForbiddenException()
+
+    return StreamingResponse(
+        await open_end_of_calls_export(
+            db=db, created_by_user_id=db_user_id, export_format=format
+        ),
+        media_type=MEDIA_TYPES[format],
+        headers={
+            "Content-Disposition": (
+                f'attachment; filename="{username}_vapi_end_of_calls.{format}"'
+            )
+        },
+    )
+
+
 @router.get("/{username}/vapi_end_of_call/{id}", response_model=VapiEndOfCallRead)
-@cache(key_prefix="{username}_vapi_end_of_call_cache", resource_id_name="id")
+@cache(
+    key_prefix="{username}_vapi_end_of_call_cache",
+    resource_id_name="id",
+    raw_response=True,
+)
 async def read_end_of_call(
     request: Request,
     username: str,
     id: int,
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if db_user is None:
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
     db_end_of_call: VapiEndOfCallRead | None = await crud_vapi_end_of_calls.get(
         db=db,
         schema_to_select=VapiEndOfCallRead,
         id=id,
-        created_by_user_id=db_user["id"],
+        created_by_user_id=db_user_id,
         is_deleted=False,
     )
+    if db_end_of_call is None:
+        # old reports are moved out of the database by the archival job
+        db_end_of_call = await read_archived_end_of_call(
+            db=db, id=id, created_by_user_id=db_user_id
+        )
     if db_end_of_call is None:
         raise NotFoundException("VapiEndOfCall not found")
 
@@ -119,7 +329,7 @@ async def read_end_of_call(
 @cache(
     "{username}_vapi_end_of_call_cache",
     resource_id_name="id",
-    to_invalidate_extra={"{username}_vapi_end_of_calls": "{username}"},
+    tags=["user:{username}:vapi_end_of_calls"],
 )
 async def erase_end_of_call(
     request: Request,
@@ -128,19 +338,23 @@ async def erase_end_of_call(
     current_user: Annotated[UserRead, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict[str, str]:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if db_user is None:
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
-    if current_user["id"] != db_user["id"]:
+    if current_user["id"] != db_user_id:
         raise ForbiddenException()
 
     db_end_of_call = await crud_vapi_end_of_calls.get(
         db=db, schema_to_select=VapiEndOfCallRead, id=id, is_deleted=False
     )
     if db_end_of_call is None:
+        # old reports are moved out of the database by the archival job
+        if await delete_archived_end_of_call(
+            db=db, id=id, created_by_user_id=db_user_id
+        ):
+            return {"message": "VapiEndOfCall deleted"}
+
         raise NotFoundException("VapiEndOfCall not found")
 
     await crud_vapi_end_of_calls.delete(db=db, id=id)
@@ -155,7 +369,7 @@ async def erase_end_of_call(
 @cache(
     "{username}_vapi_end_of_call_cache",
     resource_id_name="id",
-    to_invalidate_extra={"{username}_vapi_end_of_calls": "{username}"},
+    tags=["user:{username}:vapi_end_of_calls"],
 )
 async def erase_db_end_of_call(
     request: Request,
@@ -163,16 +377,19 @@ async def erase_db_end_of_call(
     id: int,
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> dict[str, str]:
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if db_user is None:
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
     db_end_of_call = await crud_vapi_end_of_calls.get(
         db=db, schema_to_select=VapiEndOfCallRead, id=id
     )
     if db_end_of_call is None:
+        if await db_delete_archived_end_of_call(
+            db=db, id=id, created_by_user_id=db_user_id
+        ):
+            return {"message": "VapiEndOfCall deleted from the database"}
+
         raise NotFoundException("VapiEndOfCall not found")
 
     await crud_vapi_end_of_calls.db_delete(db=db, id=id)
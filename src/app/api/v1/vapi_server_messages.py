@@ -1,106 +1,201 @@
 # ./src/app/api/v1/vapi_server_messages.py
-from typing import Annotated, Union
+from typing import Annotated, Any, Union
 
-from fastapi import APIRouter, Depends, Request
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, TypeAdapter, ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
 # from ..dependencies import get_current_user
+from ...core.config import VapiIngestionModeOption, settings
 from ...core.db.database import async_get_db
-from ...core.exceptions.http_exceptions import NotFoundException
+from ...core.exceptions.http_exceptions import (
+    CustomException,
+    DuplicateValueException,
+    NotFoundException,
+)
+from ...core.utils import queue
+from ...core.utils.user_cache import resolve_user_id
+from ...core.utils.vapi_events import publish_end_of_call
+from ...core.utils.vapi_ingestion import (
+    END_OF_CALL_PENDING,
+    QUEUED_RESPONSE,
+    claim_end_of_call,
+    enqueue_vapi_server_message,
+    flush_conversation_update,
+    release_end_of_call,
+    stage_conversation_update,
+    store_end_of_call_response,
+)
 from ...crud.crud_vapi_end_of_calls import crud_vapi_end_of_calls
-from ...crud.crud_vapi_conversation_updates import crud_vapi_conversation_updates
-from ...crud.crud_users import crud_users
 from ...schemas.vapi_end_of_call import (
+    VapiEndOfCallBase,
     VapiEndOfCallCreateInternal,
     VapiEndOfCallRead,
 )
-from ...schemas.vapi_conversation_update import (
-    VapiConversationUpdateCreateInternal,
-    VapiConversationUpdateRead,
-    VapiConversationUpdateUpdate,
+from ...schemas.vapi_server_message import (
+    VapiServerMessage,
+    VapiServerMessageInternal,
+    VapiServerMessageResponse,
 )
-from ...schemas.vapi_server_message import VapiServerMessage, VapiServerMessageResponse
-from ...schemas.user import UserRead
 
 router = APIRouter(tags=["vapi_server_messages"])
 
+_call_id_field = VapiEndOfCallCreateInternal.model_fields["call_id"]
+_call_id_adapter = TypeAdapter(Annotated[_call_id_field.annotation, _call_id_field])
+
+
+def _validate_body(
+    schema: type[BaseModel], body: bytes, context: dict[str, Any] | None = None
+) -> BaseModel:
+    """Validate a raw request body in a single pass, reporting errors like FastAPI."""
+    try:
+        return schema.model_validate_json(body, context=context)
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors()]
+        )
+
+
+def _validate_call_id(end_of_call: VapiEndOfCallBase) -> str:
+    """Resolve the call id of a report like `VapiEndOfCallCreateInternal` does, so
+    queue mode rejects the reports the worker could not write."""
+    try:
+        return _call_id_adapter.validate_python((end_of_call.call or {}).get("id"))
+    except ValidationError as e:
+        raise RequestValidationError(
+            [
+                {**error, "loc": ("body", "message", "call_id", *error["loc"])}
+                for error in e.errors()
+            ]
+        )
+
+
+def _replay_end_of_call(stored_response: bytes, status_code: int) -> Response:
+    """Answer a retried end-of-call report with the response stored for its call."""
+    if stored_response == END_OF_CALL_PENDING:
+        raise CustomException(
+            status_code=409, detail="End-of-call report is already being processed"
+        )
+
+    return Response(
+        content=stored_response, media_type="application/json", status_code=status_code
+    )
+
 
 @router.post(
     "/{username}/vapi_server_message",
     response_model=VapiServerMessageResponse,
     status_code=201,
+    responses={
+        202: {"description": "Message queued for asynchronous ingestion"},
+        409: {
+            "description": "The same end-of-call report is already being processed "
+            "or stored"
+        },
+    },
+    openapi_extra={
+        "requestBody": {"content": {"application/json": {}}, "required": True}
+    },
 )
 async def write_vapi_server_message(
     request: Request,
+    response: Response,
     username: str,
-    message: VapiServerMessage,
     # current_user: Annotated[UserRead, Depends(get_current_user)],
     db: Annotated[AsyncSession, Depends(async_get_db)],
 ) -> VapiServerMessageResponse:
-
-    print("In vapi_server_message.py > received message is", message)
-
-    db_user = await crud_users.get(
-        db=db, schema_to_select=UserRead, username=username, is_deleted=False
-    )
-    if db_user is None:
+    """Ingest a Vapi server message (`end-of-call-report` or `conversation-update`).
+
+    The body is a `VapiServerMessage`. It is read as raw bytes and validated once,
+    straight into the internal create schema, instead of being parsed by FastAPI,
+    dumped and validated again.
+
+    Vapi retries webhooks, so end-of-call reports are deduplicated on their call id:
+    a retry is answered with the stored response of the first report.
+
+    Conversation updates are staged in Redis and written at most every
+    `VAPI_CONVERSATION_UPDATE_FLUSH_INTERVAL_MS`, they are answered with
+    `{"message": "ConversationUpdate staged"}` instead of the written row.
+    """
+    body = await request.body()
+
+    # In queue mode the message is only validated here, user lookup and writes happen in the worker
+    if settings.VAPI_INGESTION_MODE == VapiIngestionModeOption.QUEUE:
+        message = _validate_body(VapiServerMessage, body).message
+
+        # the worker stores the response once the report is written
+        call_id = None
+        if message.type == "end-of-call-report":
+            call_id = _validate_call_id(message)
+            stored_response = await claim_end_of_call(call_id)
+            if stored_response is not None:
+                return _replay_end_of_call(stored_response, status_code=202)
+
+        try:
+            await enqueue_vapi_server_message(username=username, body=body)
+        except Exception:
+            if call_id is not None:
+                await release_end_of_call(call_id)
+            raise
+
+        response.status_code = 202
+        return QUEUED_RESPONSE
+
+    db_user_id = await resolve_user_id(db=db, username=username)
+    if db_user_id is None:
         raise NotFoundException("User not found")
 
-    # if current_user["id"] != db_user["id"]:
+    # if current_user["id"] != db_user_id:
     #     raise ForbiddenException()
 
-    message_internal_dict = message.message.model_dump()
-    message_internal_dict["created_by_user_id"] = db_user["id"]
+    message_internal = _validate_body(
+        VapiServerMessageInternal, body, context={"created_by_user_id": db_user_id}
+    ).message
 
     print(
-        "In vapi_server_message.py > vapi_server_message_internal_dict is",
-        message_internal_dict,
+        "In vapi_server_message.py > received",
+        message_internal.type,
+        "for user",
+        db_user_id,
     )
 
-    if message_internal_dict["type"] == "end-of-call-report":
-        message_internal_dict["call_id"] = message_internal_dict["call"]["id"]
-        end_of_call_internal = VapiEndOfCallCreateInternal(**message_internal_dict)
-        created_end_of_call: VapiEndOfCallRead = await crud_vapi_end_of_calls.create(
-            db=db, object=end_of_call_internal
+    if message_internal.type == "end-of-call-report":
+        call_id = message_internal.call_id
+        stored_response = await claim_end_of_call(call_id)
+        if stored_response is not None:
+            return _replay_end_of_call(stored_response, status_code=201)
+
+        try:
+            # the end of a call is the last chance to write its staged conversation
+            await flush_conversation_update(
+                db=db, redis=queue.pool, call_id=call_id, final=True
+            )
+
+            created_end_of_call = await crud_vapi_end_of_calls.create_unique(
+                db=db, object=message_internal, schema_to_select=VapiEndOfCallRead
+            )
+            if created_end_of_call is None:
+                raise DuplicateValueException("End-of-call report already exists")
+        except Exception:
+            await release_end_of_call(call_id)
+            raise
+
+        await store_end_of_call_response(
+            call_id,
+            VapiEndOfCallRead.model_validate(created_end_of_call, from_attributes=True)
+            .model_dump_json(by_alias=True)
+            .encode(),
         )
+        await publish_end_of_call(redis=queue.pool, end_of_call=message_internal)
         print("In vapi_server_message.py > created_end_of_call is", created_end_of_call)
         return created_end_of_call
 
-    elif message_internal_dict["type"] == "conversation-update":
-        message_internal_dict["id"] = message_internal_dict["call"]["id"]
-
-        db_conversation_update = await crud_vapi_conversation_updates.get(
-            db=db,
-            schema_to_select=VapiConversationUpdateRead,
-            id=message_internal_dict["id"],
+    elif message_internal.type == "conversation-update":
+        await stage_conversation_update(
+            redis=queue.pool, conversation_update=message_internal
         )
-
-        if db_conversation_update is None:
-            conversation_update_internal = VapiConversationUpdateCreateInternal(
-                **message_internal_dict
-            )
-            created_conversation_update: VapiConversationUpdateRead = (
-                await crud_vapi_conversation_updates.create(
-                    db=db, object=conversation_update_internal
-                )
-            )
-            print(
-                "In vapi_server_message.py > created_conversation_update is",
-                created_conversation_update,
-            )
-            return created_conversation_update
-
-        else:
-            conversation_update_update = VapiConversationUpdateUpdate(
-                **message_internal_dict
-            )
-            await crud_vapi_conversation_updates.update(
-                db=db,
-                object=conversation_update_update,
-                id=message_internal_dict["id"],
-            )
-            print("In vapi_server_message.py > ConversationUpdate overwritten")
-            return {"message": "ConversationUpdate overwritten"}
+        return {"message": "ConversationUpdate staged"}
 
 
 # Here I'm updating the user with username == "myusername".
@@ -79,6 +79,23 @@ class RedisCacheSettings(BaseSettings):
     REDIS_CACHE_URL: str = f"redis://{REDIS_CACHE_HOST}:{REDIS_CACHE_PORT}"
 
 
+class UserIdCacheSettings(BaseSettings):
+    USER_ID_CACHE_MAX_SIZE: int = config("USER_ID_CACHE_MAX_SIZE", default=10000)
+    USER_ID_CACHE_LOCAL_TTL: int = config("USER_ID_CACHE_LOCAL_TTL", default=30)
+    USER_ID_CACHE_EXPIRATION: int = config("USER_ID_CACHE_EXPIRATION", default=3600)
+
+
+class LocalCacheSettings(BaseSettings):
+    CACHE_LOCAL_ENABLED: bool = config("CACHE_LOCAL_ENABLED", default=False)
+    CACHE_LOCAL_TTL: int = config("CACHE_LOCAL_TTL", default=10)
+    CACHE_LOCAL_MAX_BYTES: int = config("CACHE_LOCAL_MAX_BYTES", default=16777216)
+
+
+class CacheLockSettings(BaseSettings):
+    CACHE_LOCK_EXPIRATION_MS: int = config("CACHE_LOCK_EXPIRATION_MS", default=5000)
+    CACHE_LOCK_POLL_INTERVAL_MS: int = config("CACHE_LOCK_POLL_INTERVAL_MS", default=50)
+
+
 class ClientSideCacheSettings(BaseSettings):
     CLIENT_CACHE_MAX_AGE: int = config("CLIENT_CACHE_MAX_AGE", default=60)
 
@@ -99,6 +116,50 @@ class DefaultRateLimitSettings(BaseSettings):
     DEFAULT_RATE_LIMIT_PERIOD: int = config("DEFAULT_RATE_LIMIT_PERIOD", default=3600)
 
 
+class VapiIngestionModeOption(Enum):
+    SYNC = "sync"
+    QUEUE = "queue"
+
+
+class VapiIngestionSettings(BaseSettings):
+    VAPI_INGESTION_MODE: VapiIngestionModeOption = config("VAPI_INGESTION_MODE", default="sync")
+    VAPI_INGESTION_BATCH_SIZE: int = config("VAPI_INGESTION_BATCH_SIZE", default=500)
+    VAPI_INGESTION_BATCH_WINDOW_MS: int = config("VAPI_INGESTION_BATCH_WINDOW_MS", default=1000)
+    VAPI_INGESTION_MAX_TRIES: int = config("VAPI_INGESTION_MAX_TRIES", default=5)
+    VAPI_CONVERSATION_UPDATE_FLUSH_INTERVAL_MS: int = config(
+        "VAPI_CONVERSATION_UPDATE_FLUSH_INTERVAL_MS", default=10000
+    )
+    VAPI_CONVERSATION_UPDATE_IDLE_TIMEOUT_MS: int = config("VAPI_CONVERSATION_UPDATE_IDLE_TIMEOUT_MS", default=300000)
+    VAPI_BULK_INGESTION_CHUNK_SIZE: int = config("VAPI_BULK_INGESTION_CHUNK_SIZE", default=1000)
+    VAPI_END_OF_CALL_IDEMPOTENCY_EXPIRATION: int = config("VAPI_END_OF_CALL_IDEMPOTENCY_EXPIRATION", default=86400)
+
+
+class VapiPartitionSettings(BaseSettings):
+    VAPI_END_OF_CALL_PARTITIONS_AHEAD: int = config("VAPI_END_OF_CALL_PARTITIONS_AHEAD", default=3)
+    VAPI_END_OF_CALL_RETENTION_MONTHS: int = config("VAPI_END_OF_CALL_RETENTION_MONTHS", default=0)
+    VAPI_END_OF_CALL_DROP_EXPIRED_PARTITIONS: bool = config("VAPI_END_OF_CALL_DROP_EXPIRED_PARTITIONS", default=False)
+    VAPI_END_OF_CALL_CALL_ID_RETENTION_MONTHS: int = config("VAPI_END_OF_CALL_CALL_ID_RETENTION_MONTHS", default=3)
+
+
+class VapiArchiveSettings(BaseSettings):
+    VAPI_ARCHIVE_DIR: str = config("VAPI_ARCHIVE_DIR", default="./archive")
+    VAPI_ARCHIVE_AFTER_DAYS: int = config("VAPI_ARCHIVE_AFTER_DAYS", default=0)
+    VAPI_ARCHIVE_BATCH_SIZE: int = config("VAPI_ARCHIVE_BATCH_SIZE", default=1000)
+
+
+class VapiSearchSettings(BaseSettings):
+    VAPI_SEARCH_CONFIG: str = config("VAPI_SEARCH_CONFIG", default="simple")
+
+
+class VapiEventsSettings(BaseSettings):
+    VAPI_EVENTS_KEEPALIVE_SECONDS: int = config("VAPI_EVENTS_KEEPALIVE_SECONDS", default=15)
+    VAPI_EVENTS_CLIENT_QUEUE_SIZE: int = config("VAPI_EVENTS_CLIENT_QUEUE_SIZE", default=100)
+
+
+class VapiExportSettings(BaseSettings):
+    VAPI_EXPORT_BATCH_SIZE: int = config("VAPI_EXPORT_BATCH_SIZE", default=500)
+
+
 class EnvironmentOption(Enum):
     LOCAL = "local"
     STAGING = "staging"
@@ -116,10 +177,19 @@ class Settings(
     FirstUserSettings,
     TestSettings,
     RedisCacheSettings,
+    UserIdCacheSettings,
+    LocalCacheSettings,
+    CacheLockSettings,
     ClientSideCacheSettings,
     RedisQueueSettings,
     RedisRateLimiterSettings,
     DefaultRateLimitSettings,
+    VapiIngestionSettings,
+    VapiPartitionSettings,
+    VapiArchiveSettings,
+    VapiSearchSettings,
+    VapiEventsSettings,
+    VapiExportSettings,
     EnvironmentSettings,
 ):
     pass
@@ -0,0 +1,134 @@
+import re
+from datetime import date, datetime
+
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..logger import logging
+
+logger = logging.getLogger(__name__)
+
+MONTHLY_PARTITION_NAME = "{table}_y{year:04d}m{month:02d}"
+
+
+def month_start(moment: date | datetime) -> date:
+    return date(moment.year, moment.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def monthly_partition_name(table: str, month: date) -> str:
+    return MONTHLY_PARTITION_NAME.format(table=table, year=month.year, month=month.month)
+
+
+def monthly_partition_ddl(table: str, month: date) -> str:
+    """Build the `CREATE TABLE ... PARTITION OF` statement of the partition holding `month`, bounded in UTC."""
+    return (
+        f"CREATE TABLE IF NOT EXISTS {monthly_partition_name(table, month)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{add_months(month, 1).isoformat()} 00:00:00+00')"
+    )
+
+
+async def create_monthly_partitions(db: AsyncSession, table: str, first_month: date, count: int) -> list[str]:
+    """Create the monthly partitions of a table that do not exist yet.
+
+    A partition cannot be created while the default partition holds rows of its range. Such a failure is logged and
+    does not prevent the other partitions from being created.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session to use. The caller commits.
+    table: str
+        The partitioned table, range partitioned by a timestamp column.
+    first_month: date
+        The first day of the first month to create a partition for.
+    count: int
+        The number of consecutive months to create partitions for.
+
+    Returns
+    -------
+    list[str]
+        The names of the created partitions.
+    """
+    created = []
+    for offset in range(count):
+        month = add_months(first_month, offset)
+        name = monthly_partition_name(table, month)
+        if await db.scalar(text("SELECT to_regclass(:name) IS NOT NULL"), {"name": name}):
+            continue
+
+        try:
+            async with db.begin_nested():
+                await db.execute(text(monthly_partition_ddl(table, month)))
+        except SQLAlchemyError as e:
+            logger.error(f"Could not create partition {name}: {e}")
+            continue
+
+        created.append(name)
+
+    return created
+
+
+async def detach_expired_partitions(
+    db: AsyncSession, table: str, before: date, drop: bool = False, counted: bool = False
+) -> list[str]:
+    """Detach the monthly partitions of a table that only hold rows older than `before`.
+
+    Detaching a partition does not fire the delete triggers of its rows, so the rows of a table counted in
+    `user_counter` are subtracted from the counters of their users explicitly, in the same transaction.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session to use. The caller commits.
+    table: str
+        The partitioned table.
+    before: date
+        Partitions whose month ends on or before this date are expired.
+    drop: bool, optional
+        Whether to drop the detached partitions. Detached partitions are kept as standalone tables by default.
+    counted: bool, optional
+        Whether the table is counted in the column of the same name of `user_counter`.
+
+    Returns
+    -------
+    list[str]
+        The names of the expired partitions.
+    """
+    result = await db.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE pg_inherits.inhparent = CAST(:table AS regclass)"
+        ),
+        {"table": table},
+    )
+
+    expired = []
+    for name in sorted(result.scalars()):
+        match = re.fullmatch(rf"{table}_y(\d{{4}})m(\d{{2}})", name)
+        if match is None or add_months(date(int(match[1]), int(match[2]), 1), 1) > before:
+            continue
+
+        await db.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+        if counted:
+            # the detached partition stays locked until the commit, its rows cannot change in the meantime
+            await db.execute(
+                text(
+                    f"UPDATE user_counter SET {table} = user_counter.{table} - expired.count "
+                    f"FROM (SELECT created_by_user_id, count(*) AS count FROM {name} WHERE NOT is_deleted "
+                    "GROUP BY created_by_user_id) AS expired "
+                    "WHERE user_counter.user_id = expired.created_by_user_id"
+                )
+            )
+        if drop:
+            await db.execute(text(f"DROP TABLE {name}"))
+
+        expired.append(name)
+
+    return expired
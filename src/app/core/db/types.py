@@ -0,0 +1,92 @@
+import json
+import zlib
+from typing import Any
+
+from sqlalchemy import LargeBinary
+from sqlalchemy.engine import Dialect
+from sqlalchemy.types import TypeDecorator
+
+# first byte of every stored value, telling how the rest of it is encoded
+RAW = b"\x00"
+ZLIB = b"\x01"
+
+COMPRESSION_THRESHOLD = 512
+COMPRESSION_LEVEL = 6
+
+
+def compress(data: bytes, threshold: int = COMPRESSION_THRESHOLD, level: int = COMPRESSION_LEVEL) -> bytes:
+    """Encode bytes for storage, zlib-compressing them when they are at least `threshold` bytes long.
+
+    Values that do not shrink are stored raw, so reading them back never costs a decompression.
+    """
+    if len(data) >= threshold:
+        compressed = zlib.compress(data, level)
+        if len(compressed) < len(data):
+            return ZLIB + compressed
+
+    return RAW + data
+
+
+def decompress(data: bytes) -> bytes:
+    """Decode bytes encoded by `compress`."""
+    codec, payload = data[:1], data[1:]
+    if codec == ZLIB:
+        return zlib.decompress(payload)
+
+    if codec == RAW:
+        return payload
+
+    raise ValueError(f"Unknown compression codec {codec!r}")
+
+
+class CompressedText(TypeDecorator):
+    """Text stored as `bytea`, compressed with `compress` above a size threshold.
+
+    Decompression happens when a row is loaded, only for the columns that are selected. Reads going through
+    `schema_to_select` without the column never decompress it.
+
+    Parameters
+    ----------
+    threshold: int, optional
+        The size in bytes from which values are compressed. Defaults to `COMPRESSION_THRESHOLD`.
+    level: int, optional
+        The zlib compression level. Defaults to `COMPRESSION_LEVEL`.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def __init__(self, threshold: int = COMPRESSION_THRESHOLD, level: int = COMPRESSION_LEVEL) -> None:
+        super().__init__()
+        self.threshold = threshold
+        self.level = level
+
+    def _serialize(self, value: Any) -> bytes:
+        return value.encode()
+
+    def _deserialize(self, data: bytes) -> Any:
+        return data.decode()
+
+    def process_bind_param(self, value: Any, dialect: Dialect) -> bytes | None:
+        if value is None:
+            return None
+
+        return compress(self._serialize(value), self.threshold, self.level)
+
+    def process_result_value(self, value: bytes | None, dialect: Dialect) -> Any:
+        if value is None:
+            return None
+
+        return self._deserialize(decompress(bytes(value)))
+
+
+class CompressedJSON(CompressedText):
+    """JSON stored as `bytea`, compressed with `compress` above a size threshold."""
+
+    cache_ok = True
+
+    def _serialize(self, value: Any) -> bytes:
+        return json.dumps(value, separators=(",", ":")).encode()
+
+    def _deserialize(self, data: bytes) -> Any:
+        return json.loads(data)
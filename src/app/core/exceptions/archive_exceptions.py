@@ -0,0 +1,4 @@
+class MissingArchiveDependencyError(Exception):
+    def __init__(self, message: str = "pyarrow is required for the archive, install the `archive` extra.") -> None:
+        self.message = message
+        super().__init__(self.message)
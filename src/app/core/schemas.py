@@ -2,6 +2,8 @@ import uuid as uuid_pkg
 from datetime import UTC, datetime
 from typing import Any
 
+from fastcrud.paginated import ListResponse
+from fastcrud.paginated.schemas import SchemaType
 from pydantic import BaseModel, Field, field_serializer
 
 
@@ -47,6 +49,11 @@ class PersistentDeletion(BaseModel):
         return None
 
 
+# -------------- pagination --------------
+class CursorPaginatedListResponse(ListResponse[SchemaType]):
+    next_cursor: str | None
+
+
 # -------------- token --------------
 class Token(BaseModel):
     access_token: str
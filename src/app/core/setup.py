@@ -27,6 +27,7 @@ from .config import (
 from .db.database import Base
 from .db.database import async_engine as engine
 from .utils import cache, queue, rate_limit
+from .utils.vapi_events import close_event_streams
 
 
 # -------------- database --------------
@@ -39,9 +40,11 @@ async def create_tables() -> None:
 async def create_redis_cache_pool() -> None:
     cache.pool = redis.ConnectionPool.from_url(settings.REDIS_CACHE_URL)
     cache.client = redis.Redis.from_pool(cache.pool)  # type: ignore
+    cache.start_local_cache()
 
 
 async def close_redis_cache_pool() -> None:
+    await cache.stop_local_cache()
     await cache.client.aclose()  # type: ignore
 
 
@@ -51,6 +54,7 @@ async def create_redis_queue_pool() -> None:
 
 
 async def close_redis_queue_pool() -> None:
+    await close_event_streams()
     await queue.pool.aclose()  # type: ignore
 
 
@@ -1,18 +1,85 @@
+import asyncio
+import fnmatch
 import functools
 import json
 import re
-from collections.abc import Callable
+import time
+import uuid
+from collections import OrderedDict
+from collections.abc import Awaitable, Callable
 from typing import Any
 
 from fastapi import Request, Response
+from fastapi.datastructures import DefaultPlaceholder
 from fastapi.encoders import jsonable_encoder
+from fastapi.routing import APIRoute, serialize_response
 from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import RedisError
+from sqlalchemy.ext.asyncio import AsyncSession
 
+from ..config import settings
+from ..db.database import local_session
 from ..exceptions.cache_exceptions import CacheIdentificationInferenceError, InvalidRequestError, MissingClientError
+from ..logger import logging
+
+logger = logging.getLogger(__name__)
 
 pool: ConnectionPool | None = None
 client: Redis | None = None
 
+INVALIDATION_CHANNEL = "cache_invalidation"
+RECONNECT_DELAY_SECONDS = 1
+# outside of the cache key space, so that invalidation patterns never match locks
+CACHE_LOCK_KEY = "cache_lock:{cache_key}"
+# deletes the lock only if it is still held with the token of the caller
+RELEASE_LOCK_SCRIPT = """
+if redis.call("GET", KEYS[1]) == ARGV[1] then
+    return redis.call("DEL", KEYS[1])
+end
+return 0
+"""
+# the sets of the cache keys recorded under each tag, outside of the cache key space too
+CACHE_TAG_KEY = "cache_tag:{tag}"
+# adds a cache key to its tag sets, which live at least as long as the key
+RECORD_TAGS_SCRIPT = """
+for _, tag_key in ipairs(KEYS) do
+    redis.call("SADD", tag_key, ARGV[1])
+    if redis.call("TTL", tag_key) < tonumber(ARGV[2]) then
+        redis.call("EXPIRE", tag_key, ARGV[2])
+    end
+end
+"""
+# deletes the cache keys recorded under tags and the tag sets, returning the deleted cache keys
+INVALIDATE_TAGS_SCRIPT = """
+local invalidated = {}
+for _, tag_key in ipairs(KEYS) do
+    local keys = redis.call("SMEMBERS", tag_key)
+    for i = 1, #keys, 1000 do
+        redis.call("DEL", unpack(keys, i, math.min(i + 999, #keys)))
+    end
+    for _, key in ipairs(keys) do
+        table.insert(invalidated, key)
+    end
+    redis.call("DEL", tag_key)
+end
+return invalidated
+"""
+# prefixes the response bodies cached by `cache(raw_response=True)`, JSON never starts with a NUL byte
+RAW_RESPONSE_MARKER = b"\x00raw\x00"
+
+# the in-process cache in front of Redis: cache key -> (value, size in bytes, expires at)
+_local_cache: OrderedDict[str, tuple[Any, int, float]] = OrderedDict()
+_local_cache_bytes = 0
+# bumped by every invalidation, a value read from Redis before an invalidation is not cached in process
+_local_generation = 0
+_invalidation_listener: asyncio.Task | None = None
+# the cache misses being computed in this process, by cache key
+_inflight: dict[str, asyncio.Future] = {}
+# the background refreshes of stale values, referenced until they are done
+_refresh_tasks: set[asyncio.Task] = set()
+# the routes of the endpoints caching their raw responses, by endpoint
+_routes: dict[Callable, APIRoute] = {}
+
 
 def _infer_resource_id(kwargs: dict[str, Any], resource_id_type: type | tuple[type, ...]) -> int | str:
     """Infer the resource ID from a dictionary of keyword arguments.
@@ -181,6 +248,434 @@ async def _delete_keys_by_pattern(pattern: str) -> None:
             await client.delete(*keys)
 
 
+def _get_local(key: str) -> Any | None:
+    entry = _local_cache.get(key)
+    if entry is None:
+        return None
+
+    value, _, expires_at = entry
+    if expires_at < time.monotonic():
+        _evict_local(key)
+        return None
+
+    _local_cache.move_to_end(key)
+    return value
+
+
+def _set_local(key: str, value: Any, size: int, expiration: int, generation: int) -> None:
+    """Cache a value in process, unless an invalidation happened since `generation` was read."""
+    global _local_cache_bytes
+
+    if generation != _local_generation or size > settings.CACHE_LOCAL_MAX_BYTES:
+        return
+
+    _evict_local(key)
+    _local_cache[key] = (value, size, time.monotonic() + min(expiration, settings.CACHE_LOCAL_TTL))
+    _local_cache_bytes += size
+    while _local_cache_bytes > settings.CACHE_LOCAL_MAX_BYTES:
+        _, (_, evicted_size, _) = _local_cache.popitem(last=False)
+        _local_cache_bytes -= evicted_size
+
+
+def _evict_local(key: str) -> None:
+    global _local_cache_bytes
+
+    entry = _local_cache.pop(key, None)
+    if entry is not None:
+        _local_cache_bytes -= entry[1]
+
+
+def _apply_invalidation(keys: list[str], patterns: list[str]) -> None:
+    """Evict invalidated keys and the keys matching invalidated patterns from the in-process cache."""
+    global _local_generation
+
+    _local_generation += 1
+    for key in keys:
+        _evict_local(key)
+
+    for pattern in patterns:
+        for key in [key for key in _local_cache if fnmatch.fnmatchcase(key, pattern)]:
+            _evict_local(key)
+
+
+def _clear_local() -> None:
+    global _local_cache_bytes, _local_generation
+
+    _local_generation += 1
+    _local_cache.clear()
+    _local_cache_bytes = 0
+
+
+async def _invalidate(
+    keys: list[str] | None = None, patterns: list[str] | None = None, tags: list[str] | None = None
+) -> None:
+    """Delete cache keys from Redis and from the in-process caches of every worker.
+
+    Parameters
+    ----------
+    keys: list[str] | None, optional
+        The cache keys to delete.
+    patterns: list[str] | None, optional
+        Redis glob patterns of the cache keys to delete, scanned with `_delete_keys_by_pattern`.
+    tags: list[str] | None, optional
+        Tags whose recorded cache keys are deleted, in a single call costing the number of keys of the tags.
+    """
+    if client is None:
+        raise MissingClientError
+
+    keys, patterns = keys or [], patterns or []
+    if keys:
+        await client.delete(*keys)
+    for pattern in patterns:
+        await _delete_keys_by_pattern(pattern)
+
+    if tags:
+        tag_keys = [CACHE_TAG_KEY.format(tag=tag) for tag in tags]
+        invalidated = await client.eval(INVALIDATE_TAGS_SCRIPT, len(tag_keys), *tag_keys)  # type: ignore
+        keys = keys + [key.decode() for key in invalidated]
+
+    if settings.CACHE_LOCAL_ENABLED:
+        _apply_invalidation(keys, patterns)
+        await client.publish(INVALIDATION_CHANNEL, json.dumps({"keys": keys, "patterns": patterns}))
+
+
+async def _listen_invalidations() -> None:
+    """Apply the invalidations published by every worker to the in-process cache of this one."""
+    while True:
+        pubsub = client.pubsub(ignore_subscribe_messages=True)  # type: ignore
+        try:
+            await pubsub.subscribe(INVALIDATION_CHANNEL)
+            # invalidations published while this worker was not subscribed are lost
+            _clear_local()
+            async for message in pubsub.listen():
+                invalidation = json.loads(message["data"])
+                _apply_invalidation(invalidation["keys"], invalidation["patterns"])
+
+        except RedisError as e:
+            logger.error(f"Lost the cache invalidation subscription, reconnecting: {e}")
+
+        finally:
+            await pubsub.aclose()
+
+        await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+
+def start_local_cache() -> None:
+    """Start the in-process cache of this worker, when `CACHE_LOCAL_ENABLED`.
+
+    Raises
+    ------
+    MissingClientError
+        If the cache client has not been initialized.
+    """
+    global _invalidation_listener
+
+    if not settings.CACHE_LOCAL_ENABLED:
+        return
+
+    if client is None:
+        raise MissingClientError
+
+    if _invalidation_listener is None or _invalidation_listener.done():
+        _invalidation_listener = asyncio.create_task(_listen_invalidations())
+
+
+async def stop_local_cache() -> None:
+    """Stop the invalidation subscription of this worker and empty its in-process cache."""
+    global _invalidation_listener
+
+    if _invalidation_listener is not None:
+        _invalidation_listener.cancel()
+        _invalidation_listener = None
+
+    _clear_local()
+
+
+def _split_fresh_until(cached_data: bytes) -> tuple[float | None, bytes]:
+    """Split a value cached with a `stale_ttl` into the time until which it is fresh and its payload.
+
+    The freshness is None for values written without a `stale_ttl`, e.g. before the option was set on the endpoint.
+    """
+    header, _, payload = cached_data.partition(b"\n")
+    try:
+        return float(header), payload
+    except ValueError:
+        return None, cached_data
+
+
+def _decode(cached_data: bytes, raw: bool) -> Any:
+    """Decode a cached payload, the response body itself if `raw`.
+
+    A payload cached in the other mode, e.g. before `raw_response` was set on the endpoint, decodes to None.
+    """
+    if cached_data.startswith(RAW_RESPONSE_MARKER):
+        return cached_data[len(RAW_RESPONSE_MARKER) :] if raw else None
+
+    return None if raw else json.loads(cached_data.decode())
+
+
+def _load(cache_key: str, cached_data: bytes, expiration: float, generation: int, raw: bool) -> Any:
+    data = _decode(cached_data, raw)
+    if data is not None and settings.CACHE_LOCAL_ENABLED:
+        _set_local(cache_key, data, len(cached_data), expiration, generation)
+    return data
+
+
+def _route(request: Request) -> APIRoute:
+    """Find the route of the endpoint handling a request."""
+    endpoint = request.scope["endpoint"]
+    route = _routes.get(endpoint)
+    if route is None:
+        route = next(
+            route for route in request.app.router.routes if isinstance(route, APIRoute) and route.endpoint is endpoint
+        )
+        _routes[endpoint] = route
+    return route
+
+
+def _response_class(route: APIRoute) -> type[Response]:
+    response_class = route.response_class
+    if isinstance(response_class, DefaultPlaceholder):
+        return response_class.value
+    return response_class
+
+
+async def _encode_response(request: Request, result: Any) -> bytes:
+    """Encode the result of an endpoint into the body FastAPI would send, validated and serialized with the response
+    model of its route."""
+    route = _route(request)
+    content = await serialize_response(
+        field=route.response_field,
+        response_content=result,
+        include=route.response_model_include,
+        exclude=route.response_model_exclude,
+        by_alias=route.response_model_by_alias,
+        exclude_unset=route.response_model_exclude_unset,
+        exclude_defaults=route.response_model_exclude_defaults,
+        exclude_none=route.response_model_exclude_none,
+    )
+    return _response_class(route)(content).body
+
+
+def _raw_response(request: Request, body: bytes) -> Response:
+    """Wrap a cached response body in a response of the class of its route, sent without being validated again."""
+    route = _route(request)
+    return Response(content=body, status_code=route.status_code or 200, media_type=_response_class(route).media_type)
+
+
+async def _store(
+    cache_key: str,
+    result: Any,
+    expiration: int,
+    stale_ttl: int | None,
+    generation: int,
+    tags: list[str] | None,
+    encode: Callable[[Any], Awaitable[bytes]] | None = None,
+) -> Any:
+    """Cache a result, fresh for `expiration` seconds and then served stale for `stale_ttl` seconds if given.
+
+    The key is recorded under its tags in the same transaction, so an invalidation of the tags cannot miss it. With
+    `encode`, the encoded result is cached and returned instead of its JSON value.
+    """
+    if encode is None:
+        serializable_data = jsonable_encoder(result)
+        serialized_data = json.dumps(serializable_data).encode()
+    else:
+        serializable_data = await encode(result)
+        serialized_data = RAW_RESPONSE_MARKER + serializable_data
+    ttl = expiration if stale_ttl is None else expiration + stale_ttl
+    if stale_ttl is not None:
+        serialized_value = f"{time.time() + expiration}\n".encode() + serialized_data
+    else:
+        serialized_value = serialized_data
+
+    async with client.pipeline() as pipe:  # type: ignore
+        pipe.set(cache_key, serialized_value, ex=ttl)
+        if tags:
+            tag_keys = [CACHE_TAG_KEY.format(tag=tag) for tag in tags]
+            pipe.eval(RECORD_TAGS_SCRIPT, len(tag_keys), *tag_keys, cache_key, ttl)
+        await pipe.execute()
+
+    if settings.CACHE_LOCAL_ENABLED:
+        _set_local(cache_key, serializable_data, len(serialized_data), expiration, generation)
+    return serializable_data
+
+
+async def _call_with_own_session(func: Callable, request: Request, args: tuple, kwargs: dict[str, Any]) -> Any:
+    """Call an endpoint outside of its request, with a database session of its own instead of the closed one."""
+    async with local_session() as db:
+        kwargs = {name: db if isinstance(value, AsyncSession) else value for name, value in kwargs.items()}
+        return await func(request, *args, **kwargs)
+
+
+async def _refresh(
+    cache_key: str,
+    expiration: int,
+    stale_ttl: int,
+    refresh: Callable[[], Awaitable[Any]],
+    tags: list[str] | None,
+    encode: Callable[[Any], Awaitable[bytes]] | None,
+    lock_key: str,
+    token: str,
+) -> None:
+    generation = _local_generation
+    try:
+        await _store(cache_key, await refresh(), expiration, stale_ttl, generation, tags, encode)
+    except Exception as e:
+        logger.error(f"Could not refresh the stale cache key {cache_key}: {e}")
+    finally:
+        await client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)  # type: ignore
+
+
+async def _start_refresh(
+    cache_key: str,
+    expiration: int,
+    stale_ttl: int,
+    refresh: Callable[[], Awaitable[Any]],
+    tags: list[str] | None,
+    encode: Callable[[Any], Awaitable[bytes]] | None,
+) -> None:
+    """Refresh a stale value in the background, unless a request of any process already does."""
+    lock_key = CACHE_LOCK_KEY.format(cache_key=cache_key)
+    token = uuid.uuid4().hex
+    if not await client.set(lock_key, token, nx=True, px=settings.CACHE_LOCK_EXPIRATION_MS):  # type: ignore
+        return
+
+    task = asyncio.create_task(_refresh(cache_key, expiration, stale_ttl, refresh, tags, encode, lock_key, token))
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+async def _wait_for_lock_holder(cache_key: str, lock_key: str) -> bytes | None:
+    """Poll for the value computed by the holder of the lock of a key, until it is released or expires."""
+    while True:
+        await asyncio.sleep(settings.CACHE_LOCK_POLL_INTERVAL_MS / 1000)
+        cached_data, lock = await client.mget(cache_key, lock_key)  # type: ignore
+        if cached_data or lock is None:
+            return cached_data
+
+
+async def _get_or_compute(
+    cache_key: str,
+    expiration: int,
+    compute: Callable[[], Awaitable[Any]],
+    stale_ttl: int | None = None,
+    refresh: Callable[[], Awaitable[Any]] | None = None,
+    tags: list[str] | None = None,
+    encode: Callable[[Any], Awaitable[bytes]] | None = None,
+) -> Any:
+    """Read a cached value, or compute and cache it once however many requests miss it at the same time.
+
+    Requests of this process missing the same key wait for the first one. Across processes, the first one to miss
+    takes a Redis lock for `CACHE_LOCK_EXPIRATION_MS` and the others poll for its value. They compute it themselves
+    only if the lock is released or expires without a value.
+
+    With a `stale_ttl`, a value older than `expiration` is still served for `stale_ttl` seconds, while a single
+    background task refreshes it.
+
+    Parameters
+    ----------
+    cache_key: str
+        The cache key.
+    expiration: int
+        How long the cached value is fresh, in seconds.
+    compute: Callable[[], Awaitable[Any]]
+        Computes the value on a miss.
+    stale_ttl: int | None, optional
+        How long a value is served after it stopped being fresh, in seconds.
+    refresh: Callable[[], Awaitable[Any]] | None, optional
+        Computes the value in the background, after the response is sent. Defaults to `compute`.
+    tags: list[str] | None, optional
+        Tags the key is recorded under when the value is cached, see `_invalidate`.
+    encode: Callable[[Any], Awaitable[bytes]] | None, optional
+        Encodes the value into the bytes to cache, which are then returned as is on hits and misses alike.
+
+    Returns
+    -------
+    Any
+        The result of `compute` when this request computed it, the cached JSON value otherwise. The cached bytes
+        with `encode`.
+    """
+    if client is None:
+        raise MissingClientError
+
+    if settings.CACHE_LOCAL_ENABLED:
+        local_data = _get_local(cache_key)
+        if local_data is not None:
+            return local_data
+
+    raw = encode is not None
+    generation = _local_generation
+    cached_data = await client.get(cache_key)
+    if cached_data and stale_ttl is None:
+        data = _load(cache_key, cached_data, expiration, generation, raw)
+        if data is not None:
+            return data
+
+    elif cached_data:
+        fresh_until, payload = _split_fresh_until(cached_data)
+        if fresh_until is not None:
+            fresh_for = fresh_until - time.time()
+            if fresh_for > 0:
+                data = _load(cache_key, payload, min(fresh_for, expiration), generation, raw)
+            else:
+                data = _decode(payload, raw)
+                if data is not None:
+                    await _start_refresh(cache_key, expiration, stale_ttl, refresh or compute, tags, encode)
+            if data is not None:
+                return data
+
+    inflight = _inflight.get(cache_key)
+    if inflight is not None:
+        try:
+            return await asyncio.shield(inflight)
+        except asyncio.CancelledError:
+            # the request computing the value was cancelled, not this one
+            if not inflight.cancelled():
+                raise
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[cache_key] = future
+    lock_key = CACHE_LOCK_KEY.format(cache_key=cache_key)
+    token = uuid.uuid4().hex
+    try:
+        locked = await client.set(lock_key, token, nx=True, px=settings.CACHE_LOCK_EXPIRATION_MS)
+        if not locked:
+            cached_data = await _wait_for_lock_holder(cache_key, lock_key)
+            if cached_data:
+                if stale_ttl is not None:
+                    cached_data = _split_fresh_until(cached_data)[1]
+                data = _load(cache_key, cached_data, expiration, generation, raw)
+                if data is not None:
+                    future.set_result(data)
+                    return data
+
+        try:
+            result = await compute()
+            serializable_data = await _store(cache_key, result, expiration, stale_ttl, generation, tags, encode)
+
+        finally:
+            if locked:
+                await client.eval(RELEASE_LOCK_SCRIPT, 1, lock_key, token)  # type: ignore
+
+        future.set_result(serializable_data)
+        return serializable_data if raw else result
+
+    except BaseException as e:
+        if not future.done():
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # the waiting requests re-raise it, there may be none
+                future.exception()
+        raise
+
+    finally:
+        if _inflight.get(cache_key) is future:
+            del _inflight[cache_key]
+
+
 def cache(
     key_prefix: str,
     resource_id_name: Any = None,
@@ -188,6 +683,9 @@ def cache(
     resource_id_type: type | tuple[type, ...] = int,
     to_invalidate_extra: dict[str, Any] | None = None,
     pattern_to_invalidate_extra: list[str] | None = None,
+    stale_ttl: int | None = None,
+    tags: list[str] | None = None,
+    raw_response: bool = False,
 ) -> Callable:
     """Cache decorator for FastAPI endpoints.
 
@@ -213,6 +711,18 @@ def cache(
     pattern_to_invalidate_extra: List[str] | None, optional
         A list of string patterns for cache keys that should be invalidated when the decorated function is called.
         This allows for bulk invalidation of cache keys based on a matching pattern.
+    stale_ttl: int | None, optional
+        How long the cached data keeps being served after `expiration`, in seconds, while a single background task
+        refreshes it. The background task calls the endpoint with a database session of its own. Defaults to None,
+        cached data is then recomputed on the first request after `expiration`.
+    tags: List[str] | None, optional
+        Templates of tags, formatted like `key_prefix`. On GET, the cache key is recorded under the tags. Otherwise,
+        every key recorded under the tags is invalidated, at a cost proportional to their number of keys, where
+        `pattern_to_invalidate_extra` scans the whole keyspace.
+    raw_response: bool, optional
+        Cache the response body, validated and serialized with the `response_model` of the route, and send it as is
+        in a response of the class of the route. Hits then skip decoding, validating and encoding the data. Defaults
+        to False.
 
     Returns
     -------
@@ -277,10 +787,12 @@ def cache(
 
     Note
     ----
+    - With `CACHE_LOCAL_ENABLED`, GET responses are also kept in a bounded in-process LRU for at most
+      `CACHE_LOCAL_TTL` seconds, and invalidations are broadcast over Redis pub/sub to evict them in every worker.
+    - Concurrent misses of a key are computed once, see `_get_or_compute`.
     - resource_id_type is used only if resource_id is not passed.
     - `to_invalidate_extra` and `pattern_to_invalidate_extra` are used for cache invalidation on methods other than GET.
-    - Using `pattern_to_invalidate_extra` can be resource-intensive on large datasets. Use it judiciously and
-      consider the potential impact on Redis performance.
+    - Using `pattern_to_invalidate_extra` can be resource-intensive on large datasets. Prefer `tags`.
     """
 
     def wrapper(func: Callable) -> Callable:
@@ -296,37 +808,37 @@ def cache(
 
             formatted_key_prefix = _format_prefix(key_prefix, kwargs)
             cache_key = f"{formatted_key_prefix}:{resource_id}"
+            formatted_tags = [_format_prefix(tag, kwargs) for tag in tags or []]
             if request.method == "GET":
                 if to_invalidate_extra is not None or pattern_to_invalidate_extra is not None:
                     raise InvalidRequestError
 
-                cached_data = await client.get(cache_key)
-                if cached_data:
-                    return json.loads(cached_data.decode())
+                data = await _get_or_compute(
+                    cache_key,
+                    expiration,
+                    lambda: func(request, *args, **kwargs),
+                    stale_ttl=stale_ttl,
+                    refresh=lambda: _call_with_own_session(func, request, args, kwargs),
+                    tags=formatted_tags,
+                    encode=functools.partial(_encode_response, request) if raw_response else None,
+                )
+                return _raw_response(request, data) if raw_response else data
 
             result = await func(request, *args, **kwargs)
 
-            if request.method == "GET":
-                serializable_data = jsonable_encoder(result)
-                serialized_data = json.dumps(serializable_data)
+            keys_to_invalidate = [cache_key]
+            if to_invalidate_extra is not None:
+                formatted_extra = _format_extra_data(to_invalidate_extra, kwargs)
+                for prefix, id in formatted_extra.items():
+                    keys_to_invalidate.append(f"{prefix}:{id}")
 
-                await client.set(cache_key, serialized_data)
-                await client.expire(cache_key, expiration)
+            patterns_to_invalidate = []
+            if pattern_to_invalidate_extra is not None:
+                for pattern in pattern_to_invalidate_extra:
+                    formatted_pattern = _format_prefix(pattern, kwargs)
+                    patterns_to_invalidate.append(formatted_pattern + "*")
 
-                serialized_data = json.loads(serialized_data)
-
-            else:
-                await client.delete(cache_key)
-                if to_invalidate_extra is not None:
-                    formatted_extra = _format_extra_data(to_invalidate_extra, kwargs)
-                    for prefix, id in formatted_extra.items():
-                        extra_cache_key = f"{prefix}:{id}"
-                        await client.delete(extra_cache_key)
-
-                if pattern_to_invalidate_extra is not None:
-                    for pattern in pattern_to_invalidate_extra:
-                        formatted_pattern = _format_prefix(pattern, kwargs)
-                        await _delete_keys_by_pattern(formatted_pattern + "*")
+            await _invalidate(keys_to_invalidate, patterns_to_invalidate, formatted_tags)
 
             return result
 
@@ -0,0 +1,39 @@
+import base64
+import json
+from typing import Any
+
+
+def encode_cursor(values: list[Any]) -> str:
+    """Encode the sort key of the last returned row into an opaque cursor."""
+    return base64.urlsafe_b64encode(json.dumps(values, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, length: int) -> list[Any]:
+    """Decode a cursor made by `encode_cursor`.
+
+    Parameters
+    ----------
+    cursor: str
+        The opaque cursor sent back by the client.
+    length: int
+        The number of values expected in the sort key.
+
+    Returns
+    -------
+    list[Any]
+        The sort key of the last row of the previous page.
+
+    Raises
+    ------
+    ValueError
+        If the cursor is malformed.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+    if not isinstance(values, list) or len(values) != length:
+        raise ValueError(f"Invalid cursor: {cursor}")
+
+    return values
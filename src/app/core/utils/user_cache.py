@@ -0,0 +1,95 @@
+import time
+from collections import OrderedDict
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...crud.crud_users import crud_users
+from ...schemas.user import UserRead
+from ..config import settings
+from . import cache
+
+USER_ID_KEY = "user_id:{username}"
+
+_local_cache: OrderedDict[str, tuple[int, float]] = OrderedDict()
+
+
+def _get_local(username: str) -> int | None:
+    entry = _local_cache.get(username)
+    if entry is None:
+        return None
+
+    user_id, expires_at = entry
+    if expires_at < time.monotonic():
+        del _local_cache[username]
+        return None
+
+    _local_cache.move_to_end(username)
+    return user_id
+
+
+def _set_local(username: str, user_id: int) -> None:
+    _local_cache[username] = (user_id, time.monotonic() + settings.USER_ID_CACHE_LOCAL_TTL)
+    _local_cache.move_to_end(username)
+    while len(_local_cache) > settings.USER_ID_CACHE_MAX_SIZE:
+        _local_cache.popitem(last=False)
+
+
+async def resolve_user_id(db: AsyncSession, username: str) -> int | None:
+    """Resolve the id of a non-deleted user from its username.
+
+    Lookups go through an in-process LRU with a short TTL, then through Redis, and only hit the database on a miss of
+    both. Unknown usernames are not cached, so a user is resolvable as soon as it is created.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session used on a cache miss.
+    username: str
+        The username to resolve.
+
+    Returns
+    -------
+    int | None
+        The user id, or None if there is no such non-deleted user.
+
+    Note
+    ----
+        - When the Redis cache client is not initialized (e.g. in the arq worker) only the in-process cache is used.
+        - Routes that rename or delete users must call `invalidate_user_id`. Other processes may keep serving the old
+          mapping for at most `USER_ID_CACHE_LOCAL_TTL` seconds.
+    """
+    user_id = _get_local(username)
+    if user_id is not None:
+        return user_id
+
+    key = USER_ID_KEY.format(username=username)
+    if cache.client is not None:
+        cached_user_id = await cache.client.get(key)
+        if cached_user_id is not None:
+            user_id = int(cached_user_id)
+            _set_local(username, user_id)
+            return user_id
+
+    db_user = await crud_users.get(db=db, schema_to_select=UserRead, username=username, is_deleted=False)
+    if db_user is None:
+        return None
+
+    user_id = db_user["id"]
+    _set_local(username, user_id)
+    if cache.client is not None:
+        await cache.client.set(key, user_id, ex=settings.USER_ID_CACHE_EXPIRATION)
+
+    return user_id
+
+
+async def invalidate_user_id(username: str) -> None:
+    """Forget the cached id of a username, in this process and in Redis.
+
+    Parameters
+    ----------
+    username: str
+        The username whose mapping must not be served anymore.
+    """
+    _local_cache.pop(username, None)
+    if cache.client is not None:
+        await cache.client.delete(USER_ID_KEY.format(username=username))
@@ -0,0 +1,388 @@
+import asyncio
+import json
+import os
+import uuid as uuid_pkg
+from collections import defaultdict
+from collections.abc import AsyncIterator
+from datetime import UTC, datetime
+from typing import Any
+
+from sqlalchemy import delete, distinct, insert, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # the archive extra is not installed
+    pa = None
+
+from ...models.vapi_end_of_call import VapiEndOfCall
+from ...models.vapi_end_of_call_archive import VapiEndOfCallArchive
+from ...models.vapi_end_of_call_call_id import VapiEndOfCallCallId
+from ..config import settings
+from ..exceptions.archive_exceptions import MissingArchiveDependencyError
+from ..logger import logging
+
+logger = logging.getLogger(__name__)
+
+# rows per record batch, a point read decompresses a single batch
+RECORD_BATCH_SIZE = 256
+JSON_COLUMNS = ("call", "phone_number", "messages")
+
+
+def _schema() -> "pa.Schema":
+    timestamp = pa.timestamp("us", tz="UTC")
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("created_by_user_id", pa.int64()),
+            ("type", pa.string()),
+            ("call_id", pa.string()),
+            ("ended_reason", pa.string()),
+            ("call", pa.string()),
+            ("phone_number", pa.string()),
+            ("summary", pa.string()),
+            ("transcript", pa.string()),
+            ("messages", pa.string()),
+            ("recording_url", pa.string()),
+            ("stereo_recording_url", pa.string()),
+            ("uuid", pa.string()),
+            ("created_at", timestamp),
+            ("updated_at", timestamp),
+            ("deleted_at", timestamp),
+            ("is_deleted", pa.bool_()),
+        ]
+    )
+
+
+def _to_record(end_of_call: VapiEndOfCall) -> dict[str, Any]:
+    record = {name: getattr(end_of_call, name) for name in _schema().names}
+    for name in JSON_COLUMNS:
+        record[name] = json.dumps(record[name])
+    record["uuid"] = str(record["uuid"])
+    return record
+
+
+def _from_record(record: dict[str, Any]) -> dict[str, Any]:
+    for name in JSON_COLUMNS:
+        record[name] = json.loads(record[name])
+    record["uuid"] = uuid_pkg.UUID(record["uuid"])
+    return record
+
+
+def _write_file(relative_path: str, records: list[dict[str, Any]]) -> None:
+    """Write records to a zstd-compressed Arrow IPC file, atomically."""
+    path = os.path.join(settings.VAPI_ARCHIVE_DIR, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    schema = _schema()
+    table = pa.Table.from_pylist(records, schema=schema)
+    options = pa.ipc.IpcWriteOptions(compression="zstd")
+    with pa.OSFile(f"{path}.tmp", "wb") as sink, pa.ipc.new_file(sink, schema, options=options) as writer:
+        writer.write_table(table, max_chunksize=RECORD_BATCH_SIZE)
+
+    os.replace(f"{path}.tmp", path)
+
+
+def _read_record(relative_path: str, batch_index: int, row_index: int) -> dict[str, Any]:
+    with pa.memory_map(os.path.join(settings.VAPI_ARCHIVE_DIR, relative_path)) as source:
+        record_batch = pa.ipc.open_file(source).get_batch(batch_index)
+        return record_batch.slice(row_index, 1).to_pylist()[0]
+
+
+def _read_records(relative_path: str) -> list[dict[str, Any]]:
+    with pa.memory_map(os.path.join(settings.VAPI_ARCHIVE_DIR, relative_path)) as source:
+        return pa.ipc.open_file(source).read_all().to_pylist()
+
+
+async def archive_end_of_calls(db: AsyncSession, before: datetime, batch_size: int | None = None) -> int:
+    """Move the end-of-call reports created before `before` from the database to the archive files.
+
+    Reports are written to compressed Arrow IPC files under `VAPI_ARCHIVE_DIR`, one file per user and month and
+    archival batch (`user_{id}/{year}-{month}/{uuid}.arrow`). Each batch then indexes the reports in
+    `vapi_end_of_call_archive` and deletes them from `vapi_end_of_call` in a single transaction, keeping their call
+    ids in `vapi_end_of_call_call_id` so that their calls are not ingested again.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session to use.
+    before: datetime
+        The reports created before this moment are archived.
+    batch_size: int | None, optional
+        The number of reports moved per transaction. Defaults to `VAPI_ARCHIVE_BATCH_SIZE`.
+
+    Returns
+    -------
+    int
+        The number of archived reports.
+
+    Raises
+    ------
+    MissingArchiveDependencyError
+        If pyarrow is not installed.
+    """
+    if pa is None:
+        raise MissingArchiveDependencyError
+
+    batch_size = batch_size or settings.VAPI_ARCHIVE_BATCH_SIZE
+    # the order of ix_vapi_end_of_call_created_by_user_id_created_at_id, each batch goes on from the last archived key
+    # instead of scanning the index entries of the reports it deleted again
+    order = (VapiEndOfCall.created_by_user_id, VapiEndOfCall.created_at, VapiEndOfCall.id)
+    last_key = None
+    archived = 0
+    while True:
+        stmt = select(VapiEndOfCall).where(VapiEndOfCall.created_at < before).order_by(*order).limit(batch_size)
+        if last_key is not None:
+            stmt = stmt.where(tuple_(*order) > tuple_(*last_key))
+        end_of_calls = (await db.execute(stmt)).scalars().all()
+        if not end_of_calls:
+            break
+
+        last_key = tuple(getattr(end_of_calls[-1], column.key) for column in order)
+
+        groups: dict[tuple[int, str], list[VapiEndOfCall]] = defaultdict(list)
+        for end_of_call in end_of_calls:
+            groups[(end_of_call.created_by_user_id, end_of_call.created_at.strftime("%Y-%m"))].append(end_of_call)
+
+        archived_at = datetime.now(UTC)
+        index_rows = []
+        for (user_id, month), group in groups.items():
+            relative_path = os.path.join(f"user_{user_id}", month, f"{uuid_pkg.uuid4().hex}.arrow")
+            await asyncio.to_thread(_write_file, relative_path, [_to_record(end_of_call) for end_of_call in group])
+            index_rows.extend(
+                {
+                    "id": end_of_call.id,
+                    "call_id": end_of_call.call_id,
+                    "created_by_user_id": user_id,
+                    "path": relative_path,
+                    "batch_index": position // RECORD_BATCH_SIZE,
+                    "row_index": position % RECORD_BATCH_SIZE,
+                    "created_at": end_of_call.created_at,
+                    "archived_at": archived_at,
+                }
+                for position, end_of_call in enumerate(group)
+            )
+
+        await db.execute(insert(VapiEndOfCallArchive), index_rows)
+        await db.execute(
+            delete(VapiEndOfCall).where(
+                VapiEndOfCall.created_at < before,
+                VapiEndOfCall.id.in_([end_of_call.id for end_of_call in end_of_calls]),
+            )
+        )
+        # the delete trigger released the call ids of the archived reports
+        await db.execute(
+            pg_insert(VapiEndOfCallCallId)
+            .values([{"call_id": row["call_id"], "created_at": row["created_at"]} for row in index_rows])
+            .on_conflict_do_nothing(index_elements=[VapiEndOfCallCallId.call_id])
+        )
+        await db.commit()
+        db.expunge_all()
+
+        archived += len(end_of_calls)
+        logger.info(f"Archived {archived} end-of-call reports")
+
+    return archived
+
+
+async def read_archived_end_of_call(db: AsyncSession, id: int, created_by_user_id: int) -> dict[str, Any] | None:
+    """Read a non-deleted end-of-call report back from the archive.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session used to look the report up in the archive index.
+    id: int
+        The id the report had in `vapi_end_of_call`.
+    created_by_user_id: int
+        The owner of the report.
+
+    Returns
+    -------
+    dict[str, Any] | None
+        All the columns of the report, or None if it is not archived or was deleted.
+
+    Raises
+    ------
+    MissingArchiveDependencyError
+        If the report is archived but pyarrow is not installed.
+    """
+    location = (
+        await db.execute(
+            select(VapiEndOfCallArchive.path, VapiEndOfCallArchive.batch_index, VapiEndOfCallArchive.row_index).where(
+                VapiEndOfCallArchive.id == id,
+                VapiEndOfCallArchive.created_by_user_id == created_by_user_id,
+                ~VapiEndOfCallArchive.is_deleted,
+            )
+        )
+    ).one_or_none()
+    if location is None:
+        return None
+
+    if pa is None:
+        raise MissingArchiveDependencyError
+
+    record = _from_record(
+        await asyncio.to_thread(_read_record, location.path, location.batch_index, location.row_index)
+    )
+    if record["is_deleted"]:
+        return None
+
+    return record
+
+
+async def iter_archived_end_of_calls(db: AsyncSession, created_by_user_id: int) -> AsyncIterator[list[dict[str, Any]]]:
+    """Read all the non-deleted archived end-of-call reports of a user back, one archive file at a time.
+
+    A file holds at most `VAPI_ARCHIVE_BATCH_SIZE` reports, so are the lists yielded.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session used to list the archive files of the user.
+    created_by_user_id: int
+        The owner of the reports.
+
+    Yields
+    ------
+    list[dict[str, Any]]
+        All the columns of the reports of an archive file.
+
+    Raises
+    ------
+    MissingArchiveDependencyError
+        If pyarrow is not installed.
+    """
+    if pa is None:
+        raise MissingArchiveDependencyError
+
+    paths = (
+        await db.scalars(
+            select(distinct(VapiEndOfCallArchive.path))
+            .where(VapiEndOfCallArchive.created_by_user_id == created_by_user_id, ~VapiEndOfCallArchive.is_deleted)
+            .order_by(VapiEndOfCallArchive.path)
+        )
+    ).all()
+    deleted_ids = set(
+        (
+            await db.scalars(
+                select(VapiEndOfCallArchive.id).where(
+                    VapiEndOfCallArchive.created_by_user_id == created_by_user_id, VapiEndOfCallArchive.is_deleted
+                )
+            )
+        ).all()
+    )
+    for relative_path in paths:
+        records = await asyncio.to_thread(_read_records, relative_path)
+        yield [
+            _from_record(record) for record in records if not record["is_deleted"] and record["id"] not in deleted_ids
+        ]
+
+
+async def delete_archived_end_of_call(db: AsyncSession, id: int, created_by_user_id: int) -> bool:
+    """Soft delete an archived end-of-call report, by marking its index row deleted.
+
+    The archive file is left untouched, reads skip the reports whose index row is deleted.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session to use.
+    id: int
+        The id the report had in `vapi_end_of_call`.
+    created_by_user_id: int
+        The owner of the report.
+
+    Returns
+    -------
+    bool
+        Whether a non-deleted archived report was deleted.
+    """
+    result = await db.execute(
+        update(VapiEndOfCallArchive)
+        .where(
+            VapiEndOfCallArchive.id == id,
+            VapiEndOfCallArchive.created_by_user_id == created_by_user_id,
+            ~VapiEndOfCallArchive.is_deleted,
+        )
+        .values(is_deleted=True, deleted_at=datetime.now(UTC))
+    )
+    await db.commit()
+    return result.rowcount > 0
+
+
+async def db_delete_archived_end_of_call(db: AsyncSession, id: int, created_by_user_id: int) -> bool:
+    """Permanently delete an archived end-of-call report, deleted or not.
+
+    The archive file holding the report is rewritten without it, under a new name, and the index rows of the other
+    reports of the file are moved to the new file in the same transaction as the deletion of the report. The call id
+    of the report is released, like a delete from `vapi_end_of_call` does.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session to use.
+    id: int
+        The id the report had in `vapi_end_of_call`.
+    created_by_user_id: int
+        The owner of the report.
+
+    Returns
+    -------
+    bool
+        Whether an archived report was deleted.
+
+    Raises
+    ------
+    MissingArchiveDependencyError
+        If the report is archived but pyarrow is not installed.
+    """
+    # locks the index rows of the file, a concurrent rewrite of the same file waits for this one
+    location = (
+        await db.execute(
+            select(VapiEndOfCallArchive.path, VapiEndOfCallArchive.call_id)
+            .where(VapiEndOfCallArchive.id == id, VapiEndOfCallArchive.created_by_user_id == created_by_user_id)
+            .with_for_update()
+        )
+    ).one_or_none()
+    if location is None:
+        return False
+
+    if pa is None:
+        raise MissingArchiveDependencyError
+
+    await db.execute(
+        select(VapiEndOfCallArchive.id).where(VapiEndOfCallArchive.path == location.path).with_for_update()
+    )
+    records = [record for record in await asyncio.to_thread(_read_records, location.path) if record["id"] != id]
+
+    new_path = None
+    if records:
+        new_path = os.path.join(os.path.dirname(location.path), f"{uuid_pkg.uuid4().hex}.arrow")
+        await asyncio.to_thread(_write_file, new_path, records)
+        await db.execute(
+            update(VapiEndOfCallArchive),
+            [
+                {
+                    "id": record["id"],
+                    "path": new_path,
+                    "batch_index": position // RECORD_BATCH_SIZE,
+                    "row_index": position % RECORD_BATCH_SIZE,
+                }
+                for position, record in enumerate(records)
+            ],
+        )
+
+    await db.execute(delete(VapiEndOfCallArchive).where(VapiEndOfCallArchive.id == id))
+    await db.execute(delete(VapiEndOfCallCallId).where(VapiEndOfCallCallId.call_id == location.call_id))
+    try:
+        await db.commit()
+    except Exception:
+        if new_path is not None:
+            os.remove(os.path.join(settings.VAPI_ARCHIVE_DIR, new_path))
+        raise
+
+    os.remove(os.path.join(settings.VAPI_ARCHIVE_DIR, location.path))
+    return True
@@ -0,0 +1,139 @@
+from collections.abc import AsyncIterator
+from typing import Any
+
+from pydantic import ValidationError
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...crud.crud_vapi_end_of_calls import crud_vapi_end_of_calls
+from ...schemas.vapi_end_of_call import VapiEndOfCallCreateInternal
+from ...schemas.vapi_server_message import VapiServerMessageInternal
+from ..config import settings
+
+Record = tuple[int, VapiEndOfCallCreateInternal]
+
+
+async def iter_ndjson_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Split a stream of bytes into NDJSON lines, without holding more than one line in memory.
+
+    Parameters
+    ----------
+    chunks: AsyncIterator[bytes]
+        The byte chunks, e.g. `request.stream()`.
+
+    Yields
+    ------
+    bytes
+        Each line of the stream, without its line break.
+    """
+    # the chunks of the line being received, joined once its line break arrives so a long line is copied once
+    pending: list[bytes] = []
+    async for chunk in chunks:
+        first_break = chunk.find(b"\n")
+        if first_break < 0:
+            pending.append(chunk)
+            continue
+
+        pending.append(chunk[:first_break])
+        yield b"".join(pending)
+
+        last_break = chunk.rfind(b"\n")
+        if last_break > first_break:
+            for line in chunk[first_break + 1 : last_break].split(b"\n"):
+                yield line
+        pending = [chunk[last_break + 1 :]]
+
+    line = b"".join(pending)
+    if line:
+        yield line
+
+
+def _format_validation_error(e: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}" for error in e.errors())
+
+
+async def _write_records(db: AsyncSession, records: list[Record], failures: list[dict[str, Any]]) -> int:
+    """Insert validated records, bisecting the chunk on database errors to find the faulty records."""
+    try:
+        inserted_call_ids = await crud_vapi_end_of_calls.create_many(db, [end_of_call for _, end_of_call in records])
+
+    except SQLAlchemyError as e:
+        await db.rollback()
+        if len(records) == 1:
+            failures.append({"line": records[0][0], "error": str(e.orig if hasattr(e, "orig") else e)})
+            return 0
+
+        middle = len(records) // 2
+        return await _write_records(db, records[:middle], failures) + await _write_records(
+            db, records[middle:], failures
+        )
+
+    created = len(inserted_call_ids)
+    for line_number, end_of_call in records:
+        if end_of_call.call_id in inserted_call_ids:
+            inserted_call_ids.discard(end_of_call.call_id)
+        else:
+            failures.append({"line": line_number, "error": f"Duplicate call_id {end_of_call.call_id}"})
+
+    return created
+
+
+async def ingest_end_of_calls_ndjson(
+    db: AsyncSession, lines: AsyncIterator[bytes], created_by_user_id: int, chunk_size: int | None = None
+) -> dict[str, Any]:
+    """Bulk ingest end-of-call reports from NDJSON lines.
+
+    Each line is the body of a `/{username}/vapi_server_message` request holding an `end-of-call-report`. Lines are
+    validated and inserted in chunks of `chunk_size`, each chunk with a single multi-row `INSERT` committed on its own.
+    Invalid records, duplicated calls and records rejected by the database are reported and do not abort the rest.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session to write with.
+    lines: AsyncIterator[bytes]
+        The NDJSON lines. Blank lines are skipped.
+    created_by_user_id: int
+        The owner of the ingested reports.
+    chunk_size: int | None, optional
+        The number of records per `INSERT`. Defaults to `VAPI_BULK_INGESTION_CHUNK_SIZE`.
+
+    Returns
+    -------
+    dict[str, Any]
+        The number of records received and created, and the failures with their 1-based line number.
+    """
+    chunk_size = chunk_size or settings.VAPI_BULK_INGESTION_CHUNK_SIZE
+    context = {"created_by_user_id": created_by_user_id}
+
+    received = 0
+    created = 0
+    failures: list[dict[str, Any]] = []
+    records: list[Record] = []
+
+    line_number = 0
+    async for line in lines:
+        line_number += 1
+        if not line.strip():
+            continue
+
+        received += 1
+        try:
+            message = VapiServerMessageInternal.model_validate_json(line, context=context).message
+        except ValidationError as e:
+            failures.append({"line": line_number, "error": _format_validation_error(e)})
+            continue
+
+        if not isinstance(message, VapiEndOfCallCreateInternal):
+            failures.append({"line": line_number, "error": f"Unsupported message type {message.type}"})
+            continue
+
+        records.append((line_number, message))
+        if len(records) >= chunk_size:
+            created += await _write_records(db, records, failures)
+            records = []
+
+    if records:
+        created += await _write_records(db, records, failures)
+
+    return {"received": received, "created": created, "failures": failures}
@@ -0,0 +1,217 @@
+import asyncio
+import json
+from collections.abc import AsyncIterator
+from typing import Any
+
+from arq.connections import ArqRedis
+from redis.exceptions import RedisError
+
+from ...schemas.vapi_conversation_update import VapiConversationUpdateCreateInternal
+from ...schemas.vapi_end_of_call import VapiEndOfCallCreateInternal
+from ..config import settings
+from ..exceptions.cache_exceptions import MissingClientError
+from ..logger import logging
+from . import queue
+
+logger = logging.getLogger(__name__)
+
+EVENTS_CHANNEL = "vapi_events:{user_id}"
+EVENTS_CHANNEL_PATTERN = "vapi_events:*"
+CONVERSATION_PUBLISHED_COUNT_KEY = "vapi_conversation_published_count:{call_id}"
+CONVERSATION_PUBLISHED_COUNT_EXPIRATION = 86400
+RECONNECT_DELAY_SECONDS = 1
+
+
+class _Client:
+    """A Server-Sent Events client of this web worker, with its own bounded queue of frames."""
+
+    def __init__(self, call_id: str | None) -> None:
+        self.call_id = call_id
+        # room for at least a last frame and the end of the stream
+        self.frames: asyncio.Queue[bytes | None] = asyncio.Queue(maxsize=max(settings.VAPI_EVENTS_CLIENT_QUEUE_SIZE, 2))
+
+    def close(self, last_frame: bytes | None = None) -> None:
+        """End the stream of the client, after `last_frame` if given.
+
+        The pending frames are dropped when there is no room left for the end of the stream.
+        """
+        frames = [last_frame, None] if last_frame is not None else [None]
+        while self.frames.maxsize - self.frames.qsize() < len(frames):
+            self.frames.get_nowait()
+        for frame in frames:
+            self.frames.put_nowait(frame)
+
+
+# the clients connected to this web worker, by user id
+_clients: dict[int, set[_Client]] = {}
+# the subscription shared by all the clients of this web worker
+_listener: asyncio.Task | None = None
+
+
+async def _publish(redis: ArqRedis, user_id: int, event: str, data: dict[str, Any]) -> None:
+    await redis.publish(EVENTS_CHANNEL.format(user_id=user_id), json.dumps({"event": event, "data": data}))
+
+
+async def publish_conversation_update(
+    redis: ArqRedis, conversation_update: VapiConversationUpdateCreateInternal
+) -> None:
+    """Publish the turns of a conversation update that have not been published yet.
+
+    Every `conversation-update` carries the whole conversation so far, only the new turns are published. The event
+    also carries the sequence of its first turn, so that clients can drop turns they already have (e.g. from
+    `GET /{username}/vapi_conversation_update/{id}/turns`).
+
+    Parameters
+    ----------
+    redis: ArqRedis
+        The queue Redis, shared by the web workers and the arq worker.
+    conversation_update: VapiConversationUpdateCreateInternal
+        The conversation update that was just received.
+    """
+    call_id = conversation_update.id
+    conversation = conversation_update.conversation
+    published_count = await redis.set(
+        CONVERSATION_PUBLISHED_COUNT_KEY.format(call_id=call_id),
+        len(conversation),
+        ex=CONVERSATION_PUBLISHED_COUNT_EXPIRATION,
+        get=True,
+    )
+    from_sequence = int(published_count or 0)
+    if from_sequence >= len(conversation):
+        return
+
+    await _publish(
+        redis,
+        conversation_update.created_by_user_id,
+        "conversation-update",
+        {"call_id": call_id, "from_sequence": from_sequence, "turns": conversation[from_sequence:]},
+    )
+
+
+async def publish_end_of_call(redis: ArqRedis, end_of_call: VapiEndOfCallCreateInternal) -> None:
+    """Publish the end of a call, which ends the streams following that call."""
+    await _publish(
+        redis,
+        end_of_call.created_by_user_id,
+        "end-of-call-report",
+        {"call_id": end_of_call.call_id, "ended_reason": end_of_call.ended_reason},
+    )
+
+
+def _fan_out(channel: bytes, payload: bytes) -> None:
+    clients = _clients.get(int(channel.rsplit(b":", 1)[1]))
+    if not clients:
+        return
+
+    message = json.loads(payload)
+    call_id = message["data"]["call_id"]
+    # the frame is built once and shared by all the clients
+    frame = f"event: {message['event']}\ndata: {json.dumps(message['data'])}\n\n".encode()
+    for client in list(clients):
+        if client.call_id is not None:
+            if client.call_id != call_id:
+                continue
+
+            if message["event"] == "end-of-call-report":
+                # the call is over, so is the stream following it
+                clients.discard(client)
+                client.close(last_frame=frame)
+                continue
+
+        try:
+            client.frames.put_nowait(frame)
+        except asyncio.QueueFull:
+            logger.warning(f"Disconnecting a slow Vapi events client from {channel.decode()}")
+            clients.discard(client)
+            client.close()
+
+
+async def _listen() -> None:
+    """Receive the events of every user on a single subscription and fan them out to the clients of this worker."""
+    while True:
+        pubsub = queue.pool.pubsub(ignore_subscribe_messages=True)  # type: ignore
+        try:
+            await pubsub.psubscribe(EVENTS_CHANNEL_PATTERN)
+            async for message in pubsub.listen():
+                _fan_out(message["channel"], message["data"])
+
+        except RedisError as e:
+            logger.error(f"Lost the Vapi events subscription, reconnecting: {e}")
+
+        finally:
+            await pubsub.aclose()
+
+        await asyncio.sleep(RECONNECT_DELAY_SECONDS)
+
+
+async def _stream(user_id: int, call_id: str | None) -> AsyncIterator[bytes]:
+    client = _Client(call_id)
+    _clients.setdefault(user_id, set()).add(client)
+    try:
+        # tells the client it is subscribed, events published from now on are delivered
+        yield b": connected\n\n"
+        while True:
+            try:
+                frame = await asyncio.wait_for(client.frames.get(), timeout=settings.VAPI_EVENTS_KEEPALIVE_SECONDS)
+            except TimeoutError:
+                yield b": keepalive\n\n"
+                continue
+
+            if frame is None:
+                return
+
+            yield frame
+
+    finally:
+        clients = _clients.get(user_id, set())
+        clients.discard(client)
+        if not clients:
+            _clients.pop(user_id, None)
+
+
+def open_event_stream(user_id: int, call_id: str | None = None) -> AsyncIterator[bytes]:
+    """Open a Server-Sent Events stream of the live conversation updates of a user.
+
+    The first stream opened in a web worker starts its shared subscription, the events are then fanned out in process
+    to all the streams of the worker. A client that does not keep up with its events is disconnected.
+
+    Parameters
+    ----------
+    user_id: int
+        The user whose events are streamed.
+    call_id: str | None, optional
+        Only stream the events of this call. The stream then ends with the end-of-call report of the call.
+
+    Returns
+    -------
+    AsyncIterator[bytes]
+        The `text/event-stream` frames, with a keepalive comment every `VAPI_EVENTS_KEEPALIVE_SECONDS` of silence.
+
+    Raises
+    ------
+    MissingClientError
+        If the queue pool has not been initialized.
+    """
+    global _listener
+
+    if queue.pool is None:
+        raise MissingClientError
+
+    if _listener is None or _listener.done():
+        _listener = asyncio.create_task(_listen())
+
+    return _stream(user_id, call_id)
+
+
+async def close_event_streams() -> None:
+    """End every stream of this web worker and stop its subscription."""
+    global _listener
+
+    for clients in _clients.values():
+        for client in clients:
+            client.close()
+    _clients.clear()
+
+    if _listener is not None:
+        _listener.cancel()
+        _listener = None
@@ -0,0 +1,122 @@
+import csv
+import io
+import json
+from collections.abc import AsyncIterator, Sequence
+from datetime import datetime
+from typing import Any, Literal
+
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...models.vapi_end_of_call import VapiEndOfCall
+from ...models.vapi_end_of_call_archive import VapiEndOfCallArchive
+from ..config import settings
+from ..db.database import local_session
+from ..exceptions.archive_exceptions import MissingArchiveDependencyError
+from . import vapi_archive
+
+ExportFormat = Literal["ndjson", "csv"]
+
+EXPORT_COLUMNS = (
+    "id",
+    "call_id",
+    "created_by_user_id",
+    "type",
+    "ended_reason",
+    "call",
+    "phone_number",
+    "summary",
+    "transcript",
+    "messages",
+    "recording_url",
+    "stereo_recording_url",
+    "created_at",
+)
+# written as JSON in the cells of a CSV export
+JSON_COLUMNS = ("call", "phone_number", "messages")
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def _jsonable(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _to_ndjson(rows: Sequence[Any]) -> bytes:
+    return "".join(
+        json.dumps({name: _jsonable(row[name]) for name in EXPORT_COLUMNS}) + "\n" for row in rows
+    ).encode()
+
+
+def _to_csv(rows: Sequence[Any]) -> bytes:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow(
+            [
+                json.dumps(row[name]) if name in JSON_COLUMNS and row[name] is not None else _jsonable(row[name])
+                for name in EXPORT_COLUMNS
+            ]
+        )
+    return buffer.getvalue().encode()
+
+
+async def _stream(created_by_user_id: int, export_format: ExportFormat, include_archived: bool) -> AsyncIterator[bytes]:
+    serialize = _to_csv if export_format == "csv" else _to_ndjson
+    if export_format == "csv":
+        yield ",".join(EXPORT_COLUMNS).encode() + b"\r\n"
+
+    # the session of the request is closed before the response is streamed, the export opens its own
+    async with local_session() as db:
+        result = await db.stream(
+            select(*[getattr(VapiEndOfCall, name) for name in EXPORT_COLUMNS])
+            .where(VapiEndOfCall.created_by_user_id == created_by_user_id, ~VapiEndOfCall.is_deleted)
+            .order_by(VapiEndOfCall.id)
+            .execution_options(yield_per=settings.VAPI_EXPORT_BATCH_SIZE)
+        )
+        async for rows in result.mappings().partitions():
+            yield serialize(rows)
+
+        if include_archived:
+            async for records in vapi_archive.iter_archived_end_of_calls(db, created_by_user_id):
+                yield serialize(records)
+
+
+async def open_end_of_calls_export(
+    db: AsyncSession, created_by_user_id: int, export_format: ExportFormat = "ndjson"
+) -> AsyncIterator[bytes]:
+    """Open a streaming export of all the non-deleted end-of-call reports of a user, archived ones included.
+
+    Reports are read from a server-side cursor `VAPI_EXPORT_BATCH_SIZE` rows at a time and each batch is written as
+    soon as it arrives, so the memory used does not depend on the number of reports. The archived reports follow,
+    one archive file at a time.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The session of the request, used to check the archive before the response starts.
+    created_by_user_id: int
+        The owner of the reports.
+    export_format: ExportFormat, optional
+        `ndjson`, one JSON object per line, or `csv` with a header row and the JSON columns as JSON strings.
+
+    Returns
+    -------
+    AsyncIterator[bytes]
+        The chunks of the export, see `MEDIA_TYPES` for their content type.
+
+    Raises
+    ------
+    MissingArchiveDependencyError
+        If the user has archived reports but pyarrow is not installed.
+    """
+    include_archived = await db.scalar(
+        select(
+            exists().where(
+                VapiEndOfCallArchive.created_by_user_id == created_by_user_id, ~VapiEndOfCallArchive.is_deleted
+            )
+        )
+    )
+    if include_archived and vapi_archive.pa is None:
+        raise MissingArchiveDependencyError
+
+    return _stream(created_by_user_id, export_format, include_archived)
@@ -0,0 +1,421 @@
+import json
+import time
+from datetime import UTC, datetime
+from typing import Any
+
+from arq.connections import ArqRedis
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ...crud.crud_vapi_conversation_turns import crud_vapi_conversation_turns
+from ...crud.crud_vapi_conversation_updates import crud_vapi_conversation_updates
+from ...crud.crud_vapi_end_of_calls import crud_vapi_end_of_calls
+from ...schemas.vapi_conversation_update import VapiConversationUpdateCreateInternal
+from ...schemas.vapi_end_of_call import VapiEndOfCallCreateInternal
+from ...schemas.vapi_server_message import VapiServerMessageInternal
+from ..config import settings
+from ..exceptions.cache_exceptions import MissingClientError
+from ..logger import logging
+from . import cache, queue
+from .user_cache import resolve_user_id
+from .vapi_events import publish_conversation_update, publish_end_of_call
+
+logger = logging.getLogger(__name__)
+
+BUFFER_KEY = "vapi_server_message_buffer"
+# the payloads taken from the buffer by a persist job, until they are committed
+PROCESSING_KEY = "vapi_server_message_processing:{job_id}"
+# the payloads that still failed on the last try of their persist job
+DEAD_LETTER_KEY = "vapi_server_message_dead_letter"
+# moves up to ARGV[1] payloads from the buffer to a processing list, returning them
+MOVE_BATCH_SCRIPT = """
+local payloads = {}
+for _ = 1, tonumber(ARGV[1]) do
+    local payload = redis.call("LMOVE", KEYS[1], KEYS[2], "LEFT", "RIGHT")
+    if not payload then
+        break
+    end
+    table.insert(payloads, payload)
+end
+return payloads
+"""
+PERSIST_JOB_NAME = "persist_vapi_server_messages"
+FLUSH_JOB_NAME = "flush_vapi_conversation_update"
+FINALIZE_JOB_NAME = "finalize_vapi_conversation_update"
+CONVERSATION_UPDATE_STATE_KEY = "vapi_conversation_update_state:{call_id}"
+CONVERSATION_UPDATE_FLUSH_GATE_KEY = "vapi_conversation_update_flush_gate:{call_id}"
+# set while a finalize job is scheduled for the staged conversation of a call
+CONVERSATION_UPDATE_FINALIZE_KEY = "vapi_conversation_update_finalize:{call_id}"
+CONVERSATION_TURN_COUNT_KEY = "vapi_conversation_turn_count:{call_id}"
+CONVERSATION_UPDATE_STATE_EXPIRATION = 86400
+END_OF_CALL_RESPONSE_KEY = "vapi_end_of_call_response:{call_id}"
+END_OF_CALL_PENDING = b"pending"
+# the response of a message accepted in queue mode, stored for its end-of-call report once it is written
+QUEUED_RESPONSE = {"message": "VapiServerMessage queued"}
+
+_last_scheduled_window: int | None = None
+
+
+async def _schedule_persist_job() -> None:
+    """Make sure a persist job is scheduled at the end of the current batch window.
+
+    One job is enqueued per window with a deterministic job id, so arq deduplicates concurrent schedules coming from
+    different web workers. Each process also remembers the last window it scheduled to skip the extra round trips.
+    """
+    global _last_scheduled_window
+
+    window_ms = settings.VAPI_INGESTION_BATCH_WINDOW_MS
+    window = int(time.time() * 1000) // window_ms
+    if window == _last_scheduled_window:
+        return
+
+    await queue.pool.enqueue_job(  # type: ignore
+        PERSIST_JOB_NAME,
+        _job_id=f"{PERSIST_JOB_NAME}:{window}",
+        _defer_until=datetime.fromtimestamp((window + 1) * window_ms / 1000, tz=UTC),
+    )
+    _last_scheduled_window = window
+
+
+async def enqueue_vapi_server_message(username: str, body: bytes) -> None:
+    """Push an already validated Vapi server message onto the ingestion buffer.
+
+    Parameters
+    ----------
+    username: str
+        The username the message was posted for. It is resolved to a user id by the worker.
+    body: bytes
+        The raw JSON request body. It is buffered as is, without being decoded and encoded again.
+
+    Raises
+    ------
+    MissingClientError
+        If the queue pool has not been initialized.
+    """
+    if queue.pool is None:
+        raise MissingClientError
+
+    await queue.pool.rpush(BUFFER_KEY, b'{"username":' + json.dumps(username).encode() + b',"body":' + body + b"}")
+    await _schedule_persist_job()
+
+
+async def claim_end_of_call(call_id: str, response: bytes = END_OF_CALL_PENDING) -> bytes | None:
+    """Claim the ingestion of an end-of-call report, so that retried webhooks for the same call are not written again.
+
+    The claim is a `SET NX` with a TTL on the Redis cache. The first request for a call sets `response` (by default
+    the `END_OF_CALL_PENDING` marker, replaced by the actual response with `store_end_of_call_response`), the
+    following ones get the stored value back.
+
+    Parameters
+    ----------
+    call_id: str
+        The Vapi call id of the end-of-call report.
+    response: bytes
+        The value to store with the claim.
+
+    Returns
+    -------
+    bytes | None
+        None if the call was claimed by this request, otherwise the stored response, or `END_OF_CALL_PENDING` if the
+        first request is still being processed.
+
+    Raises
+    ------
+    MissingClientError
+        If the Redis cache client has not been initialized.
+    """
+    if cache.client is None:
+        raise MissingClientError
+
+    key = END_OF_CALL_RESPONSE_KEY.format(call_id=call_id)
+    claimed = await cache.client.set(key, response, ex=settings.VAPI_END_OF_CALL_IDEMPOTENCY_EXPIRATION, nx=True)
+    if claimed:
+        return None
+
+    stored_response = await cache.client.get(key)
+    return stored_response if stored_response is not None else END_OF_CALL_PENDING
+
+
+async def store_end_of_call_response(call_id: str, response: bytes) -> None:
+    """Store the response of a claimed end-of-call report, to answer its duplicates with."""
+    await cache.client.set(  # type: ignore
+        END_OF_CALL_RESPONSE_KEY.format(call_id=call_id), response, ex=settings.VAPI_END_OF_CALL_IDEMPOTENCY_EXPIRATION
+    )
+
+
+async def release_end_of_call(call_id: str) -> None:
+    """Release the claim of an end-of-call report that failed to be ingested, so that a retry can go through."""
+    await cache.client.delete(END_OF_CALL_RESPONSE_KEY.format(call_id=call_id))  # type: ignore
+
+
+async def stage_conversation_update(redis: ArqRedis, conversation_update: VapiConversationUpdateCreateInternal) -> None:
+    """Keep the latest conversation of a call in Redis and schedule a write to the database.
+
+    Every `conversation-update` carries the whole conversation so far, so only the latest state needs to be written.
+    The first update of each flush interval acquires a short-lived gate and schedules a flush job at the end of the
+    interval; the updates that follow inside the interval only overwrite the staged state. A finalize job is also
+    scheduled for calls that have none, in case their end-of-call report never arrives. The new turns are published
+    right away to the live event streams.
+
+    Parameters
+    ----------
+    redis: ArqRedis
+        The queue Redis, shared by the web workers and the arq worker.
+    conversation_update: VapiConversationUpdateCreateInternal
+        The conversation update to stage.
+    """
+    call_id = conversation_update.id
+    await redis.set(
+        CONVERSATION_UPDATE_STATE_KEY.format(call_id=call_id),
+        conversation_update.model_dump_json(),
+        ex=CONVERSATION_UPDATE_STATE_EXPIRATION,
+    )
+    await publish_conversation_update(redis, conversation_update)
+
+    gate_acquired = await redis.set(
+        CONVERSATION_UPDATE_FLUSH_GATE_KEY.format(call_id=call_id),
+        1,
+        px=settings.VAPI_CONVERSATION_UPDATE_FLUSH_INTERVAL_MS,
+        nx=True,
+    )
+    if gate_acquired:
+        await _schedule_flush(redis, call_id)
+        finalize_key = CONVERSATION_UPDATE_FINALIZE_KEY.format(call_id=call_id)
+        if await redis.set(finalize_key, 1, ex=CONVERSATION_UPDATE_STATE_EXPIRATION, nx=True):
+            await _schedule_finalize(redis, call_id, settings.VAPI_CONVERSATION_UPDATE_IDLE_TIMEOUT_MS)
+
+
+async def _schedule_flush(redis: ArqRedis, call_id: str) -> None:
+    await redis.enqueue_job(
+        FLUSH_JOB_NAME,
+        call_id,
+        _job_id=f"{FLUSH_JOB_NAME}:{call_id}:{int(time.time() * 1000)}",
+        _defer_by=settings.VAPI_CONVERSATION_UPDATE_FLUSH_INTERVAL_MS / 1000,
+    )
+
+
+async def _schedule_finalize(redis: ArqRedis, call_id: str, defer_ms: int) -> None:
+    await redis.enqueue_job(
+        FINALIZE_JOB_NAME,
+        call_id,
+        _job_id=f"{FINALIZE_JOB_NAME}:{call_id}:{int(time.time() * 1000)}",
+        _defer_by=defer_ms / 1000,
+    )
+
+
+async def _append_conversation_turns(
+    db: AsyncSession, redis: ArqRedis, conversation_update: VapiConversationUpdateCreateInternal
+) -> None:
+    call_id = conversation_update.id
+    turn_count_key = CONVERSATION_TURN_COUNT_KEY.format(call_id=call_id)
+
+    stored_turn_count = await redis.get(turn_count_key)
+    if stored_turn_count is None:
+        stored_turn_count = await crud_vapi_conversation_turns.count(db=db, call_id=call_id)
+
+    if int(stored_turn_count) == 0:
+        # the first flush of the call creates its conversation update, the later ones only append turns
+        await crud_vapi_conversation_updates.create_if_missing(db=db, object=conversation_update)
+
+    await crud_vapi_conversation_turns.append(
+        db=db,
+        call_id=call_id,
+        created_by_user_id=conversation_update.created_by_user_id,
+        conversation=conversation_update.conversation,
+        from_sequence=int(stored_turn_count),
+    )
+    await redis.set(turn_count_key, len(conversation_update.conversation), ex=CONVERSATION_UPDATE_STATE_EXPIRATION)
+
+
+async def flush_conversation_update(db: AsyncSession, redis: ArqRedis, call_id: str, final: bool = False) -> None:
+    """Write the staged conversation of a call to the database, if there is one.
+
+    The turns that are not stored yet are appended to `vapi_conversation_turn`, and the first flush of the call creates
+    its conversation update row. The `conversation` column of the row is only rewritten by the final flush, at the end
+    of the call or once the call is idle (see `finalize_conversation_update`), so a call costs a single rewrite of the
+    whole conversation. Until then, the row holds the conversation of the first flush, and the turns endpoint and the
+    event stream serve the live conversation.
+
+    The final flush takes the staged state out of Redis atomically, so concurrent final flushes of the same call write
+    it only once. If it fails, the state is put back unless a newer one has been staged in the meantime. Appending
+    turns is idempotent, and any failed flush schedules another one.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session to write with.
+    redis: ArqRedis
+        The queue Redis the conversation was staged in.
+    call_id: str
+        The Vapi call id, which is also the id of the conversation update.
+    final: bool, optional
+        Whether the call is over, its whole conversation is then written to the conversation update row. Defaults to
+        False.
+    """
+    state_key = CONVERSATION_UPDATE_STATE_KEY.format(call_id=call_id)
+    if final:
+        staged_conversation_update = await redis.getdel(state_key)
+    else:
+        staged_conversation_update = await redis.get(state_key)
+    if staged_conversation_update is None:
+        return
+
+    conversation_update = VapiConversationUpdateCreateInternal.model_validate_json(staged_conversation_update)
+    try:
+        await _append_conversation_turns(db, redis, conversation_update)
+        if final:
+            await crud_vapi_conversation_updates.upsert(db=db, object=conversation_update)
+
+    except Exception:
+        await db.rollback()
+        if final:
+            await redis.set(state_key, staged_conversation_update, ex=CONVERSATION_UPDATE_STATE_EXPIRATION, nx=True)
+        await _schedule_flush(redis, call_id)
+        raise
+
+
+async def finalize_conversation_update(db: AsyncSession, redis: ArqRedis, call_id: str) -> bool:
+    """Write the whole staged conversation of a call that has been idle for `VAPI_CONVERSATION_UPDATE_IDLE_TIMEOUT_MS`.
+
+    The final flush normally comes with the end-of-call report of the call. If it never arrives, the staged state would
+    expire and the conversation update row would keep the conversation of its first flush forever. The idle time of a
+    call is read from the TTL of its staged state, which every update resets; a call that is not idle yet has its
+    finalization scheduled again for when it would be. A call that resumes after being finalized is staged and
+    finalized again.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session to write with.
+    redis: ArqRedis
+        The queue Redis the conversation was staged in.
+    call_id: str
+        The Vapi call id, which is also the id of the conversation update.
+
+    Returns
+    -------
+    bool
+        Whether the staged conversation was written.
+    """
+    finalize_key = CONVERSATION_UPDATE_FINALIZE_KEY.format(call_id=call_id)
+    ttl_ms = await redis.pttl(CONVERSATION_UPDATE_STATE_KEY.format(call_id=call_id))
+    if ttl_ms < 0:
+        # already written by the end-of-call report
+        await redis.delete(finalize_key)
+        return False
+
+    idle_ms = CONVERSATION_UPDATE_STATE_EXPIRATION * 1000 - ttl_ms
+    remaining_ms = settings.VAPI_CONVERSATION_UPDATE_IDLE_TIMEOUT_MS - idle_ms
+    if remaining_ms > 0:
+        await _schedule_finalize(redis, call_id, remaining_ms)
+        return False
+
+    # an update staged from now on schedules the next finalization
+    await redis.delete(finalize_key)
+    try:
+        await flush_conversation_update(db, redis, call_id, final=True)
+    except Exception:
+        if await redis.set(finalize_key, 1, ex=CONVERSATION_UPDATE_STATE_EXPIRATION, nx=True):
+            await _schedule_finalize(redis, call_id, settings.VAPI_CONVERSATION_UPDATE_FLUSH_INTERVAL_MS)
+        raise
+
+    return True
+
+
+async def _write_batch(db: AsyncSession, redis: ArqRedis, payloads: list[dict[str, Any]]) -> None:
+    user_ids: dict[str, int | None] = {}
+    end_of_calls: list[VapiEndOfCallCreateInternal] = []
+    conversation_updates: dict[str, VapiConversationUpdateCreateInternal] = {}
+
+    for payload in payloads:
+        username = payload["username"]
+        if username not in user_ids:
+            user_ids[username] = await resolve_user_id(db=db, username=username)
+
+        if user_ids[username] is None:
+            logger.warning(f"Dropping Vapi server message for unknown user {username}")
+            await _release_end_of_call_claim(payload)
+            continue
+
+        message_internal = VapiServerMessageInternal.model_validate(
+            payload["body"], context={"created_by_user_id": user_ids[username]}
+        ).message
+
+        if message_internal.type == "end-of-call-report":
+            end_of_calls.append(message_internal)
+
+        elif message_internal.type == "conversation-update":
+            # later updates of the same call carry the full conversation, only the latest one needs to be staged
+            conversation_updates[message_internal.id] = message_internal
+
+    for conversation_update in conversation_updates.values():
+        await stage_conversation_update(redis, conversation_update)
+
+    # the end of a call is the last chance to write its conversation
+    for end_of_call in end_of_calls:
+        await flush_conversation_update(db, redis, end_of_call.call_id, final=True)
+
+    # a payload persisted again after a failure is skipped, like any report of an already stored call
+    inserted_call_ids = await crud_vapi_end_of_calls.create_many(db=db, objects=end_of_calls)
+
+    answered: set[str] = set()
+    for end_of_call in end_of_calls:
+        call_id = end_of_call.call_id
+        if call_id not in inserted_call_ids:
+            # the call was stored before this batch, a retry must not be told its report was queued
+            await release_end_of_call(call_id)
+        elif call_id not in answered:
+            await store_end_of_call_response(call_id, json.dumps(QUEUED_RESPONSE).encode())
+            await publish_end_of_call(redis, end_of_call)
+            answered.add(call_id)
+
+
+async def _release_end_of_call_claim(payload: dict[str, Any]) -> None:
+    message = payload["body"]["message"]
+    if message["type"] == "end-of-call-report":
+        await release_end_of_call(message["call"]["id"])
+
+
+async def persist_vapi_server_message_batch(
+    db: AsyncSession, redis: ArqRedis, payloads: list[dict[str, Any]]
+) -> list[dict[str, Any]]:
+    """Persist a batch of buffered Vapi server messages.
+
+    End-of-call reports are written in a single transaction, conversation updates are staged with
+    `stage_conversation_update`. If the batch fails as a whole, it is rolled back and every message is retried on its
+    own so that one bad message does not discard the rest of the batch. Persisting a message again is harmless, so the
+    messages that still fail are returned to be retried later.
+
+    The claim of an end-of-call report is answered with `QUEUED_RESPONSE` once the report is committed. It is released
+    if the report fails, is skipped because its call is already stored or is dropped because its user does not exist,
+    so that a retry of the webhook is not told that a report which was never written was queued.
+
+    Parameters
+    ----------
+    db: AsyncSession
+        The database session to write with.
+    redis: ArqRedis
+        The queue Redis the conversation updates are staged in.
+    payloads: list[dict[str, Any]]
+        The buffered payloads, as pushed by `enqueue_vapi_server_message`.
+
+    Returns
+    -------
+    list[dict[str, Any]]
+        The payloads that could not be persisted.
+    """
+    try:
+        await _write_batch(db, redis, payloads)
+        return []
+
+    except Exception as e:
+        await db.rollback()
+        if len(payloads) == 1:
+            logger.error(f"Failed to persist Vapi server message for user {payloads[0]['username']}: {e}")
+            await _release_end_of_call_claim(payloads[0])
+            return payloads
+
+        logger.warning(f"Failed to persist batch of {len(payloads)} Vapi server messages, retrying one by one: {e}")
+        failed = []
+        for payload in payloads:
+            failed.extend(await persist_vapi_server_message_batch(db, redis, [payload]))
+        return failed
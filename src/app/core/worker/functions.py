@@ -1,8 +1,27 @@
 import asyncio
+import json
 import logging
+from datetime import UTC, datetime, timedelta
 
 import uvloop
-from arq.worker import Worker
+from arq.worker import Retry, Worker
+from sqlalchemy import delete
+
+from ...core.config import settings
+from ...core.db.database import local_session
+from ...core.db.partitions import add_months, create_monthly_partitions, detach_expired_partitions, month_start
+from ...core.setup import close_redis_cache_pool, create_redis_cache_pool
+from ...core.utils.vapi_archive import archive_end_of_calls
+from ...core.utils.vapi_ingestion import (
+    BUFFER_KEY,
+    DEAD_LETTER_KEY,
+    MOVE_BATCH_SCRIPT,
+    PROCESSING_KEY,
+    finalize_conversation_update,
+    flush_conversation_update,
+    persist_vapi_server_message_batch,
+)
+from ...models.vapi_end_of_call_call_id import VapiEndOfCallCallId
 
 asyncio.set_event_loop_policy(uvloop.EventLoopPolicy())
 
@@ -15,10 +34,102 @@ async def sample_background_task(ctx: Worker, name: str) -> str:
     return f"Task {name} is complete!"
 
 
+async def persist_vapi_server_messages(ctx: Worker) -> int:
+    redis = ctx["redis"]
+    # a try of the job keeps its batch in a processing list until it is committed, the next try starts with it
+    processing_key = PROCESSING_KEY.format(job_id=ctx["job_id"])
+    persisted = 0
+    while True:
+        raw_payloads = await redis.lrange(processing_key, 0, -1) or await redis.eval(
+            MOVE_BATCH_SCRIPT, 2, BUFFER_KEY, processing_key, settings.VAPI_INGESTION_BATCH_SIZE
+        )
+        if not raw_payloads:
+            break
+
+        payloads = [json.loads(raw_payload) for raw_payload in raw_payloads]
+        async with local_session() as db:
+            failed = {id(payload) for payload in await persist_vapi_server_message_batch(db, redis, payloads)}
+
+        failed_raw_payloads = [raw for raw, payload in zip(raw_payloads, payloads) if id(payload) in failed]
+        persisted += len(raw_payloads) - len(failed_raw_payloads)
+        retry = bool(failed_raw_payloads) and ctx["job_try"] < settings.VAPI_INGESTION_MAX_TRIES
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.delete(processing_key)
+            if failed_raw_payloads:
+                pipe.rpush(processing_key if retry else DEAD_LETTER_KEY, *failed_raw_payloads)
+            await pipe.execute()
+
+        if retry:
+            logging.warning(f"Retrying {len(failed_raw_payloads)} Vapi server messages that could not be persisted")
+            raise Retry(defer=ctx["job_try"] * 5)
+
+        if failed_raw_payloads:
+            logging.error(f"Moved {len(failed_raw_payloads)} Vapi server messages to {DEAD_LETTER_KEY}")
+
+    logging.info(f"Persisted {persisted} Vapi server messages")
+    return persisted
+
+
+async def flush_vapi_conversation_update(ctx: Worker, call_id: str) -> None:
+    async with local_session() as db:
+        await flush_conversation_update(db, ctx["redis"], call_id)
+
+
+async def finalize_vapi_conversation_update(ctx: Worker, call_id: str) -> None:
+    async with local_session() as db:
+        await finalize_conversation_update(db, ctx["redis"], call_id)
+
+
+async def manage_vapi_end_of_call_partitions(ctx: Worker) -> dict[str, list[str]]:
+    current_month = month_start(datetime.now(UTC))
+    async with local_session() as db:
+        created = await create_monthly_partitions(
+            db, "vapi_end_of_call", current_month, settings.VAPI_END_OF_CALL_PARTITIONS_AHEAD + 1
+        )
+
+        expired: list[str] = []
+        call_ids_before = None
+        if settings.VAPI_END_OF_CALL_RETENTION_MONTHS > 0:
+            before = add_months(current_month, -settings.VAPI_END_OF_CALL_RETENTION_MONTHS)
+            expired = await detach_expired_partitions(
+                db,
+                "vapi_end_of_call",
+                before,
+                drop=settings.VAPI_END_OF_CALL_DROP_EXPIRED_PARTITIONS,
+                counted=True,
+            )
+            # detaching does not fire the delete trigger, release the call ids of the expired rows
+            call_ids_before = before
+
+        # retried webhooks come within days, older call ids are pruned whether their reports are kept or not
+        if settings.VAPI_END_OF_CALL_CALL_ID_RETENTION_MONTHS > 0:
+            before = add_months(current_month, -settings.VAPI_END_OF_CALL_CALL_ID_RETENTION_MONTHS)
+            call_ids_before = max(before, call_ids_before or before)
+
+        if call_ids_before is not None:
+            await db.execute(delete(VapiEndOfCallCallId).where(VapiEndOfCallCallId.created_at < call_ids_before))
+
+        await db.commit()
+
+    logging.info(f"Created partitions {created}, expired partitions {expired}")
+    return {"created": created, "expired": expired}
+
+
+async def archive_vapi_end_of_calls(ctx: Worker) -> int:
+    if settings.VAPI_ARCHIVE_AFTER_DAYS <= 0:
+        return 0
+
+    async with local_session() as db:
+        return await archive_end_of_calls(db, datetime.now(UTC) - timedelta(days=settings.VAPI_ARCHIVE_AFTER_DAYS))
+
+
 # -------- base functions --------
 async def startup(ctx: Worker) -> None:
+    # the end-of-call claims live in the cache Redis
+    await create_redis_cache_pool()
     logging.info("Worker Started")
 
 
 async def shutdown(ctx: Worker) -> None:
+    await close_redis_cache_pool()
     logging.info("Worker end")
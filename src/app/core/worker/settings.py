@@ -1,14 +1,34 @@
 from arq.connections import RedisSettings
+from arq.cron import cron
+from arq.worker import func
 
 from ...core.config import settings
-from .functions import sample_background_task, shutdown, startup
+from .functions import (
+    archive_vapi_end_of_calls,
+    finalize_vapi_conversation_update,
+    flush_vapi_conversation_update,
+    manage_vapi_end_of_call_partitions,
+    persist_vapi_server_messages,
+    sample_background_task,
+    shutdown,
+    startup,
+)
 
 REDIS_QUEUE_HOST = settings.REDIS_QUEUE_HOST
 REDIS_QUEUE_PORT = settings.REDIS_QUEUE_PORT
 
 
 class WorkerSettings:
-    functions = [sample_background_task]
+    functions = [
+        sample_background_task,
+        func(persist_vapi_server_messages, max_tries=settings.VAPI_INGESTION_MAX_TRIES),
+        flush_vapi_conversation_update,
+        finalize_vapi_conversation_update,
+    ]
+    cron_jobs = [
+        cron(manage_vapi_end_of_call_partitions, hour={3}, minute={0}, run_at_startup=True),
+        cron(archive_vapi_end_of_calls, hour={4}, minute={0}),
+    ]
     redis_settings = RedisSettings(host=REDIS_QUEUE_HOST, port=REDIS_QUEUE_PORT)
     on_startup = startup
     on_shutdown = shutdown
@@ -0,0 +1,96 @@
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..core.utils.pagination import decode_cursor, encode_cursor
+
+
+class KeysetPaginationMixin:
+    """Keyset (cursor) pagination for a `FastCRUD`, to be mixed in before `FastCRUD` in the bases.
+
+    `keyset_columns` is the sort key. It must be unique and, for deep pages to cost as much as the first one, be
+    covered by an index along with the equality filters of the listing.
+    """
+
+    keyset_columns: tuple[str, ...] = ("id",)
+
+    def _encode_keyset(self, row: dict[str, Any]) -> str:
+        values = [row[f"_keyset_{name}"] for name in self.keyset_columns]
+        return encode_cursor([value.isoformat() if isinstance(value, datetime) else value for value in values])
+
+    def _decode_keyset(self, cursor: str) -> list[Any]:
+        values = decode_cursor(cursor, length=len(self.keyset_columns))
+        for index, name in enumerate(self.keyset_columns):
+            python_type = getattr(self.model, name).type.python_type  # type: ignore
+            if python_type is datetime and isinstance(values[index], str):
+                values[index] = datetime.fromisoformat(values[index])
+            if not isinstance(values[index], python_type):
+                raise ValueError(f"Invalid cursor: {cursor}")
+        return values
+
+    async def get_multi_by_cursor(
+        self,
+        db: AsyncSession,
+        cursor: str | None = None,
+        limit: int = 100,
+        schema_to_select: type[BaseModel] | None = None,
+        extra_filters: list[Any] | None = None,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        """Fetch the records following a cursor, in `keyset_columns` order.
+
+        Parameters
+        ----------
+        db: AsyncSession
+            The database session to use for the operation.
+        cursor: str | None, optional
+            The `next_cursor` of the previous page. None or an empty string starts from the first record.
+        limit: int, optional
+            Maximum number of records to fetch.
+        schema_to_select: type[BaseModel] | None, optional
+            Schema whose fields are returned. Defaults to all the columns of the table.
+        extra_filters: list[Any] | None, optional
+            SQLAlchemy filter expressions, added to the ones parsed from `kwargs`.
+        **kwargs: Any
+            Column filters, with the same operators as `get_multi`.
+
+        Returns
+        -------
+        dict[str, Any]
+            The fetched records under `data` and the cursor of the next page under `next_cursor`, None on the last
+            page.
+
+        Raises
+        ------
+        ValueError
+            If the cursor is malformed.
+        """
+        model = self.model  # type: ignore
+        if schema_to_select is None:
+            to_select = list(model.__table__.columns)
+        else:
+            to_select = [getattr(model, field) for field in schema_to_select.model_fields if hasattr(model, field)]
+
+        keyset = [getattr(model, name) for name in self.keyset_columns]
+        filters = self._parse_filters(**kwargs) + (extra_filters or [])  # type: ignore
+        if cursor:
+            filters.append(tuple_(*keyset) > tuple_(*self._decode_keyset(cursor)))
+
+        stmt = (
+            select(*to_select, *[column.label(f"_keyset_{column.key}") for column in keyset])
+            .filter(*filters)
+            .order_by(*keyset)
+            .limit(limit + 1)
+        )
+        rows = [dict(row) for row in (await db.execute(stmt)).mappings()]
+
+        next_cursor = self._encode_keyset(rows[limit - 1]) if len(rows) > limit else None
+        data = rows[:limit]
+        for row in data:
+            for name in self.keyset_columns:
+                del row[f"_keyset_{name}"]
+
+        return {"data": data, "next_cursor": next_cursor}
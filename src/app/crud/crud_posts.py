@@ -2,6 +2,16 @@ from fastcrud import FastCRUD
 
 from ..models.post import Post
 from ..schemas.post import PostCreateInternal, PostDelete, PostUpdate, PostUpdateInternal
+from .crud_keyset_pagination import KeysetPaginationMixin
+from .crud_user_counters import UserCountedMixin
+
+
+class CRUDPost(
+    UserCountedMixin,
+    KeysetPaginationMixin,
+    FastCRUD[Post, PostCreateInternal, PostUpdate, PostUpdateInternal, PostDelete],
+):
+    keyset_columns = ("created_at", "id")
+
 
-CRUDPost = FastCRUD[Post, PostCreateInternal, PostUpdate, PostUpdateInternal, PostDelete]
 crud_posts = CRUDPost(Post)
@@ -2,6 +2,14 @@ from fastcrud import FastCRUD
 
 from ..models.rate_limit import RateLimit
 from ..schemas.rate_limit import RateLimitCreateInternal, RateLimitDelete, RateLimitUpdate, RateLimitUpdateInternal
+from .crud_keyset_pagination import KeysetPaginationMixin
+
+
+class CRUDRateLimit(
+    KeysetPaginationMixin,
+    FastCRUD[RateLimit, RateLimitCreateInternal, RateLimitUpdate, RateLimitUpdateInternal, RateLimitDelete],
+):
+    keyset_columns = ("id",)
+
 
-CRUDRateLimit = FastCRUD[RateLimit, RateLimitCreateInternal, RateLimitUpdate, RateLimitUpdateInternal, RateLimitDelete]
 crud_rate_limits = CRUDRateLimit(RateLimit)
@@ -0,0 +1,69 @@
+from typing import Any
+
+from pydantic import BaseModel
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.user_counter import COUNTED_TABLES, UserCounter
+
+
+async def get_user_count(db: AsyncSession, user_id: int, table: str) -> int:
+    """Read the number of non-deleted rows of a user in one of the `COUNTED_TABLES`."""
+    count = await db.scalar(select(getattr(UserCounter, table)).where(UserCounter.user_id == user_id))
+    return count or 0
+
+
+class UserCountedMixin:
+    """Paginated reads of the `COUNTED_TABLES`, whose `total_count` comes from `user_counter`.
+
+    To be mixed into the `FastCRUD` of a counted table, before `FastCRUD` in the bases.
+    """
+
+    async def get_multi_by_user(
+        self,
+        db: AsyncSession,
+        created_by_user_id: int,
+        offset: int = 0,
+        limit: int = 100,
+        schema_to_select: type[BaseModel] | None = None,
+    ) -> dict[str, Any]:
+        """Fetch the non-deleted records of a user like `get_multi`, without running a `COUNT(*)`.
+
+        Parameters
+        ----------
+        db: AsyncSession
+            The database session to use for the operation.
+        created_by_user_id: int
+            The owner of the records.
+        offset: int, optional
+            Starting index for records to fetch.
+        limit: int, optional
+            Maximum number of records to fetch.
+        schema_to_select: type[BaseModel] | None, optional
+            Schema whose fields are returned. Defaults to all the columns of the table.
+
+        Returns
+        -------
+        dict[str, Any]
+            The fetched records under `data` and the counter of the user under `total_count`.
+        """
+        model = self.model  # type: ignore
+        if model.__tablename__ not in COUNTED_TABLES:
+            raise ValueError(f"{model.__tablename__} is not counted in user_counter")
+
+        if schema_to_select is None:
+            to_select = list(model.__table__.columns)
+        else:
+            to_select = [getattr(model, field) for field in schema_to_select.model_fields if hasattr(model, field)]
+
+        result = await db.execute(
+            select(*to_select)
+            .filter(model.created_by_user_id == created_by_user_id, ~model.is_deleted)
+            .order_by(model.id)
+            .offset(offset)
+            .limit(limit)
+        )
+        data = [dict(row) for row in result.mappings()]
+
+        total_count = await get_user_count(db, created_by_user_id, model.__tablename__)
+        return {"data": data, "total_count": total_count}
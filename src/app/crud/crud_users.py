@@ -2,6 +2,11 @@ from fastcrud import FastCRUD
 
 from ..models.user import User
 from ..schemas.user import UserCreateInternal, UserDelete, UserUpdate, UserUpdateInternal
+from .crud_keyset_pagination import KeysetPaginationMixin
+
+
+class CRUDUser(KeysetPaginationMixin, FastCRUD[User, UserCreateInternal, UserUpdate, UserUpdateInternal, UserDelete]):
+    keyset_columns = ("id",)
+
 
-CRUDUser = FastCRUD[User, UserCreateInternal, UserUpdate, UserUpdateInternal, UserDelete]
 crud_users = CRUDUser(User)
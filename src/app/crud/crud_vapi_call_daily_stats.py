@@ -0,0 +1,113 @@
+from datetime import date
+from typing import Any
+
+from fastcrud import FastCRUD
+from sqlalchemy import func, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.vapi_call_daily_stat import NO_ASSISTANT, VapiCallDailyStat
+from ..schemas.vapi_call_daily_stat import (
+    VapiCallDailyStatCreateInternal,
+    VapiCallDailyStatDelete,
+    VapiCallDailyStatUpdate,
+    VapiCallDailyStatUpdateInternal,
+)
+
+
+class CRUDVapiCallDailyStat(
+    FastCRUD[
+        VapiCallDailyStat,
+        VapiCallDailyStatCreateInternal,
+        VapiCallDailyStatUpdate,
+        VapiCallDailyStatUpdateInternal,
+        VapiCallDailyStatDelete,
+    ]
+):
+    async def get_daily(
+        self,
+        db: AsyncSession,
+        created_by_user_id: int,
+        start_day: date,
+        end_day: date,
+        assistant_id: str | None = None,
+        by_assistant: bool = False,
+    ) -> list[dict[str, Any]]:
+        """Read the daily call analytics of a user from the rollup.
+
+        Parameters
+        ----------
+        db: AsyncSession
+            The database session to use for the operation.
+        created_by_user_id: int
+            The user whose calls are counted.
+        start_day: date
+            The first day, in UTC.
+        end_day: date
+            The last day, in UTC, included.
+        assistant_id: str | None, optional
+            Only count the calls of this assistant.
+        by_assistant: bool, optional
+            Return one entry per day and assistant instead of one per day.
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            The days that had calls, in order, with their number of calls, average duration and calls per ended reason.
+        """
+        assistant = VapiCallDailyStat.assistant_id if by_assistant else literal(None).label("assistant_id")
+        group_by = [VapiCallDailyStat.day, VapiCallDailyStat.ended_reason]
+        if by_assistant:
+            group_by.insert(1, VapiCallDailyStat.assistant_id)
+
+        stmt = (
+            select(
+                VapiCallDailyStat.day,
+                assistant,
+                VapiCallDailyStat.ended_reason,
+                func.sum(VapiCallDailyStat.calls).label("calls"),
+                func.sum(VapiCallDailyStat.timed_calls).label("timed_calls"),
+                func.sum(VapiCallDailyStat.duration_seconds).label("duration_seconds"),
+            )
+            .filter(
+                VapiCallDailyStat.created_by_user_id == created_by_user_id,
+                VapiCallDailyStat.day.between(start_day, end_day),
+            )
+            .group_by(*group_by)
+            .order_by(*group_by)
+        )
+        if assistant_id is not None:
+            stmt = stmt.filter(VapiCallDailyStat.assistant_id == assistant_id)
+
+        entries: dict[tuple, dict[str, Any]] = {}
+        for row in (await db.execute(stmt)).mappings():
+            entry = entries.setdefault(
+                (row["day"], row["assistant_id"]),
+                {
+                    "day": row["day"],
+                    "assistant_id": None if row["assistant_id"] == NO_ASSISTANT else row["assistant_id"],
+                    "calls": 0,
+                    "timed_calls": 0,
+                    "duration_seconds": 0.0,
+                    "ended_reasons": {},
+                },
+            )
+            entry["calls"] += row["calls"]
+            entry["timed_calls"] += row["timed_calls"]
+            entry["duration_seconds"] += row["duration_seconds"]
+            entry["ended_reasons"][row["ended_reason"]] = row["calls"]
+
+        return [
+            {
+                "day": entry["day"],
+                "assistant_id": entry["assistant_id"],
+                "calls": entry["calls"],
+                "average_duration_seconds": (
+                    entry["duration_seconds"] / entry["timed_calls"] if entry["timed_calls"] else None
+                ),
+                "ended_reasons": entry["ended_reasons"],
+            }
+            for entry in entries.values()
+        ]
+
+
+crud_vapi_call_daily_stats = CRUDVapiCallDailyStat(VapiCallDailyStat)
@@ -0,0 +1,121 @@
+from datetime import UTC, datetime
+from typing import Any
+
+from fastcrud import FastCRUD
+from sqlalchemy import delete, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.vapi_conversation_turn import VapiConversationTurn
+from ..schemas.vapi_conversation_turn import (
+    VapiConversationTurnCreateInternal,
+    VapiConversationTurnDelete,
+    VapiConversationTurnRead,
+    VapiConversationTurnUpdate,
+    VapiConversationTurnUpdateInternal,
+)
+
+
+class CRUDVapiConversationTurn(
+    FastCRUD[
+        VapiConversationTurn,
+        VapiConversationTurnCreateInternal,
+        VapiConversationTurnUpdate,
+        VapiConversationTurnUpdateInternal,
+        VapiConversationTurnDelete,
+    ]
+):
+    async def append(
+        self,
+        db: AsyncSession,
+        call_id: str,
+        created_by_user_id: int,
+        conversation: list[dict[str, str]],
+        from_sequence: int = 0,
+    ) -> int:
+        """Insert the turns of a conversation starting at `from_sequence`.
+
+        Turns that are already stored are skipped by `ON CONFLICT (call_id, sequence) DO NOTHING`, so passing a
+        `from_sequence` that is too low is harmless, it only sends more data than needed.
+
+        Parameters
+        ----------
+        db: AsyncSession
+            The database session to use for the operation.
+        call_id: str
+            The Vapi call id the conversation belongs to.
+        created_by_user_id: int
+            The id of the user owning the call.
+        conversation: list[dict[str, str]]
+            The whole conversation, as sent by Vapi.
+        from_sequence: int, optional
+            The index of the first turn to insert. Defaults to 0.
+
+        Returns
+        -------
+        int
+            The number of turns sent to the database.
+        """
+        turns = conversation[from_sequence:]
+        if not turns:
+            return 0
+
+        now = datetime.now(UTC)
+        stmt = insert(self.model).values(
+            [
+                {
+                    "call_id": call_id,
+                    "sequence": sequence,
+                    "created_by_user_id": created_by_user_id,
+                    "role": turn.get("role", ""),
+                    "message": turn.get("message", turn.get("content", "")),
+                    "created_at": now,
+                }
+                for sequence, turn in enumerate(turns, start=from_sequence)
+            ]
+        )
+        await db.execute(stmt.on_conflict_do_nothing(index_elements=[self.model.call_id, self.model.sequence]))
+        await db.commit()
+        return len(turns)
+
+    async def delete_conversation(self, db: AsyncSession, call_id: str) -> None:
+        """Delete all the stored turns of a call, with its conversation update."""
+        await db.execute(delete(self.model).where(self.model.call_id == call_id))
+        await db.commit()
+
+    async def get_conversation(
+        self, db: AsyncSession, call_id: str, created_by_user_id: int, from_sequence: int = 0
+    ) -> list[dict[str, Any]]:
+        """Rebuild the conversation of a call from its stored turns, in order.
+
+        Parameters
+        ----------
+        db: AsyncSession
+            The database session to use for the operation.
+        call_id: str
+            The Vapi call id.
+        created_by_user_id: int
+            The id of the user owning the call.
+        from_sequence: int, optional
+            Only return the turns from this index onward. Defaults to 0.
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            The turns, ordered by sequence.
+        """
+        to_select = [getattr(self.model, field) for field in VapiConversationTurnRead.model_fields]
+        stmt = (
+            select(*to_select)
+            .where(
+                self.model.call_id == call_id,
+                self.model.created_by_user_id == created_by_user_id,
+                self.model.sequence >= from_sequence,
+            )
+            .order_by(self.model.sequence)
+        )
+        result = await db.execute(stmt)
+        return [dict(row) for row in result.mappings()]
+
+
+crud_vapi_conversation_turns = CRUDVapiConversationTurn(VapiConversationTurn)
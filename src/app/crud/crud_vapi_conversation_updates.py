@@ -1,4 +1,11 @@
+import uuid as uuid_pkg
+from datetime import UTC, datetime
+from typing import Any
+
 from fastcrud import FastCRUD
+from pydantic import BaseModel
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from ..models.vapi_conversation_update import VapiConversationUpdate
 from ..schemas.vapi_conversation_update import (
@@ -7,13 +14,82 @@ from ..schemas.vapi_conversation_update import (
     VapiConversationUpdateUpdate,
     VapiConversationUpdateUpdateInternal,
 )
+from .crud_keyset_pagination import KeysetPaginationMixin
+from .crud_user_counters import UserCountedMixin
+
+
+class CRUDVapiConversationUpdate(
+    UserCountedMixin,
+    KeysetPaginationMixin,
+    FastCRUD[
+        VapiConversationUpdate,
+        VapiConversationUpdateCreateInternal,
+        VapiConversationUpdateUpdate,
+        VapiConversationUpdateUpdateInternal,
+        VapiConversationUpdateDelete,
+    ]
+):
+    keyset_columns = ("created_at", "id")
+
+    async def create_if_missing(self, db: AsyncSession, object: VapiConversationUpdateCreateInternal) -> None:
+        """Create the conversation update of a call, unless it already exists.
+
+        This is a single `INSERT ... ON CONFLICT (id) DO NOTHING` statement, an existing conversation is not rewritten.
+
+        Parameters
+        ----------
+        db: AsyncSession
+            The database session to use for the operation.
+        object: VapiConversationUpdateCreateInternal
+            The conversation update to create.
+        """
+        stmt = insert(self.model).values(**object.model_dump(), uuid=uuid_pkg.uuid4(), created_at=datetime.now(UTC))
+        await db.execute(stmt.on_conflict_do_nothing(index_elements=[self.model.id]))
+        await db.commit()
+
+    async def upsert(
+        self,
+        db: AsyncSession,
+        object: VapiConversationUpdateCreateInternal,
+        schema_to_select: type[BaseModel] | None = None,
+    ) -> dict[str, Any]:
+        """Create the conversation update of a call, or overwrite its conversation if it already exists.
+
+        This is a single `INSERT ... ON CONFLICT (id) DO UPDATE ... RETURNING` statement, so it costs one round trip
+        and is safe when two updates for a new call are written concurrently.
+
+        Parameters
+        ----------
+        db: AsyncSession
+            The database session to use for the operation.
+        object: VapiConversationUpdateCreateInternal
+            The conversation update to write.
+        schema_to_select: type[BaseModel] | None, optional
+            Schema whose fields are returned. Defaults to all the columns of the table.
+
+        Returns
+        -------
+        dict[str, Any]
+            The written row.
+        """
+        now = datetime.now(UTC)
+        stmt = insert(self.model).values(**object.model_dump(), uuid=uuid_pkg.uuid4(), created_at=now)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[self.model.id],
+            set_={"conversation": stmt.excluded.conversation, "updated_at": now},
+        )
+
+        if schema_to_select is None:
+            to_return = list(self.model.__table__.columns)
+        else:
+            to_return = [
+                getattr(self.model, field) for field in schema_to_select.model_fields if hasattr(self.model, field)
+            ]
+
+        result = await db.execute(stmt.returning(*to_return))
+        upserted: dict[str, Any] = dict(result.mappings().one())
+        await db.commit()
+        return upserted
 
 
-CRUDVapiConversationUpdate = FastCRUD[
-    VapiConversationUpdate,
-    VapiConversationUpdateCreateInternal,
-    VapiConversationUpdateUpdate,
-    VapiConversationUpdateUpdateInternal,
-    VapiConversationUpdateDelete,
-]
 crud_vapi_conversation_updates = CRUDVapiConversationUpdate(VapiConversationUpdate)
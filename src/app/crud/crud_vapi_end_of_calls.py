@@ -1,19 +1,310 @@
+import uuid as uuid_pkg
+from datetime import UTC, datetime
+from typing import Any
+
 from fastcrud import FastCRUD
+from pydantic import BaseModel
+from sqlalchemy import Text, cast, func, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import REAL, REGCONFIG, insert
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from ..models.vapi_end_of_call import VapiEndOfCall
+from ..core.config import settings
+from ..core.db.partitions import create_monthly_partitions, month_start
+from ..models.vapi_call_daily_stat import daily_stat_increments, upsert_daily_stats
+from ..models.vapi_end_of_call import VapiEndOfCall, search_vector
 from ..schemas.vapi_end_of_call import (
     VapiEndOfCallCreateInternal,
     VapiEndOfCallDelete,
     VapiEndOfCallUpdate,
     VapiEndOfCallUpdateInternal,
 )
+from .crud_keyset_pagination import KeysetPaginationMixin
+from .crud_user_counters import UserCountedMixin
+
+
+def reported_at(call: dict[str, Any] | None, now: datetime) -> datetime:
+    """The time of the call of a report, its `endedAt` or else its `startedAt`, in UTC.
+
+    Reports are partitioned, archived and rolled up by this time, so that a backfilled report is stored with the calls
+    of its day. Reports without a valid timestamp, or dated in the future, are dated `now`.
+    """
+    for key in ("endedAt", "startedAt"):
+        try:
+            moment = datetime.fromisoformat((call or {})[key])
+        except (KeyError, TypeError, ValueError):
+            continue
+
+        if moment.tzinfo is None:
+            moment = moment.replace(tzinfo=UTC)
+        return min(moment.astimezone(UTC), now)
+
+    return now
+
+
+class CRUDVapiEndOfCall(
+    UserCountedMixin,
+    KeysetPaginationMixin,
+    FastCRUD[
+        VapiEndOfCall,
+        VapiEndOfCallCreateInternal,
+        VapiEndOfCallUpdate,
+        VapiEndOfCallUpdateInternal,
+        VapiEndOfCallDelete,
+    ]
+):
+    keyset_columns = ("created_at", "id")
+
+    async def _create_past_partitions(self, db: AsyncSession, values: list[dict[str, Any]]) -> None:
+        """Create the missing partitions of the past months of reports, which would otherwise land in the default
+        partition. The partitions of the current and next months are created by the worker."""
+        current_month = month_start(datetime.now(UTC))
+        for month in sorted({month_start(value["created_at"]) for value in values}):
+            if month < current_month:
+                await create_monthly_partitions(db, self.model.__tablename__, month, 1)
+
+    async def create_unique(
+        self,
+        db: AsyncSession,
+        object: VapiEndOfCallCreateInternal,
+        schema_to_select: type[BaseModel] | None = None,
+    ) -> dict[str, Any] | None:
+        """Insert an end-of-call report with a single `INSERT ... RETURNING`, unless its call is already stored.
+
+        The `vapi_end_of_call_claim_call_id` trigger skips the report of a stored call, which `create` would report as
+        an opaque flush error. The report is added to the `vapi_call_daily_stat` rollup in the same transaction and
+        dated by `reported_at`.
+
+        Parameters
+        ----------
+        db: AsyncSession
+            The database session to use for the operation.
+        object: VapiEndOfCallCreateInternal
+            The end-of-call report to insert.
+        schema_to_select: type[BaseModel] | None, optional
+            Schema whose fields are returned. Defaults to all the columns of the table.
+
+        Returns
+        -------
+        dict[str, Any] | None
+            The inserted row, or None if the call is already stored.
+        """
+        value = {
+            **object.model_dump(),
+            "uuid": uuid_pkg.uuid4(),
+            "created_at": reported_at(object.call, datetime.now(UTC)),
+            "search_vector": search_vector(object.transcript, object.summary),
+        }
+        await self._create_past_partitions(db, [value])
+        if schema_to_select is None:
+            to_return = [column for column in self.model.__table__.columns if column.name != "search_vector"]
+        else:
+            to_return = [
+                getattr(self.model, field) for field in schema_to_select.model_fields if hasattr(self.model, field)
+            ]
+
+        result = await db.execute(insert(self.model).values(value).returning(*to_return))
+        created = result.mappings().one_or_none()
+        if created is None:
+            await db.rollback()
+            return None
+
+        await db.execute(upsert_daily_stats(daily_stat_increments([value])))
+        await db.commit()
+        return dict(created)
+
+    async def create_many(self, db: AsyncSession, objects: list[VapiEndOfCallCreateInternal]) -> set[str]:
+        """Insert end-of-call reports with a single multi-row `INSERT ... RETURNING call_id`.
+
+        Reports whose call is already stored, in the database or earlier in `objects`, are skipped by the
+        `vapi_end_of_call_claim_call_id` trigger, which works like `ON CONFLICT (call_id) DO NOTHING` across the
+        partitions of the table. The inserted reports are added to the `vapi_call_daily_stat` rollup in the same
+        transaction. Reports are dated by `reported_at`, so backfilled reports are stored in the partition and the
+        rollup day of their call.
+
+        Parameters
+        ----------
+        db: AsyncSession
+            The database session to use for the operation.
+        objects: list[VapiEndOfCallCreateInternal]
+            The end-of-call reports to insert. Their number is bound by the 32767 parameters of a statement.
+
+        Returns
+        -------
+        set[str]
+            The call ids of the inserted reports.
+        """
+        if not objects:
+            return set()
+
+        now = datetime.now(UTC)
+        values = [
+            {
+                **object.model_dump(),
+                "uuid": uuid_pkg.uuid4(),
+                "created_at": reported_at(object.call, now),
+                "search_vector": search_vector(object.transcript, object.summary),
+            }
+            for object in objects
+        ]
+        await self._create_past_partitions(db, values)
+        result = await db.execute(insert(self.model).values(values).returning(self.model.call_id))
+        inserted_call_ids = set(result.scalars().all())
+
+        # only the first report of a call is inserted
+        inserted = {}
+        for value in values:
+            if value["call_id"] in inserted_call_ids:
+                inserted.setdefault(value["call_id"], value)
+        if inserted:
+            await db.execute(upsert_daily_stats(daily_stat_increments(inserted.values())))
+
+        await db.commit()
+        return inserted_call_ids
+
+    @staticmethod
+    def _json_field(column: Any, key: str) -> Any:
+        return column.op("->>", return_type=Text)(literal_column(f"'{key}'"))
+
+    def _call_field_filters(self, assistant_id: str | None, phone_number: str | None) -> list[Any]:
+        # the JSON keys are rendered inline, a bound key would not match the index expressions in prepared statements
+        filters = []
+        if assistant_id is not None:
+            filters.append(self._json_field(self.model.call, "assistantId") == assistant_id)
+        if phone_number is not None:
+            filters.append(self._json_field(self.model.phone_number, "number") == phone_number)
+        return filters
+
+    async def get_multi_by_call_fields(
+        self,
+        db: AsyncSession,
+        offset: int = 0,
+        limit: int = 100,
+        schema_to_select: type[BaseModel] | None = None,
+        assistant_id: str | None = None,
+        phone_number: str | None = None,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        """Fetch multiple end-of-call reports like `get_multi`, also filtering on fields of the `call` and
+        `phone_number` JSONB columns.
+
+        The filters match the `ix_vapi_end_of_call_assistant_id` and `ix_vapi_end_of_call_phone_number` expression
+        indexes, which lead with `created_by_user_id`, so pass it in `kwargs` for them to be used.
+
+        Parameters
+        ----------
+        db: AsyncSession
+            The database session to use for the operation.
+        offset: int, optional
+            Starting index for records to fetch.
+        limit: int, optional
+            Maximum number of records to fetch.
+        schema_to_select: type[BaseModel] | None, optional
+            Schema whose fields are returned. Defaults to all the columns of the table.
+        assistant_id: str | None, optional
+            Only return the calls of this assistant (`call->>'assistantId'`).
+        phone_number: str | None, optional
+            Only return the calls of this phone number (`phone_number->>'number'`).
+        **kwargs: Any
+            Column filters, with the same operators as `get_multi`.
+
+        Returns
+        -------
+        dict[str, Any]
+            The fetched records under `data` and the number of matching records under `total_count`.
+        """
+        filters = self._parse_filters(**kwargs) + self._call_field_filters(assistant_id, phone_number)
+
+        if schema_to_select is None:
+            to_select = list(self.model.__table__.columns)
+        else:
+            to_select = [
+                getattr(self.model, field) for field in schema_to_select.model_fields if hasattr(self.model, field)
+            ]
+
+        result = await db.execute(select(*to_select).filter(*filters).offset(offset).limit(limit))
+        data = [dict(row) for row in result.mappings()]
+
+        total_count = await db.scalar(select(func.count()).select_from(self.model).filter(*filters))
+        return {"data": data, "total_count": total_count}
+
+    async def get_multi_by_cursor(
+        self,
+        db: AsyncSession,
+        cursor: str | None = None,
+        limit: int = 100,
+        schema_to_select: type[BaseModel] | None = None,
+        extra_filters: list[Any] | None = None,
+        assistant_id: str | None = None,
+        phone_number: str | None = None,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        """Keyset-paginated `get_multi_by_call_fields`, see `KeysetPaginationMixin.get_multi_by_cursor`."""
+        return await super().get_multi_by_cursor(
+            db=db,
+            cursor=cursor,
+            limit=limit,
+            schema_to_select=schema_to_select,
+            extra_filters=(extra_filters or []) + self._call_field_filters(assistant_id, phone_number),
+            **kwargs,
+        )
+
+    async def search(
+        self,
+        db: AsyncSession,
+        query: str,
+        created_by_user_id: int,
+        limit: int = 10,
+        after: tuple[float, int] | None = None,
+        schema_to_select: type[BaseModel] | None = None,
+    ) -> list[dict[str, Any]]:
+        """Full-text search the transcripts and summaries of a user's end-of-call reports, best matches first.
+
+        Matches come from the GIN index on `search_vector` and are ranked with `ts_rank_cd`, the summary weighing more
+        than the transcript. Pages are keyset-paginated on `(rank, id)`, so deep pages cost as much as the first one.
+        The rank is a `real` and the rank of `after` is compared as one too, so that it matches the rank it was read
+        from.
+
+        Parameters
+        ----------
+        db: AsyncSession
+            The database session to use for the operation.
+        query: str
+            The search terms, in `websearch_to_tsquery` syntax (`"quoted phrase"`, `or`, `-excluded`).
+        created_by_user_id: int
+            The owner of the reports to search.
+        limit: int, optional
+            Maximum number of records to fetch.
+        after: tuple[float, int] | None, optional
+            The `(rank, id)` of the last record of the previous page.
+        schema_to_select: type[BaseModel] | None, optional
+            Schema whose fields are returned, besides `rank`. Defaults to all the columns of the table but
+            `search_vector`.
+
+        Returns
+        -------
+        list[dict[str, Any]]
+            The matching records with their `rank`.
+        """
+        tsquery = func.websearch_to_tsquery(cast(settings.VAPI_SEARCH_CONFIG, REGCONFIG), query)
+        rank = func.ts_rank_cd(self.model.search_vector, tsquery, type_=REAL)
+
+        if schema_to_select is None:
+            to_select = [column for column in self.model.__table__.columns if column.name != "search_vector"]
+        else:
+            to_select = [
+                getattr(self.model, field) for field in schema_to_select.model_fields if hasattr(self.model, field)
+            ]
+
+        stmt = select(*to_select, rank.label("rank")).filter(
+            self.model.created_by_user_id == created_by_user_id,
+            ~self.model.is_deleted,
+            self.model.search_vector.op("@@")(tsquery),
+        )
+        if after is not None:
+            stmt = stmt.filter(tuple_(cast(rank, REAL), self.model.id) < tuple_(cast(after[0], REAL), after[1]))
+
+        result = await db.execute(stmt.order_by(rank.desc(), self.model.id.desc()).limit(limit))
+        return [dict(row) for row in result.mappings()]
 
 
-CRUDVapiEndOfCall = FastCRUD[
-    VapiEndOfCall,
-    VapiEndOfCallCreateInternal,
-    VapiEndOfCallUpdate,
-    VapiEndOfCallUpdateInternal,
-    VapiEndOfCallDelete,
-]
 crud_vapi_end_of_calls = CRUDVapiEndOfCall(VapiEndOfCall)
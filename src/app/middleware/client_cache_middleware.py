@@ -20,7 +20,7 @@ class ClientCacheMiddleware(BaseHTTPMiddleware):
     Methods
     -------
     async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        Process the request and set the `Cache-Control` header in the response.
+        Process the request and set the `Cache-Control` header in the response, unless the endpoint set its own.
 
     Note
     ----
@@ -33,7 +33,7 @@ class ClientCacheMiddleware(BaseHTTPMiddleware):
         self.max_age = max_age
 
     async def dispatch(self, request: Request, call_next: RequestResponseEndpoint) -> Response:
-        """Process the request and set the `Cache-Control` header in the response.
+        """Process the request and set the `Cache-Control` header in the response, unless the endpoint set its own.
 
         Parameters
         ----------
@@ -52,5 +52,5 @@ class ClientCacheMiddleware(BaseHTTPMiddleware):
             - This method is automatically called by Starlette for processing the request-response cycle.
         """
         response: Response = await call_next(request)
-        response.headers["Cache-Control"] = f"public, max-age={self.max_age}"
+        response.headers.setdefault("Cache-Control", f"public, max-age={self.max_age}")
         return response
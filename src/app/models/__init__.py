@@ -1,8 +1,13 @@
 from .user import User
+from .user_counter import UserCounter
 from .post import Post
 from .rate_limit import RateLimit
 from .tier import Tier
 from .vapi_end_of_call import VapiEndOfCall
+from .vapi_end_of_call_call_id import VapiEndOfCallCallId
+from .vapi_end_of_call_archive import VapiEndOfCallArchive
+from .vapi_call_daily_stat import VapiCallDailyStat
 from .vapi_conversation_update import VapiConversationUpdate
+from .vapi_conversation_turn import VapiConversationTurn
 
 # Import other models here
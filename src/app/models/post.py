@@ -1,7 +1,7 @@
 import uuid as uuid_pkg
 from datetime import UTC, datetime
 
-from sqlalchemy import DateTime, ForeignKey, String
+from sqlalchemy import DateTime, ForeignKey, Index, String, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from ..core.db.database import Base
@@ -9,6 +9,17 @@ from ..core.db.database import Base
 
 class Post(Base):
     __tablename__ = "post"
+    # the lists of the non-deleted posts of a user, in id order for pages and (created_at, id) order for cursors
+    __table_args__ = (
+        Index("ix_post_created_by_user_id_id", "created_by_user_id", "id", postgresql_where=text("NOT is_deleted")),
+        Index(
+            "ix_post_created_by_user_id_created_at_id",
+            "created_by_user_id",
+            "created_at",
+            "id",
+            postgresql_where=text("NOT is_deleted"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column("id", autoincrement=True, nullable=False, unique=True, primary_key=True, init=False)
     created_by_user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), index=True)
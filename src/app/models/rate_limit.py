@@ -1,6 +1,6 @@
 from datetime import UTC, datetime
 
-from sqlalchemy import DateTime, ForeignKey, Integer, String
+from sqlalchemy import DateTime, ForeignKey, Index, Integer, String
 from sqlalchemy.orm import Mapped, mapped_column
 
 from ..core.db.database import Base
@@ -8,6 +8,8 @@ from ..core.db.database import Base
 
 class RateLimit(Base):
     __tablename__ = "rate_limit"
+    # keyset pagination of the rate limits of a tier
+    __table_args__ = (Index("ix_rate_limit_tier_id_id", "tier_id", "id"),)
 
     id: Mapped[int] = mapped_column("id", autoincrement=True, nullable=False, unique=True, primary_key=True, init=False)
     tier_id: Mapped[int] = mapped_column(ForeignKey("tier.id"), index=True)
@@ -1,7 +1,7 @@
 import uuid as uuid_pkg
 from datetime import UTC, datetime
 
-from sqlalchemy import DateTime, ForeignKey, String
+from sqlalchemy import DateTime, ForeignKey, Index, String, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from ..core.db.database import Base
@@ -9,6 +9,16 @@ from ..core.db.database import Base
 
 class User(Base):
     __tablename__ = "user"
+    # resolves the username of a non-deleted user to its id without reading the table
+    __table_args__ = (
+        Index(
+            "ix_user_username_not_deleted",
+            "username",
+            unique=True,
+            postgresql_where=text("NOT is_deleted"),
+            postgresql_include=["id"],
+        ),
+    )
 
     id: Mapped[int] = mapped_column("id", autoincrement=True, nullable=False, unique=True, primary_key=True, init=False)
 
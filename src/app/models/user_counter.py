@@ -0,0 +1,97 @@
+from typing import Any
+
+from sqlalchemy import ForeignKey, Integer, MetaData, event, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..core.db.database import Base
+
+# the tables whose rows are counted, each one in the counter column of the same name
+COUNTED_TABLES = ("post", "vapi_end_of_call", "vapi_conversation_update")
+
+# statement-level triggers add up the rows of a whole statement, a bulk insert
+# updates each counter once
+USER_COUNTER_FUNCTION_DDL = """
+CREATE OR REPLACE FUNCTION user_counter_count() RETURNS trigger AS $$
+DECLARE
+    counted_rows text;
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        counted_rows := 'SELECT created_by_user_id, 1 AS delta FROM new_rows WHERE NOT is_deleted';
+    ELSIF TG_OP = 'DELETE' THEN
+        counted_rows := 'SELECT created_by_user_id, -1 AS delta FROM old_rows WHERE NOT is_deleted';
+    ELSE
+        counted_rows := 'SELECT created_by_user_id, 1 AS delta FROM new_rows WHERE NOT is_deleted '
+            || 'UNION ALL SELECT created_by_user_id, -1 AS delta FROM old_rows WHERE NOT is_deleted';
+    END IF;
+
+    EXECUTE format(
+        'INSERT INTO user_counter AS counter (user_id, %1$I) '
+        || 'SELECT created_by_user_id, sum(delta) FROM (%2$s) AS counted '
+        || 'GROUP BY created_by_user_id HAVING sum(delta) <> 0 '
+        || 'ON CONFLICT (user_id) DO UPDATE SET %1$I = counter.%1$I + excluded.%1$I',
+        TG_TABLE_NAME,
+        counted_rows
+    );
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+"""
+
+
+def user_counter_triggers_ddl(table: str) -> tuple[str, ...]:
+    """Build the triggers keeping the counter of `table` up to date.
+
+    A trigger with transition tables handles a single event, so there is one per
+    event.
+    """
+    return (
+        f"CREATE TRIGGER {table}_count_insert AFTER INSERT ON {table} "
+        "REFERENCING NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION user_counter_count()",
+        f"CREATE TRIGGER {table}_count_update AFTER UPDATE ON {table} "
+        "REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION user_counter_count()",
+        f"CREATE TRIGGER {table}_count_delete AFTER DELETE ON {table} "
+        "REFERENCING OLD TABLE AS old_rows "
+        "FOR EACH STATEMENT EXECUTE FUNCTION user_counter_count()",
+    )
+
+
+class UserCounter(Base):
+    """The number of non-deleted posts, end-of-call reports and conversation updates
+    of each user.
+
+    Counters are maintained by triggers on the counted tables, in the transaction
+    that writes the rows, so list endpoints read their `total_count` here instead of
+    running a `COUNT(*)`.
+    """
+
+    __tablename__ = "user_counter"
+
+    user_id: Mapped[int] = mapped_column(
+        ForeignKey("user.id", ondelete="CASCADE"), primary_key=True
+    )
+    post: Mapped[int] = mapped_column(Integer, server_default=text("0"), default=0)
+    vapi_end_of_call: Mapped[int] = mapped_column(
+        Integer, server_default=text("0"), default=0
+    )
+    vapi_conversation_update: Mapped[int] = mapped_column(
+        Integer, server_default=text("0"), default=0
+    )
+
+
+@event.listens_for(Base.metadata, "after_create")
+def _create_counter_triggers(
+    target: MetaData, connection: Connection, **kw: Any
+) -> None:
+    """Give the counted tables created by `create_all` the triggers they get from
+    the migrations."""
+    created_tables = {table.name for table in kw["tables"]}
+    connection.exec_driver_sql(USER_COUNTER_FUNCTION_DDL)
+    for table in COUNTED_TABLES:
+        if table not in created_tables:
+            continue
+
+        for statement in user_counter_triggers_ddl(table):
+            connection.exec_driver_sql(statement)
@@ -0,0 +1,132 @@
+import re
+from collections.abc import Iterable, Mapping
+from datetime import UTC, date, datetime
+from typing import Any
+
+from sqlalchemy import Date, Float, ForeignKey, Integer, String, event
+from sqlalchemy.dialects.postgresql import Insert, insert
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Mapped, Mapper, mapped_column
+
+from ..core.db.database import Base
+from .vapi_end_of_call import VapiEndOfCall
+
+# calls made without an assistant, the primary key cannot be null
+NO_ASSISTANT = ""
+# the ISO 8601 timestamps, with a time zone, that a call is timed by. The backfill of
+# the rollup in migration 2d7f4b8e1a63 checks the same pattern.
+TIMESTAMP_PATTERN = (
+    r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}:\d{2}(\.\d+)?(Z|[+-]\d{2}:\d{2})$"
+)
+
+
+class VapiCallDailyStat(Base):
+    """Daily rollup of the end-of-call reports of a user, per assistant and ended
+    reason.
+
+    Rows are incremented in the transaction that inserts the reports, so reading
+    analytics costs one row per day, assistant and ended reason instead of a scan of
+    `vapi_end_of_call`. Deleting or archiving reports leaves the rollup untouched.
+    """
+
+    __tablename__ = "vapi_call_daily_stat"
+
+    created_by_user_id: Mapped[int] = mapped_column(
+        ForeignKey("user.id"), primary_key=True
+    )
+    day: Mapped[date] = mapped_column(Date, primary_key=True)
+    assistant_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    ended_reason: Mapped[str] = mapped_column(String(50), primary_key=True)
+    calls: Mapped[int] = mapped_column(Integer)
+    # duration_seconds sums the durations of the timed_calls, the calls whose
+    # `startedAt` and `endedAt` both match TIMESTAMP_PATTERN
+    timed_calls: Mapped[int] = mapped_column(Integer)
+    duration_seconds: Mapped[float] = mapped_column(Float)
+
+
+def _timestamp(value: Any) -> datetime | None:
+    if not isinstance(value, str) or re.fullmatch(TIMESTAMP_PATTERN, value) is None:
+        return None
+
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _duration_seconds(call: Mapping[str, Any]) -> float | None:
+    started_at = _timestamp(call.get("startedAt"))
+    ended_at = _timestamp(call.get("endedAt"))
+    if started_at is None or ended_at is None:
+        return None
+
+    return (ended_at - started_at).total_seconds()
+
+
+def daily_stat_increments(
+    end_of_calls: Iterable[Mapping[str, Any]],
+) -> list[dict[str, Any]]:
+    """Aggregate end-of-call reports (with `created_by_user_id`, `call`,
+    `ended_reason` and `created_at`) into rows to add to the rollup."""
+    increments: dict[tuple, dict[str, Any]] = {}
+    for end_of_call in end_of_calls:
+        call = end_of_call["call"] or {}
+        key = (
+            end_of_call["created_by_user_id"],
+            end_of_call["created_at"].astimezone(UTC).date(),
+            call.get("assistantId") or NO_ASSISTANT,
+            end_of_call["ended_reason"],
+        )
+        increment = increments.setdefault(
+            key,
+            {
+                "created_by_user_id": key[0],
+                "day": key[1],
+                "assistant_id": key[2],
+                "ended_reason": key[3],
+                "calls": 0,
+                "timed_calls": 0,
+                "duration_seconds": 0.0,
+            },
+        )
+        increment["calls"] += 1
+        duration_seconds = _duration_seconds(call)
+        if duration_seconds is not None:
+            increment["timed_calls"] += 1
+            increment["duration_seconds"] += duration_seconds
+
+    return list(increments.values())
+
+
+def upsert_daily_stats(increments: list[dict[str, Any]]) -> Insert:
+    """Build the `INSERT ... ON CONFLICT DO UPDATE` adding increments to the rollup."""
+    stmt = insert(VapiCallDailyStat).values(increments)
+    return stmt.on_conflict_do_update(
+        index_elements=[
+            VapiCallDailyStat.created_by_user_id,
+            VapiCallDailyStat.day,
+            VapiCallDailyStat.assistant_id,
+            VapiCallDailyStat.ended_reason,
+        ],
+        set_={
+            "calls": VapiCallDailyStat.calls + stmt.excluded.calls,
+            "timed_calls": VapiCallDailyStat.timed_calls + stmt.excluded.timed_calls,
+            "duration_seconds": VapiCallDailyStat.duration_seconds
+            + stmt.excluded.duration_seconds,
+        },
+    )
+
+
+@event.listens_for(VapiEndOfCall, "after_insert")
+def _increment_daily_stats(
+    mapper: Mapper, connection: Connection, target: VapiEndOfCall
+) -> None:
+    """Count the reports inserted through the ORM, the bulk inserts of
+    `crud_vapi_end_of_calls.create_many` count theirs."""
+    end_of_call = {
+        "created_by_user_id": target.created_by_user_id,
+        "call": target.call,
+        "ended_reason": target.ended_reason,
+        "created_at": target.created_at,
+    }
+    connection.execute(upsert_daily_stats(daily_stat_increments([end_of_call])))
@@ -0,0 +1,22 @@
+# ./src/app/models/vapi_conversation_turn.py
+from datetime import UTC, datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..core.db.database import Base
+
+
+class VapiConversationTurn(Base):
+    __tablename__ = "vapi_conversation_turn"
+
+    call_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    sequence: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    created_by_user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), index=True)
+
+    role: Mapped[str] = mapped_column(String(50))
+    message: Mapped[str] = mapped_column(String)
+
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default_factory=lambda: datetime.now(UTC)
+    )
@@ -2,15 +2,32 @@
 import uuid as uuid_pkg
 from datetime import UTC, datetime
 
-from sqlalchemy import DateTime, ForeignKey, String
+from sqlalchemy import DateTime, ForeignKey, Index, String, text
 from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy.dialects.postgresql import JSONB
 
 from ..core.db.database import Base
 
 
 class VapiConversationUpdate(Base):
     __tablename__ = "vapi_conversation_update"
+    # the lists of the non-deleted conversation updates of a user, in id order for
+    # pages and (created_at, id) order for cursors
+    __table_args__ = (
+        Index(
+            "ix_vapi_conversation_update_created_by_user_id_id",
+            "created_by_user_id",
+            "id",
+            postgresql_where=text("NOT is_deleted"),
+        ),
+        Index(
+            "ix_vapi_conversation_update_created_by_user_id_created_at_id",
+            "created_by_user_id",
+            "created_at",
+            "id",
+            postgresql_where=text("NOT is_deleted"),
+        ),
+    )
 
     id: Mapped[str] = mapped_column(
         "id", String(50), nullable=False, unique=True, primary_key=True
@@ -19,7 +36,7 @@ class VapiConversationUpdate(Base):
 
     type: Mapped[str] = mapped_column(String(50))
 
-    conversation: Mapped[list[dict[str, str]]] = mapped_column(JSON)
+    conversation: Mapped[list[dict[str, str]]] = mapped_column(JSONB)
 
     uuid: Mapped[uuid_pkg.UUID] = mapped_column(
         default_factory=uuid_pkg.uuid4, primary_key=True, unique=True
@@ -1,46 +1,148 @@
 # ./src/app/models/vapi_end_of_call.py
 import uuid as uuid_pkg
 from datetime import UTC, datetime
+from typing import Any
 
-from sqlalchemy import DateTime, ForeignKey, String
-from sqlalchemy.orm import Mapped, mapped_column
-from sqlalchemy.dialects.postgresql import JSON
+from sqlalchemy import (
+    DateTime,
+    ForeignKey,
+    Index,
+    String,
+    Table,
+    Text,
+    cast,
+    event,
+    func,
+    literal_column,
+    text,
+)
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Mapped, Mapper, mapped_column
+from sqlalchemy.dialects.postgresql import JSONB, REGCONFIG, TSVECTOR
+from sqlalchemy.sql.elements import ColumnElement
 
+from ..core.config import settings
 from ..core.db.database import Base
+from ..core.db.partitions import add_months, month_start, monthly_partition_ddl
+from ..core.db.types import CompressedJSON, CompressedText
+
+# the BEFORE INSERT trigger skips the rows whose call id is already stored,
+# which works like ON CONFLICT (call_id) DO NOTHING on the whole partitioned table
+CALL_ID_TRIGGERS_DDL = (
+    """
+    CREATE OR REPLACE FUNCTION vapi_end_of_call_claim_call_id() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO vapi_end_of_call_call_id (call_id, created_at)
+        VALUES (NEW.call_id, NEW.created_at)
+        ON CONFLICT (call_id) DO NOTHING;
+        IF NOT FOUND THEN
+            RETURN NULL;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION vapi_end_of_call_release_call_id() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM vapi_end_of_call_call_id WHERE call_id = OLD.call_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER vapi_end_of_call_claim_call_id BEFORE INSERT ON vapi_end_of_call
+    FOR EACH ROW EXECUTE FUNCTION vapi_end_of_call_claim_call_id()
+    """,
+    """
+    CREATE TRIGGER vapi_end_of_call_release_call_id AFTER DELETE ON vapi_end_of_call
+    FOR EACH ROW EXECUTE FUNCTION vapi_end_of_call_release_call_id()
+    """,
+)
+
+
+def search_vector(transcript: str, summary: str) -> ColumnElement:
+    """Build the `search_vector` of a report, with the summary ranked above the
+    transcript.
+
+    The columns are stored compressed, so the vector is computed from the plain text
+    when the row is written instead of being a generated column.
+    """
+    config = cast(settings.VAPI_SEARCH_CONFIG, REGCONFIG)
+    return func.setweight(
+        func.to_tsvector(config, cast(summary, Text)), literal_column("'A'")
+    ).op("||")(
+        func.setweight(
+            func.to_tsvector(config, cast(transcript, Text)), literal_column("'B'")
+        )
+    )
 
 
 class VapiEndOfCall(Base):
     __tablename__ = "vapi_end_of_call"
+    __table_args__ = (
+        Index(
+            "ix_vapi_end_of_call_assistant_id",
+            "created_by_user_id",
+            text("(call ->> 'assistantId')"),
+        ),
+        Index(
+            "ix_vapi_end_of_call_phone_number",
+            "created_by_user_id",
+            text("(phone_number ->> 'number')"),
+        ),
+        # the lists of the non-deleted reports of a user, in id order for pages and
+        # (created_at, id) order for cursors. The latter also covers the deleted rows,
+        # which the archival reads in the same order.
+        Index(
+            "ix_vapi_end_of_call_created_by_user_id_id",
+            "created_by_user_id",
+            "id",
+            postgresql_where=text("NOT is_deleted"),
+        ),
+        Index(
+            "ix_vapi_end_of_call_created_by_user_id_created_at_id",
+            "created_by_user_id",
+            "created_at",
+            "id",
+        ),
+        Index(
+            "ix_vapi_end_of_call_search_vector",
+            "search_vector",
+            postgresql_using="gin",
+        ),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
 
     id: Mapped[int] = mapped_column(
         "id",
         autoincrement=True,
         nullable=False,
-        unique=True,
         primary_key=True,
         init=False,
     )
     created_by_user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), index=True)
 
     type: Mapped[str] = mapped_column(String(50))
-    call_id: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+    call_id: Mapped[str] = mapped_column(String(50), index=True, nullable=False)
 
     ended_reason: Mapped[str] = mapped_column(String(50))
-    call: Mapped[list[dict[str, str]]] = mapped_column(JSON)
-    phone_number: Mapped[list[dict[str, str]]] = mapped_column(JSON)
-    summary: Mapped[str] = mapped_column(String(63206))
-    transcript: Mapped[str] = mapped_column(String)
-    messages: Mapped[list[dict[str, str]]] = mapped_column(
-        JSON
-    )  # is String(63206) in the current DB schema
+    call: Mapped[list[dict[str, str]]] = mapped_column(JSONB)
+    phone_number: Mapped[list[dict[str, str]]] = mapped_column(JSONB)
+    summary: Mapped[str] = mapped_column(CompressedText())
+    transcript: Mapped[str] = mapped_column(CompressedText())
+    messages: Mapped[list[dict[str, str]]] = mapped_column(CompressedJSON())
     recording_url: Mapped[str | None] = mapped_column(String, default=None)
     stereo_recording_url: Mapped[str | None] = mapped_column(String, default=None)
 
     uuid: Mapped[uuid_pkg.UUID] = mapped_column(
-        default_factory=uuid_pkg.uuid4, primary_key=True, unique=True
+        default_factory=uuid_pkg.uuid4, primary_key=True
     )
+    # the partition key, which must be part of the primary key
     created_at: Mapped[datetime] = mapped_column(
-        DateTime(timezone=True), default_factory=lambda: datetime.now(UTC)
+        DateTime(timezone=True),
+        default_factory=lambda: datetime.now(UTC),
+        primary_key=True,
     )
     updated_at: Mapped[datetime | None] = mapped_column(
         DateTime(timezone=True), default=None
@@ -49,3 +151,33 @@ class VapiEndOfCall(Base):
         DateTime(timezone=True), default=None
     )
     is_deleted: Mapped[bool] = mapped_column(default=False, index=True)
+    # filled by the before_insert listener, or by the caller for Core inserts
+    search_vector: Mapped[Any] = mapped_column(
+        TSVECTOR, nullable=True, default=None, init=False, deferred=True
+    )
+
+
+@event.listens_for(VapiEndOfCall, "before_insert")
+def _set_search_vector(
+    mapper: Mapper, connection: Connection, target: VapiEndOfCall
+) -> None:
+    if target.search_vector is None:
+        target.search_vector = search_vector(target.transcript, target.summary)
+
+
+@event.listens_for(VapiEndOfCall.__table__, "after_create")
+def _create_partitions_and_triggers(
+    target: Table, connection: Connection, **kw: Any
+) -> None:
+    """Give a table created by `create_all` the partitions and triggers it gets
+    from the migrations."""
+    current_month = month_start(datetime.now(UTC))
+    for offset in range(settings.VAPI_END_OF_CALL_PARTITIONS_AHEAD + 1):
+        month = add_months(current_month, offset)
+        connection.exec_driver_sql(monthly_partition_ddl(target.name, month))
+
+    connection.exec_driver_sql(
+        f"CREATE TABLE {target.name}_default PARTITION OF {target.name} DEFAULT"
+    )
+    for statement in CALL_ID_TRIGGERS_DDL:
+        connection.exec_driver_sql(statement)
@@ -0,0 +1,35 @@
+# ./src/app/models/vapi_end_of_call_archive.py
+from datetime import datetime
+
+from sqlalchemy import DateTime, ForeignKey, Integer, String, text
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..core.db.database import Base
+
+
+class VapiEndOfCallArchive(Base):
+    """Where an archived end-of-call report is stored in the archive files.
+
+    The report is row `row_index` of record batch `batch_index` of the Arrow IPC file
+    at `path`, relative to `VAPI_ARCHIVE_DIR`. Archive files are not rewritten by a
+    soft delete, the index row is marked deleted instead.
+    """
+
+    __tablename__ = "vapi_end_of_call_archive"
+
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, autoincrement=False)
+    call_id: Mapped[str] = mapped_column(String(50), unique=True)
+    created_by_user_id: Mapped[int] = mapped_column(ForeignKey("user.id"), index=True)
+
+    path: Mapped[str] = mapped_column(String)
+    batch_index: Mapped[int] = mapped_column(Integer)
+    row_index: Mapped[int] = mapped_column(Integer)
+
+    created_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    archived_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    deleted_at: Mapped[datetime | None] = mapped_column(
+        DateTime(timezone=True), default=None
+    )
+    is_deleted: Mapped[bool] = mapped_column(
+        server_default=text("false"), default=False
+    )
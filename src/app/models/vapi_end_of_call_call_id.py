@@ -0,0 +1,24 @@
+# ./src/app/models/vapi_end_of_call_call_id.py
+from datetime import datetime
+
+from sqlalchemy import DateTime, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from ..core.db.database import Base
+
+
+class VapiEndOfCallCallId(Base):
+    """The call ids stored in the partitioned `vapi_end_of_call` table.
+
+    A unique constraint on a partitioned table must contain the partition key, so
+    the uniqueness of `call_id` across partitions is enforced here. Rows are
+    maintained by triggers on `vapi_end_of_call`, and pruned by the partitions job
+    after `VAPI_END_OF_CALL_CALL_ID_RETENTION_MONTHS`.
+    """
+
+    __tablename__ = "vapi_end_of_call_call_id"
+
+    call_id: Mapped[str] = mapped_column(String(50), primary_key=True)
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), index=True
+    )
@@ -0,0 +1,42 @@
+from datetime import date
+from typing import Annotated
+
+from pydantic import BaseModel, Field
+
+
+class VapiCallDailyStatBase(BaseModel):
+    day: Annotated[date, Field(examples=["2024-03-20"])]
+    assistant_id: Annotated[
+        str | None,
+        Field(max_length=50, examples=["0eff0e2a-e7ba-4fac-b867-3e40f657f6e9"]),
+    ]
+
+
+class VapiCallDailyStatCreateInternal(VapiCallDailyStatBase):
+    created_by_user_id: int
+    ended_reason: Annotated[str, Field(max_length=50, examples=["hangup"])]
+    calls: int
+    timed_calls: int
+    duration_seconds: float
+
+
+class VapiCallDailyStatUpdate(BaseModel):
+    calls: int
+    timed_calls: int
+    duration_seconds: float
+
+
+class VapiCallDailyStatUpdateInternal(VapiCallDailyStatUpdate):
+    pass
+
+
+class VapiCallDailyStatDelete(BaseModel):
+    pass
+
+
+class VapiCallDailyStatRead(VapiCallDailyStatBase):
+    calls: int
+    average_duration_seconds: float | None
+    ended_reasons: Annotated[
+        dict[str, int], Field(examples=[{"customer-ended-call": 12, "hangup": 3}])
+    ]
@@ -0,0 +1,40 @@
+# ./src/app/schemas/vapi_conversation_turn.py
+from datetime import datetime
+from typing import Annotated
+
+from pydantic import BaseModel, Field
+
+
+class VapiConversationTurnBase(BaseModel):
+    sequence: Annotated[int, Field(ge=0, examples=[0])]
+    role: Annotated[str, Field(max_length=50, examples=["assistant"])]
+    message: Annotated[str, Field(examples=["How can I help?"])]
+
+
+class VapiConversationTurnCreateInternal(VapiConversationTurnBase):
+    call_id: Annotated[
+        str,
+        Field(
+            min_length=1,
+            max_length=50,
+            examples=["51ac5220-9ae4-46fe-8e90-5fc123706970"],
+        ),
+    ]
+    created_by_user_id: int
+
+
+class VapiConversationTurnUpdate(BaseModel):
+    message: str
+
+
+class VapiConversationTurnUpdateInternal(VapiConversationTurnUpdate):
+    pass
+
+
+class VapiConversationTurnRead(VapiConversationTurnBase):
+    call_id: str
+    created_at: datetime
+
+
+class VapiConversationTurnDelete(BaseModel):
+    pass
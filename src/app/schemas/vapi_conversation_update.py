@@ -2,7 +2,7 @@
 from datetime import datetime
 from typing import Literal, Annotated, Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationInfo, model_validator
 
 from ..core.schemas import PersistentDeletion, TimestampSchema, UUIDSchema
 
@@ -39,6 +39,23 @@ class VapiConversationUpdateCreateInternal(BaseModel):
     ]
     created_by_user_id: int
 
+    @model_validator(mode="before")
+    @classmethod
+    def set_internal_fields(cls, data: Any, info: ValidationInfo) -> Any:
+        """Fill `id` from the call and `created_by_user_id` from the context.
+
+        This lets a raw Vapi message validate into this schema in a single pass.
+        """
+        if not isinstance(data, dict):
+            return data
+
+        data = dict(data)
+        if "id" not in data and isinstance(data.get("call"), dict):
+            data["id"] = data["call"].get("id")
+        if "created_by_user_id" not in data and info.context is not None:
+            data["created_by_user_id"] = info.context.get("created_by_user_id")
+        return data
+
 
 class VapiConversationUpdateUpdate(BaseModel):
     conversation: Annotated[
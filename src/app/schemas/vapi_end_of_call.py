@@ -2,7 +2,7 @@
 from datetime import datetime
 from typing import Literal, Annotated, Any
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, ValidationInfo, model_validator
 
 from ..core.schemas import PersistentDeletion, TimestampSchema, UUIDSchema
 
@@ -82,6 +82,23 @@ class VapiEndOfCallCreateInternal(VapiEndOfCallBase):
     ]
     created_by_user_id: int
 
+    @model_validator(mode="before")
+    @classmethod
+    def set_internal_fields(cls, data: Any, info: ValidationInfo) -> Any:
+        """Fill `call_id` from the call and `created_by_user_id` from the context.
+
+        This lets a raw Vapi message validate into this schema in a single pass.
+        """
+        if not isinstance(data, dict):
+            return data
+
+        data = dict(data)
+        if "call_id" not in data and isinstance(data.get("call"), dict):
+            data["call_id"] = data["call"].get("id")
+        if "created_by_user_id" not in data and info.context is not None:
+            data["created_by_user_id"] = info.context.get("created_by_user_id")
+        return data
+
 
 class VapiEndOfCallUpdate(VapiEndOfCallCreateInternal):
     pass
@@ -98,6 +115,20 @@ class VapiEndOfCallRead(VapiEndOfCallCreateInternal):
     created_at: datetime
 
 
+class VapiEndOfCallSummary(BaseModel):
+    """The columns shown by lists of reports, without the transcript, messages and
+    call object."""
+
+    id: int
+    call_id: str
+    ended_reason: Annotated[str, Field(alias="endedReason")]
+    summary: str
+    created_at: datetime
+
+    class Config:
+        populate_by_name = True
+
+
 class VapiEndOfCallUpdateInternal(VapiEndOfCallUpdate):
     updated_at: datetime
 
@@ -105,3 +136,28 @@ class VapiEndOfCallUpdateInternal(VapiEndOfCallUpdate):
 class VapiEndOfCallDelete(BaseModel):
     is_deleted: bool
     deleted_at: datetime
+
+
+class VapiEndOfCallBulkFailure(BaseModel):
+    line: int
+    error: str
+
+
+class VapiEndOfCallBulkResult(BaseModel):
+    received: int
+    created: int
+    failures: list[VapiEndOfCallBulkFailure]
+
+
+class VapiEndOfCallSearchHit(BaseModel):
+    id: int
+    call_id: str
+    ended_reason: str
+    summary: str
+    created_at: datetime
+    rank: float
+
+
+class VapiEndOfCallSearchPage(BaseModel):
+    data: list[VapiEndOfCallSearchHit]
+    next_cursor: str | None
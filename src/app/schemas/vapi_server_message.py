@@ -3,9 +3,14 @@ from typing import Annotated, Union
 
 from pydantic import BaseModel, Field
 
-from .vapi_end_of_call import VapiEndOfCallBase, VapiEndOfCallRead
+from .vapi_end_of_call import (
+    VapiEndOfCallBase,
+    VapiEndOfCallCreateInternal,
+    VapiEndOfCallRead,
+)
 from .vapi_conversation_update import (
     VapiConversationUpdateBase,
+    VapiConversationUpdateCreateInternal,
     VapiConversationUpdateRead,
     VapiConversationUpdateUpdate,
 )
@@ -17,6 +22,17 @@ class VapiServerMessage(BaseModel):
     )
 
 
+class VapiServerMessageInternal(BaseModel):
+    """Validates a raw Vapi server message straight into its internal create schema.
+
+    Pass the owner of the message as `context={"created_by_user_id": ...}`.
+    """
+
+    message: Union[
+        VapiEndOfCallCreateInternal, VapiConversationUpdateCreateInternal
+    ] = Field(..., discriminator="type")
+
+
 VapiServerMessageResponse = Union[
     dict[str, str], VapiConversationUpdateRead, VapiEndOfCallRead
 ]
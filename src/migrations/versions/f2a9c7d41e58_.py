@@ -0,0 +1,182 @@
+"""partition vapi_end_of_call by created_at month
+
+Revision ID: f2a9c7d41e58
+Revises: e81b4c6f2d37
+Create Date: 2026-10-18 15:37:52.806114
+
+"""
+from datetime import UTC, date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a9c7d41e58'
+down_revision: Union[str, None] = 'e81b4c6f2d37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS_AHEAD = 3
+
+COLUMNS = (
+    'id, created_by_user_id, type, call_id, ended_reason, call, phone_number, summary, transcript, messages, '
+    'recording_url, stereo_recording_url, uuid, created_at, updated_at, deleted_at, is_deleted'
+)
+
+INDEXES = (
+    'ix_vapi_end_of_call_created_by_user_id',
+    'ix_vapi_end_of_call_is_deleted',
+    'ix_vapi_end_of_call_call_id',
+    'ix_vapi_end_of_call_assistant_id',
+    'ix_vapi_end_of_call_phone_number',
+)
+
+CALL_ID_TRIGGERS = (
+    """
+    CREATE OR REPLACE FUNCTION vapi_end_of_call_claim_call_id() RETURNS trigger AS $$
+    BEGIN
+        INSERT INTO vapi_end_of_call_call_id (call_id, created_at)
+        VALUES (NEW.call_id, NEW.created_at)
+        ON CONFLICT (call_id) DO NOTHING;
+        IF NOT FOUND THEN
+            RETURN NULL;
+        END IF;
+        RETURN NEW;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE OR REPLACE FUNCTION vapi_end_of_call_release_call_id() RETURNS trigger AS $$
+    BEGIN
+        DELETE FROM vapi_end_of_call_call_id WHERE call_id = OLD.call_id;
+        RETURN NULL;
+    END;
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER vapi_end_of_call_claim_call_id BEFORE INSERT ON vapi_end_of_call
+    FOR EACH ROW EXECUTE FUNCTION vapi_end_of_call_claim_call_id()
+    """,
+    """
+    CREATE TRIGGER vapi_end_of_call_release_call_id AFTER DELETE ON vapi_end_of_call
+    FOR EACH ROW EXECUTE FUNCTION vapi_end_of_call_release_call_id()
+    """,
+)
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _columns(id_column: sa.Column) -> list[sa.Column]:
+    return [
+        id_column,
+        sa.Column('created_by_user_id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(length=50), nullable=False),
+        sa.Column('call_id', sa.String(length=50), nullable=False),
+        sa.Column('ended_reason', sa.String(length=50), nullable=False),
+        sa.Column('call', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('phone_number', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+        sa.Column('summary', sa.LargeBinary(), nullable=False),
+        sa.Column('transcript', sa.LargeBinary(), nullable=False),
+        sa.Column('messages', sa.LargeBinary(), nullable=False),
+        sa.Column('recording_url', sa.String(), nullable=True),
+        sa.Column('stereo_recording_url', sa.String(), nullable=True),
+        sa.Column('uuid', sa.Uuid(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('deleted_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('is_deleted', sa.Boolean(), nullable=False),
+        sa.ForeignKeyConstraint(['created_by_user_id'], ['user.id'], ),
+    ]
+
+
+def _create_indexes(partitioned: bool) -> None:
+    op.create_index(op.f('ix_vapi_end_of_call_created_by_user_id'), 'vapi_end_of_call', ['created_by_user_id'], unique=False)
+    op.create_index(op.f('ix_vapi_end_of_call_is_deleted'), 'vapi_end_of_call', ['is_deleted'], unique=False)
+    if partitioned:
+        op.create_index(op.f('ix_vapi_end_of_call_call_id'), 'vapi_end_of_call', ['call_id'], unique=False)
+    op.create_index('ix_vapi_end_of_call_assistant_id', 'vapi_end_of_call', ['created_by_user_id', sa.text("(call ->> 'assistantId')")], unique=False)
+    op.create_index('ix_vapi_end_of_call_phone_number', 'vapi_end_of_call', ['created_by_user_id', sa.text("(phone_number ->> 'number')")], unique=False)
+
+
+def _set_aside(name: str, constraints: Sequence[str]) -> None:
+    """Rename the table and free the names of its sequence, constraints and indexes for the new table."""
+    op.rename_table('vapi_end_of_call', name)
+    op.execute('ALTER SEQUENCE vapi_end_of_call_id_seq OWNED BY NONE')
+    for constraint in constraints:
+        op.execute(f'ALTER TABLE {name} DROP CONSTRAINT IF EXISTS {constraint}')
+    for index in INDEXES:
+        op.execute(f'DROP INDEX IF EXISTS {index}')
+
+
+def _copy_from(name: str) -> None:
+    op.execute(f'INSERT INTO vapi_end_of_call ({COLUMNS}) SELECT {COLUMNS} FROM {name}')
+    op.execute('ALTER SEQUENCE vapi_end_of_call_id_seq OWNED BY vapi_end_of_call.id')
+    op.drop_table(name)
+
+
+def upgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    op.create_table('vapi_end_of_call_call_id',
+    sa.Column('call_id', sa.String(length=50), nullable=False),
+    sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+    sa.PrimaryKeyConstraint('call_id')
+    )
+    op.create_index(op.f('ix_vapi_end_of_call_call_id_created_at'), 'vapi_end_of_call_call_id', ['created_at'], unique=False)
+
+    _set_aside(
+        'vapi_end_of_call_unpartitioned',
+        ('vapi_end_of_call_pkey', 'vapi_end_of_call_id_key', 'vapi_end_of_call_uuid_key', 'vapi_end_of_call_call_id_key'),
+    )
+    op.create_table('vapi_end_of_call',
+    *_columns(sa.Column('id', sa.Integer(), server_default=sa.text("nextval('vapi_end_of_call_id_seq'::regclass)"), nullable=False)),
+    sa.PrimaryKeyConstraint('id', 'uuid', 'created_at'),
+    postgresql_partition_by='RANGE (created_at)'
+    )
+    _create_indexes(partitioned=True)
+
+    # partitions for the existing rows, and a few months ahead until the worker takes over
+    oldest = op.get_bind().execute(sa.text('SELECT min(created_at) FROM vapi_end_of_call_unpartitioned')).scalar()
+    current_month = date(datetime.now(UTC).year, datetime.now(UTC).month, 1)
+    month = date(oldest.year, oldest.month, 1) if oldest is not None else current_month
+    while month <= _add_months(current_month, PARTITIONS_AHEAD):
+        op.execute(
+            f"CREATE TABLE vapi_end_of_call_y{month.year:04d}m{month.month:02d} PARTITION OF vapi_end_of_call "
+            f"FOR VALUES FROM ('{month.isoformat()} 00:00:00+00') TO ('{_add_months(month, 1).isoformat()} 00:00:00+00')"
+        )
+        month = _add_months(month, 1)
+    op.execute('CREATE TABLE vapi_end_of_call_default PARTITION OF vapi_end_of_call DEFAULT')
+
+    for statement in CALL_ID_TRIGGERS:
+        op.execute(statement)
+
+    _copy_from('vapi_end_of_call_unpartitioned')
+    # ### end Alembic commands ###
+
+
+def downgrade() -> None:
+    # ### commands auto generated by Alembic - please adjust! ###
+    _set_aside('vapi_end_of_call_partitioned', ('vapi_end_of_call_pkey',))
+    op.execute('DROP TRIGGER vapi_end_of_call_claim_call_id ON vapi_end_of_call_partitioned')
+    op.execute('DROP TRIGGER vapi_end_of_call_release_call_id ON vapi_end_of_call_partitioned')
+
+    op.create_table('vapi_end_of_call',
+    *_columns(sa.Column('id', sa.Integer(), server_default=sa.text("nextval('vapi_end_of_call_id_seq'::regclass)"), nullable=False)),
+    sa.PrimaryKeyConstraint('id', 'uuid'),
+    sa.UniqueConstraint('id'),
+    sa.UniqueConstraint('uuid'),
+    sa.UniqueConstraint('call_id')
+    )
+    _create_indexes(partitioned=False)
+
+    _copy_from('vapi_end_of_call_partitioned')
+    op.execute('DROP FUNCTION vapi_end_of_call_claim_call_id()')
+    op.execute('DROP FUNCTION vapi_end_of_call_release_call_id()')
+    op.drop_index(op.f('ix_vapi_end_of_call_call_id_created_at'), table_name='vapi_end_of_call_call_id')
+    op.drop_table('vapi_end_of_call_call_id')
+    # ### end Alembic commands ###
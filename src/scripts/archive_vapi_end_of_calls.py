@@ -0,0 +1,34 @@
+import argparse
+import asyncio
+import logging
+from datetime import UTC, datetime, timedelta
+
+from ..app.core.config import settings
+from ..app.core.db.database import local_session
+from ..app.core.utils.vapi_archive import archive_end_of_calls
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def main(older_than_days: int, batch_size: int) -> None:
+    before = datetime.now(UTC) - timedelta(days=older_than_days)
+    async with local_session() as session:
+        archived = await archive_end_of_calls(session, before, batch_size=batch_size)
+
+    logger.info(f"Archived {archived} end-of-call reports created before {before.isoformat()}.")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old Vapi end-of-call reports to the archive files.")
+    parser.add_argument(
+        "--older-than-days",
+        type=int,
+        default=settings.VAPI_ARCHIVE_AFTER_DAYS or 30,
+        help="archive the reports created more than this many days ago",
+    )
+    parser.add_argument("--batch-size", type=int, default=settings.VAPI_ARCHIVE_BATCH_SIZE)
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main(args.older_than_days, args.batch_size))
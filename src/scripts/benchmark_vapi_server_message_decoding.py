@@ -0,0 +1,67 @@
+import json
+import logging
+import timeit
+import uuid
+
+from ..app.schemas.vapi_end_of_call import VapiEndOfCallCreateInternal
+from ..app.schemas.vapi_server_message import VapiServerMessage, VapiServerMessageInternal
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+PAYLOAD_SIZE = 100_000
+CREATED_BY_USER_ID = 1
+NUMBER = 200
+REPEAT = 5
+
+
+def build_end_of_call_body(size: int = PAYLOAD_SIZE) -> bytes:
+    """Build an `end-of-call-report` request body of roughly `size` bytes."""
+    turns = []
+    transcript = []
+    while len(json.dumps(turns)) + len("\n".join(transcript)) < size:
+        role = "assistant" if len(turns) % 2 == 0 else "user"
+        text = f"This is turn {len(turns)} of the call, said by the {role}."
+        turns.append({"role": role, "message": text, "time": 1718000000 + len(turns), "secondsFromStart": len(turns)})
+        transcript.append(f"{role.upper()}: {text}")
+
+    message = {
+        "type": "end-of-call-report",
+        "endedReason": "hangup",
+        "transcript": "\n".join(transcript),
+        "summary": "This is the summary of the call.",
+        "messages": turns,
+        "call": {"id": str(uuid.uuid4()), "assistantId": None},
+        "phoneNumber": {"number": "+15555555555"},
+    }
+    return json.dumps({"message": message}).encode()
+
+
+def decode_two_pass(body: bytes) -> VapiEndOfCallCreateInternal:
+    """The previous path: FastAPI parses the body, the endpoint dumps it and validates it again."""
+    message = VapiServerMessage.model_validate(json.loads(body)).message
+    message_internal_dict = message.model_dump()
+    message_internal_dict["created_by_user_id"] = CREATED_BY_USER_ID
+    message_internal_dict["call_id"] = message_internal_dict["call"]["id"]
+    return VapiEndOfCallCreateInternal(**message_internal_dict)
+
+
+def decode_single_pass(body: bytes) -> VapiEndOfCallCreateInternal:
+    """The current path: one validation of the raw bytes straight into the internal schema."""
+    return VapiServerMessageInternal.model_validate_json(
+        body, context={"created_by_user_id": CREATED_BY_USER_ID}
+    ).message
+
+
+def main() -> None:
+    body = build_end_of_call_body()
+    assert decode_two_pass(body) == decode_single_pass(body)
+    logger.info(f"Decoding a {len(body) / 1000:.0f} KB end-of-call report, best of {REPEAT} x {NUMBER} runs")
+
+    for decode in (decode_two_pass, decode_single_pass):
+        best = min(timeit.repeat(lambda: decode(body), number=NUMBER, repeat=REPEAT)) / NUMBER
+        logger.info(f"{decode.__name__}: {best * 1_000_000:.0f} us per message")
+
+
+if __name__ == "__main__":
+    main()
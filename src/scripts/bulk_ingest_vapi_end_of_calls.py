@@ -0,0 +1,57 @@
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from collections.abc import AsyncIterator
+
+from ..app.core.config import settings
+from ..app.core.db.database import local_session
+from ..app.core.utils.user_cache import resolve_user_id
+from ..app.core.utils.vapi_bulk_ingestion import ingest_end_of_calls_ndjson
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def read_lines(path: str) -> AsyncIterator[bytes]:
+    file = sys.stdin.buffer if path == "-" else open(path, "rb")
+    try:
+        for line in file:
+            yield line
+    finally:
+        if file is not sys.stdin.buffer:
+            file.close()
+
+
+async def main(path: str, username: str, chunk_size: int) -> None:
+    async with local_session() as session:
+        user_id = await resolve_user_id(db=session, username=username)
+        if user_id is None:
+            logger.error(f"User '{username}' not found.")
+            return
+
+        start = time.perf_counter()
+        result = await ingest_end_of_calls_ndjson(
+            db=session, lines=read_lines(path), created_by_user_id=user_id, chunk_size=chunk_size
+        )
+        elapsed = time.perf_counter() - start
+
+    for failure in result["failures"]:
+        logger.warning(f"Line {failure['line']}: {failure['error']}")
+
+    logger.info(
+        f"Received {result['received']} records, created {result['created']}, "
+        f"{len(result['failures'])} failed, in {elapsed:.1f}s."
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk ingest Vapi end-of-call reports from an NDJSON file.")
+    parser.add_argument("path", help="NDJSON file with one end-of-call-report server message per line, - for stdin")
+    parser.add_argument("--username", required=True, help="owner of the ingested reports")
+    parser.add_argument("--chunk-size", type=int, default=settings.VAPI_BULK_INGESTION_CHUNK_SIZE)
+    args = parser.parse_args()
+
+    loop = asyncio.get_event_loop()
+    loop.run_until_complete(main(args.path, args.username, args.chunk_size))
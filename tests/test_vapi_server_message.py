@@ -1,8 +1,21 @@
 # ./tests/test_vapi_server_message.py
+import asyncio
+import json
+import uuid
+
 from fastapi.testclient import TestClient
+from redis.asyncio import Redis
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import create_async_engine
 
 from src.app.core.config import settings
+from src.app.core.db.database import DATABASE_URL
+from src.app.core.utils import cache, vapi_events
 from src.app.main import app
+from src.app.models.post import Post
+from src.app.models.user import User
+from src.app.models.vapi_conversation_update import VapiConversationUpdate
+from src.app.models.vapi_end_of_call import VapiEndOfCall
 
 from .helper import (
     _get_token,
@@ -359,6 +372,193 @@ def test_post_vapi_end_of_call_2(client: TestClient) -> None:
     assert response.status_code == 201
 
 
+def test_post_vapi_end_of_call_retry(client: TestClient) -> None:
+    token = _get_token(username=test_username, password=test_password, client=client)
+    response = client.post(
+        f"/api/v1/{test_username}/vapi_server_message",
+        json={
+            "message": {
+                "type": "end-of-call-report",
+                "endedReason": "customer-ended-call",
+                "transcript": "AI: Bienvenue aux assurances de la Caisse d'Epargne.\n",
+                "summary": "A retry of an end-of-call report that was already received.",
+                "messages": [],
+                "call": {"id": "51ac5220-9ae4-46fe-8e90-5fc123706970"},
+            }
+        },
+        headers={"Authorization": f'Bearer {token.json()["access_token"]}'},
+    )
+    # the retry is answered with the response of the first report
+    assert response.status_code == 201
+    assert response.json()["call_id"] == "51ac5220-9ae4-46fe-8e90-5fc123706970"
+    assert response.json()["summary"] != "A retry of an end-of-call report that was already received."
+
+
+def test_get_vapi_conversation_turns(client: TestClient) -> None:
+    response = client.get(
+        f"/api/v1/{test_username}/vapi_conversation_update/51ac5220-9ae4-46fe-8e90-5fc123706970/turns",
+    )
+    print(
+        "In test_vapi_server_message.py, test_get_vapi_conversation_turns, response is",
+        response.json(),
+    )
+    assert response.status_code == 200
+    # the five turns of the last conversation update, written by the end of the call
+    turns = response.json()
+    assert [turn["sequence"] for turn in turns] == list(range(5))
+    assert [turn["role"] for turn in turns] == [
+        "assistant",
+        "user",
+        "assistant",
+        "user",
+        "assistant",
+    ]
+    assert turns[1]["message"] == "Bonjour Léo, je suis copain Vertou,"
+    assert turns[4]["message"] == (
+        "Merci beaucoup Coquin Vertou. Comment puis-je vous aider aujourd'hui,"
+    )
+
+    response = client.get(
+        f"/api/v1/{test_username}/vapi_conversation_update/51ac5220-9ae4-46fe-8e90-5fc123706970/turns",
+        params={"from_sequence": 3},
+    )
+    assert [turn["sequence"] for turn in response.json()] == [3, 4]
+
+
+def test_vapi_events_fan_out() -> None:
+    async def read_stream() -> list[bytes]:
+        user_stream = vapi_events._stream(user_id=1, call_id=None)
+        call_stream = vapi_events._stream(user_id=1, call_id="call-1")
+        assert await anext(user_stream) == await anext(call_stream) == b": connected\n\n"
+
+        for call_id, event in [
+            ("call-2", "conversation-update"),
+            ("call-1", "conversation-update"),
+            ("call-1", "end-of-call-report"),
+        ]:
+            vapi_events._fan_out(
+                b"vapi_events:1",
+                json.dumps({"event": event, "data": {"call_id": call_id}}).encode(),
+            )
+
+        frames = [frame async for frame in call_stream]
+        assert [await anext(user_stream) for _ in range(3)][1:] == frames
+        await user_stream.aclose()
+        return frames
+
+    frames = asyncio.run(read_stream())
+    # the stream of a call only gets the events of that call, and ends with it
+    assert frames == [
+        b'event: conversation-update\ndata: {"call_id": "call-1"}\n\n',
+        b'event: end-of-call-report\ndata: {"call_id": "call-1"}\n\n',
+    ]
+    assert vapi_events._clients == {}
+
+
+def test_local_cache_budget_and_invalidation(monkeypatch) -> None:
+    monkeypatch.setattr(settings, "CACHE_LOCAL_MAX_BYTES", 10)
+    cache._clear_local()
+
+    generation = cache._local_generation
+    cache._set_local("user_posts:1", {"a": 1}, 4, 60, generation)
+    cache._set_local("user_posts:2", {"b": 2}, 4, 60, generation)
+    cache._set_local("post:1", {"c": 3}, 4, 60, generation)
+    # over the byte budget, the least recently used entry is evicted
+    assert cache._get_local("user_posts:1") is None
+    assert cache._get_local("user_posts:2") == {"b": 2}
+    # values larger than the budget are never kept
+    cache._set_local("post:2", {"d": 4}, 11, 60, generation)
+    assert cache._get_local("post:2") is None
+
+    cache._apply_invalidation(keys=["post:1"], patterns=["user_posts:*"])
+    assert cache._get_local("post:1") is None
+    assert cache._get_local("user_posts:2") is None
+    assert cache._local_cache_bytes == 0
+
+    # a value read before an invalidation is not cached
+    cache._set_local("post:3", {"e": 5}, 4, 60, generation)
+    assert cache._get_local("post:3") is None
+
+
+def test_cache_single_flight(monkeypatch) -> None:
+    computations = 0
+
+    async def compute() -> dict:
+        nonlocal computations
+        computations += 1
+        await asyncio.sleep(0.2)
+        return {"computed": computations}
+
+    async def miss_concurrently() -> list:
+        redis_client = Redis.from_url(settings.REDIS_CACHE_URL)
+        monkeypatch.setattr(cache, "client", redis_client)
+        cache_key = f"single_flight_test:{uuid.uuid4().hex}"
+        try:
+            return await asyncio.gather(
+                *[cache._get_or_compute(cache_key, 60, compute) for _ in range(10)]
+            )
+        finally:
+            await redis_client.delete(cache_key)
+            await redis_client.aclose()
+
+    results = asyncio.run(miss_concurrently())
+    assert computations == 1
+    assert results == [{"computed": 1}] * 10
+
+
+def test_cache_stale_while_revalidate(monkeypatch) -> None:
+    computations = 0
+
+    async def compute() -> dict:
+        nonlocal computations
+        computations += 1
+        return {"computed": computations}
+
+    async def read_stale() -> list:
+        redis_client = Redis.from_url(settings.REDIS_CACHE_URL)
+        monkeypatch.setattr(cache, "client", redis_client)
+        cache_key = f"stale_while_revalidate_test:{uuid.uuid4().hex}"
+        try:
+            results = [await cache._get_or_compute(cache_key, 1, compute, stale_ttl=60)]
+            await asyncio.sleep(1.1)
+            # served stale while a background task refreshes it
+            results.append(await cache._get_or_compute(cache_key, 1, compute, stale_ttl=60))
+            await asyncio.gather(*cache._refresh_tasks)
+            results.append(await cache._get_or_compute(cache_key, 1, compute, stale_ttl=60))
+            return results
+        finally:
+            await redis_client.delete(cache_key)
+            await redis_client.aclose()
+
+    results = asyncio.run(read_stale())
+    assert results == [{"computed": 1}, {"computed": 1}, {"computed": 2}]
+    assert computations == 2
+
+
+def test_cache_tag_invalidation(monkeypatch) -> None:
+    async def compute() -> dict:
+        return {"computed": True}
+
+    async def invalidate_tag() -> list:
+        redis_client = Redis.from_url(settings.REDIS_CACHE_URL)
+        monkeypatch.setattr(cache, "client", redis_client)
+        tag = f"user:{uuid.uuid4().hex}:posts"
+        cache_keys = [f"tag_test:{uuid.uuid4().hex}" for _ in range(3)]
+        try:
+            for cache_key in cache_keys:
+                await cache._get_or_compute(cache_key, 60, compute, tags=[tag])
+            await cache._invalidate(tags=[tag])
+            return [
+                await redis_client.exists(*cache_keys),
+                await redis_client.exists(cache.CACHE_TAG_KEY.format(tag=tag)),
+            ]
+        finally:
+            await redis_client.delete(*cache_keys)
+            await redis_client.aclose()
+
+    assert asyncio.run(invalidate_tag()) == [0, 0]
+
+
 def test_get_multiple_conversation_updates(client: TestClient) -> None:
     token = _get_token(username=test_username, password=test_password, client=client)
     response = client.get(
@@ -398,6 +598,12 @@ def test_delete_conversation_updates(client: TestClient) -> None:
         )
         assert response.status_code == 200
 
+        # the turns are deleted with their conversation update
+        response = client.get(
+            f"/api/v1/{test_username}/vapi_conversation_update/{conversation_update_id}/turns"
+        )
+        assert response.status_code == 404
+
 
 def test_delete_db_conversation_updates_ids(client: TestClient) -> None:
     token = _get_token(username=admin_username, password=admin_password, client=client)
@@ -428,6 +634,86 @@ def test_delete_db_conversation_updates_ids(client: TestClient) -> None:
         assert response.status_code == 200
 
 
+def test_post_vapi_end_of_calls_bulk(client: TestClient) -> None:
+    token = _get_token(username=test_username, password=test_password, client=client)
+    end_of_call = {
+        "type": "end-of-call-report",
+        "endedReason": "customer-ended-call",
+        "transcript": "AI: Bonjour, je suis Léo.\n",
+        "summary": "A backfilled call.",
+        "messages": [],
+        "call": {"id": str(uuid.uuid4())},
+    }
+    lines = [
+        json.dumps({"message": end_of_call}),
+        json.dumps({"message": {**end_of_call, "summary": ""}}),
+        json.dumps({"message": end_of_call}),
+    ]
+    response = client.post(
+        f"/api/v1/{test_username}/vapi_end_of_calls/bulk",
+        content="\n".join(lines),
+        headers={
+            "Authorization": f'Bearer {token.json()["access_token"]}',
+            "Content-Type": "application/x-ndjson",
+        },
+    )
+    assert response.status_code == 201
+    assert response.json()["received"] == 3
+    assert response.json()["created"] == 1
+    assert [failure["line"] for failure in response.json()["failures"]] == [2, 3]
+
+
+def test_post_vapi_end_of_calls_bulk_backfill(client: TestClient) -> None:
+    async def partition(call_id: str) -> str:
+        engine = create_async_engine(DATABASE_URL)
+        try:
+            async with engine.connect() as connection:
+                result = await connection.exec_driver_sql(
+                    "SELECT tableoid::regclass::text FROM vapi_end_of_call "
+                    f"WHERE call_id = '{call_id}'"
+                )
+                return result.scalar_one()
+        finally:
+            await engine.dispose()
+
+    token = _get_token(username=test_username, password=test_password, client=client)
+    call_id = str(uuid.uuid4())
+    end_of_call = {
+        "type": "end-of-call-report",
+        "endedReason": "assistant-ended-call",
+        "transcript": "AI: Bonjour, je suis Léo.\n",
+        "summary": "A call made last year.",
+        "messages": [],
+        "call": {
+            "id": call_id,
+            "startedAt": "2024-03-01T23:58:00.000Z",
+            "endedAt": "2024-03-02T00:01:00.000Z",
+        },
+    }
+    response = client.post(
+        f"/api/v1/{test_username}/vapi_end_of_calls/bulk",
+        content=json.dumps({"message": end_of_call}),
+        headers={
+            "Authorization": f'Bearer {token.json()["access_token"]}',
+            "Content-Type": "application/x-ndjson",
+        },
+    )
+    assert response.status_code == 201
+    assert response.json()["created"] == 1
+
+    # the report is dated by the end of its call, not by its ingestion
+    assert asyncio.run(partition(call_id)) == "vapi_end_of_call_y2024m03"
+
+    response = client.get(
+        f"/api/v1/{test_username}/analytics/calls/daily",
+        params={"start_day": "2024-03-01", "end_day": "2024-03-02"},
+    )
+    assert response.status_code == 200
+    assert [(day["day"], day["calls"]) for day in response.json()] == [
+        ("2024-03-02", 1)
+    ]
+
+
 def test_get_multiple_end_of_calls(client: TestClient) -> None:
     token = _get_token(username=test_username, password=test_password, client=client)
     response = client.get(
@@ -442,6 +728,256 @@ def test_get_multiple_end_of_calls(client: TestClient) -> None:
     assert response.status_code == 200
 
 
+def test_get_multiple_end_of_calls_by_assistant_id(client: TestClient) -> None:
+    token = _get_token(username=test_username, password=test_password, client=client)
+    response = client.get(
+        f"/api/v1/{test_username}/vapi_end_of_calls",
+        params={"assistant_id": "0eff0e2a-e7ba-4fac-b867-3e40f657f6e9"},
+        headers={"Authorization": f'Bearer {token.json()["access_token"]}'},
+    )
+    assert response.status_code == 200
+    assert response.json()["data"]
+    assert all(
+        end_of_call["call"]["assistantId"] == "0eff0e2a-e7ba-4fac-b867-3e40f657f6e9"
+        for end_of_call in response.json()["data"]
+    )
+
+
+def test_search_end_of_calls(client: TestClient) -> None:
+    response = client.get(
+        f"/api/v1/{test_username}/vapi_end_of_calls/search", params={"q": "kebab"}
+    )
+    assert response.status_code == 200
+    assert [hit["call_id"] for hit in response.json()["data"]] == [
+        "51ac5220-9ae4-46fe-8e90-5fc123706970"
+    ]
+
+    # pages follow each other without overlapping
+    hits, params = [], {"q": "Caisse Epargne", "limit": 1}
+    while True:
+        response = client.get(
+            f"/api/v1/{test_username}/vapi_end_of_calls/search", params=params
+        )
+        assert response.status_code == 200
+        hits += response.json()["data"]
+        if response.json()["next_cursor"] is None:
+            break
+        params["cursor"] = response.json()["next_cursor"]
+
+    assert len(hits) >= 2
+    assert len({hit["id"] for hit in hits}) == len(hits)
+    assert [hit["rank"] for hit in hits] == sorted(
+        (hit["rank"] for hit in hits), reverse=True
+    )
+
+    response = client.get(
+        f"/api/v1/{test_username}/vapi_end_of_calls/search",
+        params={"q": "kebab", "cursor": "not a cursor"},
+    )
+    assert response.status_code == 400
+
+
+def test_search_end_of_calls_equal_ranks(client: TestClient) -> None:
+    token = _get_token(username=test_username, password=test_password, client=client)
+    term = f"quetzal{uuid.uuid4().hex[:8]}"
+    end_of_call = {
+        "type": "end-of-call-report",
+        "endedReason": "customer-ended-call",
+        "transcript": f"User: Do you sell the {term}?\nAI: We do.\n",
+        "summary": f"The caller asked about the {term}.",
+        "messages": [],
+    }
+    lines = [
+        json.dumps({"message": {**end_of_call, "call": {"id": str(uuid.uuid4())}}})
+        for _ in range(5)
+    ]
+    response = client.post(
+        f"/api/v1/{test_username}/vapi_end_of_calls/bulk",
+        content="\n".join(lines),
+        headers={
+            "Authorization": f'Bearer {token.json()["access_token"]}',
+            "Content-Type": "application/x-ndjson",
+        },
+    )
+    assert response.json()["created"] == 5
+
+    # the pages break between reports of the same rank
+    hits, params = [], {"q": term, "limit": 2}
+    while True:
+        response = client.get(
+            f"/api/v1/{test_username}/vapi_end_of_calls/search", params=params
+        )
+        assert response.status_code == 200
+        hits += response.json()["data"]
+        if response.json()["next_cursor"] is None:
+            break
+        params["cursor"] = response.json()["next_cursor"]
+
+    assert len({hit["rank"] for hit in hits}) == 1
+    assert len({hit["id"] for hit in hits}) == len(hits) == 5
+
+
+def test_get_daily_call_analytics(client: TestClient) -> None:
+    response = client.get(
+        f"/api/v1/{test_username}/analytics/calls/daily",
+        params={"by_assistant": True},
+    )
+    assert response.status_code == 200
+    days = response.json()
+    assert sum(day["calls"] for day in days) >= 2
+    assert all(sum(day["ended_reasons"].values()) == day["calls"] for day in days)
+    assert "0eff0e2a-e7ba-4fac-b867-3e40f657f6e9" in {
+        day["assistant_id"] for day in days
+    }
+
+    response = client.get(
+        f"/api/v1/{test_username}/analytics/calls/daily",
+        params={"start_day": "2024-03-02", "end_day": "2024-03-01"},
+    )
+    assert response.status_code == 400
+
+
+def test_end_of_calls_total_count(client: TestClient) -> None:
+    response = client.get(
+        f"/api/v1/{test_username}/vapi_end_of_calls", params={"items_per_page": 100}
+    )
+    assert response.status_code == 200
+    # the total count is the maintained counter of the user, not a COUNT(*)
+    assert response.json()["total_count"] == len(response.json()["data"]) > 0
+
+
+def test_end_of_calls_cursor_pagination(client: TestClient) -> None:
+    all_ids = [
+        end_of_call["id"]
+        for end_of_call in client.get(
+            f"/api/v1/{test_username}/vapi_end_of_calls", params={"items_per_page": 100}
+        ).json()["data"]
+    ]
+
+    ids = []
+    # an empty cursor starts from the oldest report
+    cursor = ""
+    while cursor is not None:
+        response = client.get(
+            f"/api/v1/{test_username}/vapi_end_of_calls",
+            params={"items_per_page": 1, "cursor": cursor},
+        )
+        assert response.status_code == 200
+        assert "total_count" not in response.json()
+        ids.extend(end_of_call["id"] for end_of_call in response.json()["data"])
+        cursor = response.json()["next_cursor"]
+
+    assert sorted(ids) == sorted(all_ids)
+    assert len(set(ids)) == len(ids)
+
+    response = client.get(
+        f"/api/v1/{test_username}/vapi_end_of_calls", params={"cursor": "not-a-cursor"}
+    )
+    assert response.status_code == 400
+
+
+def test_end_of_calls_summary_view(client: TestClient) -> None:
+    response = client.get(
+        f"/api/v1/{test_username}/vapi_end_of_calls", params={"view": "summary"}
+    )
+    assert response.status_code == 200
+    assert response.json()["data"]
+    for end_of_call in response.json()["data"]:
+        assert set(end_of_call) == {
+            "id",
+            "call_id",
+            "endedReason",
+            "summary",
+            "created_at",
+        }
+
+
+def test_end_of_call_raw_response(client: TestClient) -> None:
+    response = client.get(f"/api/v1/{test_username}/vapi_end_of_calls")
+    id = response.json()["data"][0]["id"]
+
+    # the first request caches the encoded body, the second one is served from it
+    responses = [
+        client.get(f"/api/v1/{test_username}/vapi_end_of_call/{id}") for _ in range(2)
+    ]
+    for response in responses:
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/json"
+    assert responses[0].content == responses[1].content
+    assert responses[1].json()["id"] == id
+
+
+def test_export_end_of_calls(client: TestClient) -> None:
+    token = _get_token(username=test_username, password=test_password, client=client)
+    headers = {"Authorization": f'Bearer {token.json()["access_token"]}'}
+    ids = [
+        end_of_call["id"]
+        for end_of_call in client.get(
+            f"/api/v1/{test_username}/vapi_end_of_calls", params={"items_per_page": 100}
+        ).json()["data"]
+    ]
+
+    response = client.get(
+        f"/api/v1/{test_username}/vapi_end_of_calls/export", headers=headers
+    )
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert sorted(end_of_call["id"] for end_of_call in exported) == sorted(ids)
+
+    response = client.get(
+        f"/api/v1/{test_username}/vapi_end_of_calls/export",
+        params={"format": "csv"},
+        headers=headers,
+    )
+    assert response.status_code == 200
+    assert response.text.splitlines()[0].startswith("id,call_id,")
+
+    # exports are only available to their owner
+    response = client.get(f"/api/v1/{test_username}/vapi_end_of_calls/export")
+    assert response.status_code == 401
+
+
+def test_list_queries_use_partial_indexes(client: TestClient) -> None:
+    async def explain(statement: Select) -> str:
+        engine = create_async_engine(DATABASE_URL)
+        try:
+            async with engine.connect() as connection:
+                connection = await connection.execution_options(
+                    isolation_level="AUTOCOMMIT"
+                )
+                # fills the visibility maps, which index-only scans depend on
+                await connection.exec_driver_sql(
+                    'VACUUM ANALYZE "user", post, vapi_conversation_update, vapi_end_of_call'
+                )
+                # the test tables are small enough for a sequential scan to win
+                await connection.exec_driver_sql("SET enable_seqscan = off")
+                sql = statement.compile(
+                    dialect=engine.dialect, compile_kwargs={"literal_binds": True}
+                )
+                result = await connection.exec_driver_sql(f"EXPLAIN {sql}")
+                return "\n".join(row[0] for row in result)
+        finally:
+            await engine.dispose()
+
+    for model in (Post, VapiConversationUpdate, VapiEndOfCall):
+        plan = asyncio.run(
+            explain(
+                select(model.id)
+                .where(model.created_by_user_id == 1, ~model.is_deleted)
+                .order_by(model.id)
+                .limit(10)
+            )
+        )
+        assert "Index Only Scan" in plan, plan
+        assert "Sort" not in plan, plan
+
+    plan = asyncio.run(
+        explain(select(User.id).where(User.username == test_username, ~User.is_deleted))
+    )
+    assert "Index Only Scan using ix_user_username_not_deleted" in plan, plan
+
+
 def test_delete_end_of_calls(client: TestClient) -> None:
     token = _get_token(username=test_username, password=test_password, client=client)
     end_of_calls_ids = _get_vapi_end_of_calls_ids(